@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmarks for the lisp reader and writer.
+
+Builds :emacs-rex messages carrying an interactive-eval-region payload
+from 1 KB up to 10 MB and reports the time spent in read_lisp.  Time
+per byte should stay roughly flat across sizes.  Then reports
+write_lisp throughput on wide (a big completion list) and deep
+responses.
+
+Usage: python benchmarks/bench_lisp.py [max_bytes]
+
+"""
+import os
+import sys
+import time
+
+root = os.path.realpath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(root, "..", "swank"))
+
+from lisp import lstring, read_lisp, symbol, write_lisp
+
+
+SIZES = [1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20]
+LINE = '(:emacs-rex (swank:autodoc \'("foo" "" 1.5 -2) :print-right-margin 80) ' \
+       '"user" t 42) ; comment\n'
+
+
+def make_message(size):
+    """Return an :emacs-rex message of roughly size characters."""
+    body = "def f(x):\\n    return \\\"x\\\" * 2\\n"
+    region = body * max(1, size // (2 * len(body)))
+    forms = LINE * max(1, size // (2 * len(LINE)))
+    return '(:emacs-rex (swank:interactive-eval-region "{0}" \'({1})) ' \
+           '"user" t 1)'.format(region, forms)
+
+
+def timeit(fn, arg, min_time=0.2):
+    """Return best seconds per call of fn(arg)."""
+    best = None
+    spent = 0.0
+    while spent < min_time or best is None:
+        start = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def make_completions(count):
+    """Return a simple-completions style reply with count names."""
+    names = ["name_{0}_\"q\"".format(i) for i in range(count)]
+    return [symbol(":return"), {":ok": [names, "name_"]}, 1]
+
+
+def make_deep(depth):
+    """Return a response nested depth lists deep."""
+    value = [lstring("leaf"), 1.5, None]
+    for i in range(depth):
+        value = [symbol(":child"), value, i]
+    return [symbol(":return"), {":ok": value}, 1]
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    max_bytes = int(argv[0]) if argv else SIZES[-1]
+    print("{0:>12} {1:>12} {2:>10}".format("bytes", "seconds", "ns/byte"))
+    for size in SIZES:
+        if size > max_bytes:
+            break
+        message = make_message(size)
+        seconds = timeit(read_lisp, message)
+        print("{0:>12} {1:>12.6f} {2:>10.1f}".format(
+            len(message), seconds, seconds * 1e9 / len(message)))
+
+    print("")
+    print("{0:>24} {1:>12} {2:>12}".format("writer", "seconds", "MB/s"))
+    workloads = [
+        ("completions x 1000", make_completions(1000)),
+        ("completions x 100000", make_completions(100000)),
+        ("deep x 1000", make_deep(1000)),
+        ("deep x 100000", make_deep(100000)),
+    ]
+    for name, value in workloads:
+        seconds = timeit(write_lisp, value)
+        size = len(write_lisp(value))
+        print("{0:>24} {1:>12.6f} {2:>12.1f}".format(
+            name, seconds, size / seconds / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark of the server startup time.
+
+Launches swank/server.py the way slime does, sending the setup string
+on stdin, and measures the time until the port file is written, which
+is what M-x slime waits on.  Reports the best and median of several
+launches, and exits 1 when the median exceeds --max-ms.
+
+Usage: python benchmarks/bench_startup.py [-n runs] [--max-ms ms]
+
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root = os.path.realpath(os.path.dirname(__file__))
+SERVER = os.path.join(root, "..", "swank", "server.py")
+SETUP = '(progn (load "swank-loader.lisp" :verbose t) ' \
+        '(funcall (read-from-string "swank-loader:init")) ' \
+        '(funcall (read-from-string "swank:start-server") "{0}"))\n'
+
+
+def launch(port_filename, timeout=30.0):
+    """Return seconds from launching the server to its port file."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER], stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        process.stdin.write(SETUP.format(port_filename).encode("utf-8"))
+        process.stdin.flush()
+        while True:
+            try:
+                if os.path.getsize(port_filename):
+                    return time.perf_counter() - start
+            except OSError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("Server exited with {0}".format(
+                    process.returncode))
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("Timed out waiting for the port file")
+            time.sleep(0.0005)
+    finally:
+        process.kill()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--runs", type=int, default=10,
+                        help="launches to time (default: 10)")
+    parser.add_argument("--max-ms", type=float,
+                        help="fail when the median startup exceeds this")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        timings = []
+        for i in range(args.runs):
+            port_filename = os.path.join(directory, "port.{0}".format(i))
+            timings.append(launch(port_filename) * 1000)
+    finally:
+        shutil.rmtree(directory)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print("startup to port file: best {0:.1f}ms median {1:.1f}ms "
+          "worst {2:.1f}ms ({3} runs)".format(
+              timings[0], median, timings[-1], len(timings)))
+    if args.max_ms is not None and median > args.max_ms:
+        print("REGRESSION startup: median {0:.1f}ms > {1:.1f}ms".format(
+            median, args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark suite for the swank hot paths.
+
+Runs synthetic workloads through read_lisp, write_lisp, encode_frame,
+SwankProtocol.dispatch and full socket round trips against local
+SwankServers, in latin-1 and utf-8 sessions, and reports ops/sec,
+p50/p99 latency and peak memory for each.  Results can be saved as JSON and compared against a stored
+baseline; the exit status is 1 when a workload regressed.
+
+Usage:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --save-baseline
+    python benchmarks/suite.py --baseline benchmarks/baseline.json
+
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+root = os.path.realpath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(root, "..", "swank"))
+
+from framing import encode_frame
+from lisp import lstring, read_lisp, symbol, write_lisp
+from protocol import SwankProtocol
+from server import SwankServer, SwankServerRequestHandler
+
+
+DEFAULT_BASELINE = os.path.join(root, "baseline.json")
+
+
+class BenchProtocol(SwankProtocol):
+    """SwankProtocol with handlers producing synthetic replies."""
+
+    def swank_bench_completions(self, count):
+        return [["name_{0}".format(i) for i in range(count)], "name_"]
+
+    def swank_bench_deep(self, depth):
+        value = [lstring("leaf"), 1.5, None]
+        for i in range(depth):
+            value = [symbol(":child"), value, i]
+        return value
+
+    def swank_bench_text(self, text, count):
+        return text * count
+
+
+class BenchRequestHandler(SwankServerRequestHandler):
+    protocol_class = BenchProtocol
+
+
+def rex(form, rid=1):
+    return '(:emacs-rex {0} "user" t {1})'.format(form, rid)
+
+
+def frame(message, encoding="utf-8"):
+    payload = message.encode(encoding)
+    return "{0:06x}".format(len(payload)).encode("ascii") + payload
+
+
+def eval_region(lines):
+    body = "x = (1, 2, \"three\")\n" * lines
+    return rex('(swank:eval {0})'.format(write_lisp(body)))
+
+
+MESSAGES = {
+    "autodoc": rex("(swank:autodoc '(\"sorted\" \"x\" "
+                   "swank::%cursor-marker%) :print-right-margin 80)"),
+    "eval-region": eval_region(20000),
+    "completions": rex("(swank:bench-completions 100000)"),
+    "deep": rex("(swank:bench-deep 2000)"),
+}
+
+# Text replies, by the encodings able to carry them.
+TEXTS = {
+    "ascii": "plain text ",
+    "latin-1": "caf\u00e9 cr\u00e8me ",
+    "utf-8": "\u03bb \u2192 \u2200x ",
+}
+SESSIONS = {
+    "latin-1": ("iso-latin-1-unix", ["ascii", "latin-1"]),
+    "utf-8": ("utf-8-unix", ["ascii", "latin-1", "utf-8"]),
+}
+
+REPLIES = {
+    "autodoc": [symbol(":return"), {":ok": ["(foo a b)", True]}, 1],
+    "completions": [symbol(":return"), {":ok": [
+        ["name_{0}".format(i) for i in range(100000)], "name_"]}, 1],
+    "deep": BenchProtocol(None).swank_bench_deep(2000),
+}
+
+
+class Client(object):
+    """Blocking swank client for round trips against a SwankServer."""
+
+    def __init__(self, address, encoding="utf-8"):
+        self.socket = socket.create_connection(address)
+        self.buffer = b""
+        self.encoding = encoding
+        self.socket.sendall(frame(rex("(swank:buffer-first-change nil)")))
+        self.read_frame()  # indentation update
+        self.read_frame()
+
+    def read_exactly(self, count):
+        while len(self.buffer) < count:
+            chunk = self.socket.recv(max(65536, count - len(self.buffer)))
+            if not chunk:
+                raise EOFError("Connection closed")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+    def read_frame(self):
+        return self.read_exactly(int(self.read_exactly(6), 16))
+
+    def request(self, data):
+        self.socket.sendall(data)
+        return self.read_frame()
+
+    def close(self):
+        self.socket.close()
+
+
+def start_server(coding_system="utf-8-unix"):
+    server = SwankServer(("127.0.0.1", 0), handler_class=BenchRequestHandler,
+                         encoding=coding_system)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def text_reply(name, count=5000):
+    return write_lisp([symbol(":return"), {":ok": TEXTS[name] * count}, 1])
+
+
+def workloads(servers):
+    protocol = BenchProtocol(None, locals={"__name__": "__bench__"})
+    for name, message in sorted(MESSAGES.items()):
+        yield "read_lisp:" + name, read_lisp, message
+        yield "dispatch:" + name, protocol.dispatch, message
+    for name, value in sorted(REPLIES.items()):
+        yield "write_lisp:" + name, write_lisp, value
+    for name in sorted(TEXTS):
+        yield "encode_frame:" + name, encode_frame, text_reply(name)
+    client = Client(servers["utf-8"].server_address)
+    try:
+        for name, message in sorted(MESSAGES.items()):
+            yield "roundtrip:" + name, client.request, frame(message)
+    finally:
+        client.close()
+    for session, (coding_system, texts) in sorted(SESSIONS.items()):
+        encoding = "latin-1" if session == "latin-1" else "utf-8"
+        client = Client(servers[session].server_address, encoding)
+        try:
+            for name in texts:
+                message = rex('(swank:bench-text {0} 5000)'.format(
+                    write_lisp(TEXTS[name])))
+                yield "roundtrip-{0}:text-{1}".format(session, name), \
+                    client.request, frame(message, encoding)
+        finally:
+            client.close()
+
+
+def percentile(samples, fraction):
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def measure(fn, arg, min_time, min_runs=5, max_runs=100000):
+    """Return stats for repeated fn(arg) calls."""
+    fn(arg)  # warm up
+    samples = []
+    spent = 0.0
+    while (spent < min_time or len(samples) < min_runs) and \
+            len(samples) < max_runs:
+        start = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        spent += elapsed
+    samples.sort()
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "runs": len(samples),
+        "ops_per_sec": len(samples) / spent,
+        "p50_ms": percentile(samples, 0.5) * 1e3,
+        "p99_ms": percentile(samples, 0.99) * 1e3,
+        "peak_memory_kb": peak / 1024.0,
+    }
+
+
+def run(min_time, only=None):
+    results = {}
+    servers = dict((session, start_server(coding_system))
+                   for session, (coding_system, texts) in SESSIONS.items())
+    try:
+        for name, fn, arg in workloads(servers):
+            if only and only not in name:
+                continue
+            results[name] = stats = measure(fn, arg, min_time)
+            print("{0:<32} {1:>10.1f} {2:>10.3f} {3:>10.3f} {4:>12.1f}".format(
+                name, stats["ops_per_sec"], stats["p50_ms"],
+                stats["p99_ms"], stats["peak_memory_kb"]))
+    finally:
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print regressions against baseline and return their count."""
+    regressions = 0
+    for name, stats in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before = baseline[name]["p50_ms"]
+        ratio = stats["p50_ms"] / before if before else 1.0
+        if ratio > 1.0 + tolerance:
+            regressions += 1
+            print("REGRESSION {0}: p50 {1:.3f}ms -> {2:.3f}ms ({3:+.0%})".format(
+                name, before, stats["p50_ms"], ratio - 1.0))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store results as the new baseline")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown (default: 0.25)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds to spend per workload")
+    parser.add_argument("-k", "--only", help="run workloads matching this")
+    args = parser.parse_args(argv)
+
+    print("{0:<32} {1:>10} {2:>10} {3:>10} {4:>12}".format(
+        "workload", "ops/sec", "p50 ms", "p99 ms", "peak KB"))
+    results = run(args.min_time, args.only)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline:
+            if compare(results, json.load(baseline), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
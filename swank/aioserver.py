@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import logconfig
+from framing import (HEADER_LENGTH, FrameDecoder, python_encoding,
+                     set_nodelay)
+from protocol import SwankProtocol
+from scheduler import QueueFull, Scheduler
+from wiretrace import RECORDER
+
+
+__all__ = ['AsyncSwankConnection', 'AsyncSwankServer']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class AsyncSwankConnection(object):
+    """One client connection served by AsyncSwankServer.
+
+    Frames read from the stream are parsed on the loop and scheduled
+    on the server's executor by swank thread, so blocking evaluations
+    never run on the event loop.  Replies are written back from the
+    loop as soon as each request completes; frames sent in the same
+    loop iteration are coalesced into one writelines call.
+
+    """
+
+    def __init__(self, server, reader, writer, loop):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.peername = writer.get_extra_info('peername')
+        self.peer = "{0}:{1}".format(*self.peername[:2])
+        self.pending = []
+        self.flush_scheduled = False
+        set_nodelay(writer.get_extra_info('socket'), server.nodelay)
+        self.scheduler = Scheduler(
+            executor=server.executor, queue_size=server.queue_size)
+        self.protocol = SwankProtocol(
+            writer.get_extra_info('socket'),
+            locals=server.locals, prompt=server.prompt, send=self.send,
+            encoding=server.encoding
+        )
+
+    @property
+    def queue_depth(self):
+        """Number of requests waiting or running."""
+        return self.scheduler.depth()
+
+    def send(self, ret):
+        self.loop.call_soon_threadsafe(self.write, ret)
+
+    def write(self, data, flush=True):
+        """Queue data, to be written at the end of this loop iteration.
+
+        With flush=False it waits for the next frame written instead.
+
+        """
+        self.pending.append(data)
+        if RECORDER.frames is not None:
+            RECORDER.record(self.peer, 'send', data[HEADER_LENGTH:])
+        if flush and not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        if self.pending:
+            pending, self.pending = self.pending, []
+            self.writer.writelines(pending)
+
+    def reply(self, request):
+        self.send(self.protocol.execute(request))
+
+    async def serve(self):
+        decoder = FrameDecoder()
+        first = True
+        try:
+            while True:
+                data = await self.reader.read(64 * 1024)
+                if not data:
+                    logger.debug('Connection closed by peer')
+                    break
+                decoder.feed(data)
+                for frame in decoder.frames():
+                    if RECORDER.frames is not None:
+                        RECORDER.record(self.peer, 'recv', frame)
+                    if first:
+                        self.write(self.protocol.indentation_update(),
+                                   flush=False)
+                        first = False
+                    request = self.protocol.receive(frame)
+                    if request is None:
+                        continue
+                    try:
+                        self.scheduler.submit(request.thread, self.reply, request)
+                    except QueueFull as e:
+                        self.write(self.protocol.abort(request, str(e)))
+                await self.writer.drain()
+        except (ConnectionError, ValueError):
+            logger.exception('Connection error')
+        finally:
+            # Releasing the session writes to its eval worker's pipe.
+            await self.loop.run_in_executor(None, self.protocol.close)
+            self.writer.close()
+
+
+class AsyncSwankServer(object):
+    """Swank server multiplexing many connections on one event loop."""
+
+    def __init__(self, server_address, port_filename=None, encoding="utf-8",
+                 locals=None, prompt="Python> ", max_workers=None,
+                 queue_size=64, nodelay=True):
+        self.requested_address = server_address
+        self.server_address = None
+        self.port_filename = port_filename
+        self.encoding = python_encoding(encoding)
+        self.locals = locals
+        self.prompt = prompt
+        self.queue_size = queue_size
+        self.nodelay = nodelay
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or 32)
+        self.connections = set()
+        self.server = None
+
+    @property
+    def connection_count(self):
+        return len(self.connections)
+
+    def queue_depths(self):
+        """Return a dict mapping peer addresses to their queue depth."""
+        return dict((connection.peername, connection.queue_depth)
+                    for connection in self.connections)
+
+    async def handle_connection(self, reader, writer):
+        connection = AsyncSwankConnection(
+            self, reader, writer, asyncio.get_event_loop())
+        self.connections.add(connection)
+        logger.debug('New connection %s (%d open)',
+                     connection.peername, self.connection_count)
+        try:
+            await connection.serve()
+        finally:
+            self.connections.discard(connection)
+
+    async def start(self):
+        ipaddr, port = self.requested_address
+        self.server = await asyncio.start_server(
+            self.handle_connection, ipaddr, port)
+        self.server_address = self.server.sockets[0].getsockname()[:2]
+        ipaddr, port = self.server_address
+        logger.info('Serving on: {0} ({1})'.format(ipaddr, port))
+        if self.port_filename:
+            with open(self.port_filename, 'w') as port_file:
+                logger.debug('Writing port_file {0}'.format(self.port_filename))
+                port_file.write("{0}".format(port))
+
+    async def run(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+
+    def serve_forever(self):
+        asyncio.run(self.run())
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+import re
+import sys
+import threading
+import types
+
+import logconfig
+
+
+__all__ = ['KINDS', 'AproposIndex', 'classify']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+KINDS = ('function', 'class', 'variable')
+
+
+def module_state(module):
+    """Return what changes when module is replaced, reloaded or grows."""
+    try:
+        return id(module), len(vars(module))
+    except TypeError:
+        return id(module), None
+
+
+def classify(value):
+    """Return the apropos kind of value, None for modules."""
+    if isinstance(value, types.ModuleType):
+        return None
+    elif isinstance(value, type):
+        return 'class'
+    elif callable(value):
+        return 'function'
+    return 'variable'
+
+
+class AproposIndex(object):
+    """Symbol index over sys.modules built in a background thread.
+
+    Modules in sys.modules are indexed by a daemon thread, and indexed
+    again when a query notices they changed: modules imported since,
+    replaced (or reloaded) and those whose namespace grew or shrank,
+    like a module indexed while it was being imported.  Functions and
+    classes are only indexed in the module defining them.  Designators are kept joined in one string
+    so a query is a single regexp scan, whose matches are mapped back
+    to entries by offset.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        self.offsets = []
+        self.joined = None
+        # Module name: module_state() when indexed.
+        self.indexed = {}
+        self.wakeup = threading.Event()
+        self.idle = threading.Event()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name='swank-apropos-index')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                self.index_changed_modules()
+            except Exception:
+                logger.exception('Apropos indexing failed')
+            if not self.wakeup.is_set():
+                self.idle.set()
+
+    def changed_modules(self):
+        """Return (name module state) of modules changed since indexed."""
+        changed = []
+        for name, module in list(sys.modules.items()):
+            if module is None:
+                continue
+            state = module_state(module)
+            if self.indexed.get(name) != state:
+                changed.append((name, module, state))
+        return changed
+
+    def refresh(self, timeout=None):
+        """Index changed modules, waiting up to timeout seconds for it."""
+        if self.changed_modules() or \
+                len(self.indexed) > len(sys.modules):
+            self.idle.clear()
+            self.start()
+            self.wakeup.set()
+        if timeout:
+            self.idle.wait(timeout)
+
+    def index_changed_modules(self):
+        changed = self.changed_modules()
+        removed = set(self.indexed).difference(sys.modules)
+        if not changed and not removed:
+            return
+        entries = []
+        for name, module, state in changed:
+            entries.extend(self.module_entries(name, module))
+        dropped = removed.union(name for name, module, state in changed)
+        with self.lock:
+            for name in removed:
+                del self.indexed[name]
+            for name, module, state in changed:
+                self.indexed[name] = state
+            entries.extend(entry for entry in self.entries
+                           if entry[2] not in dropped)
+            entries.sort()
+            self.entries = entries
+            self.offsets = []
+            self.joined = None
+
+    def module_entries(self, name, module):
+        try:
+            namespace = list(vars(module).items())
+        except TypeError:
+            return []
+        entries = []
+        for attribute, value in namespace:
+            kind = classify(value)
+            if kind is None:
+                continue
+            if kind != 'variable' and \
+                    getattr(value, '__module__', name) != name:
+                continue
+            entries.append((name + "." + attribute, kind, name, attribute))
+        return entries
+
+    def search_text(self):
+        with self.lock:
+            if self.joined is None:
+                offsets = []
+                position = 0
+                for entry in self.entries:
+                    offsets.append(position)
+                    position += len(entry[0]) + 1
+                self.offsets = offsets
+                self.joined = "\n".join(entry[0] for entry in self.entries)
+            return self.joined, self.offsets, self.entries
+
+    def search(self, pattern, case_sensitive=False, external_only=True,
+               package=None, kinds=None, namespace=None, limit=10000):
+        """Return sorted (designator, kind, value) for matching symbols.
+
+        pattern is a regexp, or taken literally if it doesn't compile.
+        Names in namespace (the session) are searched as well under
+        their plain names.
+
+        """
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        try:
+            regexp = re.compile(pattern, flags)
+        except re.error:
+            regexp = re.compile(re.escape(pattern), flags)
+        line_regexp = re.compile(
+            "^[^\n]*?(?:" + regexp.pattern + ")[^\n]*$", flags)
+        kinds = set(kinds or KINDS)
+        prefix = package + "." if package else None
+        results = []
+        if namespace is not None and not package:
+            for attribute, value in list(namespace.items()):
+                kind = classify(value)
+                if kind in kinds and regexp.search(attribute) and \
+                        not (external_only and attribute.startswith("_")):
+                    results.append((attribute, kind, value))
+        joined, offsets, entries = self.search_text()
+        for match in line_regexp.finditer(joined):
+            entry = entries[bisect.bisect_right(offsets, match.start()) - 1]
+            designator, kind, module_name, attribute = entry
+            if kind not in kinds:
+                continue
+            if external_only and (attribute.startswith("_") or
+                                  "._" in module_name or
+                                  module_name.startswith("_")):
+                continue
+            if prefix and not (module_name == package or
+                               module_name.startswith(prefix)):
+                continue
+            module = sys.modules.get(module_name)
+            if module is None or not hasattr(module, attribute):
+                continue
+            results.append((designator, kind, getattr(module, attribute)))
+            if len(results) >= limit:
+                break
+        results.sort(key=lambda result: result[0])
+        return results
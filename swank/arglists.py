@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+import builtins
+import inspect
+import logging
+import sys
+import threading
+import types
+import weakref
+from collections import OrderedDict
+
+import logconfig
+from reprs import SafeRepr, safe_repr
+
+
+__all__ = ['CURSOR_MARKER', 'NO_ARGLIST', 'ArglistCache', 'find_operator',
+           'format_arglist', 'resolve']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+CURSOR_MARKER = 'swank::%cursor-marker%'
+DEFAULT_REPR = SafeRepr(maxstring=20, maxother=20, maxlevel=1, maxitems=3)
+# Signature of objects without one (e.g. some C builtins).
+NO_ARGLIST = object()
+# Methods of C types, as found on the type.
+BUILTIN_DESCRIPTORS = (types.MethodDescriptorType, types.WrapperDescriptorType)
+
+
+def text(value):
+    return value.unquote() if hasattr(value, 'unquote') else value
+
+
+def find_operator(form):
+    """Return (operator index) of the innermost call around the cursor.
+
+    form is the raw form slime sends, nested lists of strings holding
+    the cursor marker; index is the position of the argument at the
+    cursor.  Calls whose operator is not a name (e.g. "") are skipped
+    for the enclosing one.  Returns (None, 0) without a call.
+
+    """
+    if isinstance(form, list) and len(form) == 2 and form[0] == 'quote':
+        form = form[1]
+    operator, index = None, 0
+    while isinstance(form, list) and form:
+        head = text(form[0])
+        if isinstance(head, str) and head and head != CURSOR_MARKER \
+                and not isinstance(form[0], list):
+            position = None
+            for i, item in enumerate(form[1:]):
+                if item == CURSOR_MARKER or isinstance(item, list):
+                    position = i
+            operator, index = head, position or 0
+        inner = [item for item in form[1:] if isinstance(item, list)]
+        if not inner:
+            break
+        form = inner[-1]
+    return operator, index
+
+
+def resolve(name, namespace):
+    """Return the object a dotted name is bound to, or None.
+
+    The first part is looked up in namespace, then in builtins and
+    sys.modules; nothing is imported.  Attributes are looked up
+    statically, so no property or __getattr__ code runs, and methods
+    are bound to the instance or class they were looked up on, C
+    methods (like "abc".join) included.
+
+    """
+    parts = name.split('.')
+    head = parts[0]
+    if head in namespace:
+        obj = namespace[head]
+    elif hasattr(builtins, head):
+        obj = getattr(builtins, head)
+    elif head in sys.modules:
+        obj = sys.modules[head]
+    else:
+        return None
+    for part in parts[1:]:
+        try:
+            attribute = inspect.getattr_static(obj, part)
+        except AttributeError:
+            return None
+        if isinstance(attribute, staticmethod):
+            attribute = attribute.__func__
+        elif isinstance(attribute, classmethod):
+            attribute = types.MethodType(
+                attribute.__func__, obj if isinstance(obj, type)
+                else type(obj))
+        elif not isinstance(obj, (type, types.ModuleType)) and \
+                part not in getattr(obj, '__dict__', ()):
+            if isinstance(attribute, types.FunctionType):
+                attribute = types.MethodType(attribute, obj)
+            elif isinstance(attribute, BUILTIN_DESCRIPTORS):
+                attribute = attribute.__get__(obj)
+        obj = attribute
+    return obj
+
+
+def signature_parts(obj):
+    """Return the parameters of obj's signature as texts, or NO_ARGLIST.
+
+    Each part is (text, positional) where positional tells if the
+    parameter takes a positional argument; markers like "*" and "/"
+    are (text, None).
+
+    """
+    try:
+        signature = inspect.signature(obj)
+    except (TypeError, ValueError):
+        return NO_ARGLIST
+    parts = []
+    keyword_only = False
+    for parameter in signature.parameters.values():
+        kind = parameter.kind
+        if kind == parameter.VAR_POSITIONAL:
+            parts.append(('*' + parameter.name, True))
+            keyword_only = True
+            continue
+        if kind == parameter.VAR_KEYWORD:
+            parts.append(('**' + parameter.name, False))
+            continue
+        if kind == parameter.KEYWORD_ONLY and not keyword_only:
+            parts.append(('*', None))
+            keyword_only = True
+        name = parameter.name
+        if parameter.default is not parameter.empty:
+            name += '=' + safe_repr(parameter.default, DEFAULT_REPR)
+        parts.append((name, kind != parameter.KEYWORD_ONLY))
+        if kind == parameter.POSITIONAL_ONLY:
+            parts.append(('/', None))
+    # Only the last "/" of positional-only parameters is kept.
+    last = max([i for i, part in enumerate(parts) if part[0] == '/'] or [-1])
+    return tuple(part for i, part in enumerate(parts)
+                 if part[0] != '/' or i == last)
+
+
+def descriptor_of(method):
+    """Return the descriptor a bound C method was made from, or None."""
+    owner = getattr(method, '__self__', None)
+    if owner is None or isinstance(owner, (type, types.ModuleType)):
+        return None
+    try:
+        descriptor = inspect.getattr_static(type(owner), method.__name__)
+    except AttributeError:
+        return None
+    return descriptor if isinstance(descriptor, BUILTIN_DESCRIPTORS) \
+        else None
+
+
+def drop_self(parts):
+    """Return the parts of an unbound method's signature once bound."""
+    if parts and parts is not NO_ARGLIST and parts[0][1] and \
+            not parts[0][0].startswith('*'):
+        parts = parts[1:]
+    return parts
+
+
+def format_arglist(name, parts, index=None):
+    """Return "(name a b=1 *args)", the argument at index highlighted."""
+    current = None
+    if index is not None:
+        positional = [i for i, part in enumerate(parts) if part[1]]
+        if index < len(positional):
+            current = positional[index]
+        elif positional and parts[positional[-1]][0].startswith('*'):
+            current = positional[-1]
+    texts = [name]
+    for i, (part, positional) in enumerate(parts):
+        texts.append('===> {0} <==='.format(part) if i == current else part)
+    return '(' + ' '.join(texts) + ')'
+
+
+class ArglistCache(object):
+    """Signatures of callables, cached weakly by object.
+
+    Names are resolved on every query, so rebinding a name in the
+    namespace is seen right away; the signature of the object found
+    is computed once and dropped with the object.  Signatures are
+    computed by a daemon thread and waited for up to a timeout, so a
+    slow one (deep __wrapped__ chains, odd metaclasses) never holds a
+    query longer: it is cached when it completes instead.
+
+    Objects that can't be weakly referenced (method descriptors and
+    other C builtins) are held by the last strong_size entries of an
+    LRU cache instead.
+
+    """
+
+    def __init__(self, strong_size=1024):
+        self.lock = threading.Lock()
+        self.cache = weakref.WeakKeyDictionary()
+        self.strong = OrderedDict()
+        self.strong_size = strong_size
+        self.pending = {}
+
+    def cached(self, obj):
+        try:
+            return self.cache.get(obj)
+        except TypeError:
+            pass
+        with self.lock:
+            entry = self.strong.get(id(obj))
+            if entry is None or entry[0] is not obj:
+                return None
+            self.strong.move_to_end(id(obj))
+            return entry[1]
+
+    def store(self, obj, parts):
+        try:
+            self.cache[obj] = parts
+            return
+        except TypeError:
+            pass
+        with self.lock:
+            self.strong[id(obj)] = (obj, parts)
+            self.strong.move_to_end(id(obj))
+            while len(self.strong) > self.strong_size:
+                self.strong.popitem(last=False)
+
+    def parts(self, obj, timeout=None):
+        """Return the signature parts of obj, None if not ready in time.
+
+        Methods are cached under their function, or their descriptor
+        for C methods, whose first parameter is dropped when it's bound.
+
+        """
+        if isinstance(obj, types.MethodType) and \
+                isinstance(obj.__func__, types.FunctionType):
+            return drop_self(self.parts(obj.__func__, timeout))
+        if isinstance(obj, (types.BuiltinMethodType,
+                            types.MethodWrapperType)):
+            descriptor = descriptor_of(obj)
+            if descriptor is not None:
+                return drop_self(self.parts(descriptor, timeout))
+        parts = self.cached(obj)
+        if parts is not None:
+            return parts
+        with self.lock:
+            computation = self.pending.get(id(obj))
+            if computation is None:
+                computation = self.pending[id(obj)] = [threading.Event(),
+                                                       None]
+                thread = threading.Thread(
+                    target=self.compute, args=(obj, computation),
+                    name='swank-arglist')
+                thread.daemon = True
+                thread.start()
+        if not computation[0].wait(timeout):
+            return None
+        return computation[1]
+
+    def compute(self, obj, computation):
+        """Compute the signature parts of obj, caching them if possible."""
+        try:
+            parts = signature_parts(obj)
+        except Exception:
+            logger.exception('Signature of a %s failed', type(obj).__name__)
+            parts = NO_ARGLIST
+        self.store(obj, parts)
+        computation[1] = parts
+        with self.lock:
+            self.pending.pop(id(obj), None)
+        computation[0].set()
+
+    def arglist(self, name, namespace, index=None, timeout=None):
+        """Return the arglist text of name, NO_ARGLIST, or None.
+
+        NO_ARGLIST when name is unbound or has no signature, None when
+        its signature wasn't computed within timeout seconds.
+
+        """
+        obj = resolve(name, namespace)
+        if obj is None or not callable(obj):
+            return NO_ARGLIST
+        parts = self.parts(obj, timeout)
+        if parts is None or parts is NO_ARGLIST:
+            return parts
+        return format_arglist(name, parts, index)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import marshal
+import os
+import py_compile
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import logconfig
+import workers
+
+
+__all__ = ['Compiler', 'CompileResult', 'Note', 'compile_file',
+           'compile_source', 'load_bytecode', 'source_paths']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+# A compiler message; line is 1-based and column 0-based, as in ast.
+Note = namedtuple('Note', ['message', 'severity', 'filename', 'line',
+                           'column'])
+
+CompileResult = namedtuple('CompileResult', ['path', 'digest', 'notes',
+                                             'success', 'bytecode'])
+
+
+def warning_notes(caught, filename):
+    return [Note(str(warning.message), 'warning',
+                 warning.filename or filename, warning.lineno or 1, 0)
+            for warning in caught]
+
+
+def syntax_error_note(error, filename):
+    return Note(error.msg, 'error', error.filename or filename,
+                error.lineno or 1, max((error.offset or 1) - 1, 0))
+
+
+def compile_source(source, filename, optimize=-1):
+    """Compile source returning (code, notes), code is None on errors."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            code = compile(source, filename, 'exec', optimize=optimize)
+        except (SyntaxError, ValueError) as e:
+            code = None
+            error = e
+    notes = warning_notes(caught, filename)
+    if code is None:
+        if isinstance(error, SyntaxError):
+            notes.append(syntax_error_note(error, filename))
+        else:
+            notes.append(Note(str(error), 'error', filename, 1, 0))
+    return code, notes
+
+
+def compile_file(path, optimize=-1):
+    """Byte-compile path into its __pycache__, returning a CompileResult.
+
+    Runs in the worker processes.
+
+    """
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError) as e:
+        return CompileResult(path, None, [Note(str(e), 'error', path, 1, 0)],
+                             False, None)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            bytecode = py_compile.compile(path, doraise=True,
+                                          optimize=optimize)
+            error = None
+        except py_compile.PyCompileError as e:
+            bytecode = None
+            error = e
+    notes = warning_notes(caught, path)
+    if error is not None:
+        if isinstance(error.exc_value, SyntaxError):
+            notes.append(syntax_error_note(error.exc_value, path))
+        else:
+            notes.append(Note(error.msg, 'error', path, 1, 0))
+    return CompileResult(path, digest, notes, error is None, bytecode)
+
+
+def load_bytecode(path):
+    """Return the code object stored in the .pyc at path."""
+    with open(path, 'rb') as f:
+        return marshal.loads(f.read()[16:])
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class Compiler(object):
+    """Byte-compiler of files with results cached by content hash.
+
+    Batches of files are compiled by a process pool; the result of a
+    file whose content didn't change since it was last compiled, and
+    whose bytecode is still there, is returned without compiling.
+
+    """
+
+    def __init__(self, max_workers=None, pool_threshold=4, cache_size=4096):
+        self.max_workers = max_workers
+        self.pool_threshold = pool_threshold
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cached(self, path, optimize):
+        try:
+            digest = file_digest(path)
+        except (IOError, OSError):
+            return None
+        with self.lock:
+            result = self.cache.get((path, optimize))
+            if result is None or result.digest != digest:
+                return None
+            if result.bytecode and not os.path.exists(result.bytecode):
+                return None
+            self.cache.move_to_end((path, optimize))
+            return result
+
+    def remember(self, result, optimize):
+        if result.digest is None:
+            return
+        with self.lock:
+            self.cache[(result.path, optimize)] = result
+            self.cache.move_to_end((result.path, optimize))
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def compile_files(self, paths, optimize=-1):
+        """Return the CompileResult of each path, in order."""
+        results = dict((path, self.cached(path, optimize)) for path in paths)
+        stale = [path for path, result in results.items() if result is None]
+        if len(stale) < self.pool_threshold:
+            compiled = [compile_file(path, optimize) for path in stale]
+        else:
+            with ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=workers.context()) as executor:
+                compiled = list(executor.map(
+                    compile_file, stale, [optimize] * len(stale),
+                    chunksize=max(1, len(stale) // 64)))
+        for result in compiled:
+            self.remember(result, optimize)
+            results[result.path] = result
+        logger.debug('Compiled %s files, %s cached', len(stale),
+                     len(paths) - len(stale))
+        return [results[path] for path in paths]
+
+
+def source_paths(path):
+    """Return path, or the python files under path if it's a directory."""
+    if not os.path.isdir(path):
+        return [path]
+    paths = []
+    for directory, subdirectories, files in os.walk(path):
+        subdirectories[:] = sorted(name for name in subdirectories
+                                   if name != '__pycache__' and
+                                   not name.startswith('.'))
+        paths.extend(os.path.join(directory, name)
+                     for name in sorted(files) if name.endswith('.py'))
+    return paths
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+import bisect
+import builtins
+import keyword
+import logging
+import re
+import threading
+import time
+import types
+from collections import OrderedDict
+from itertools import islice
+
+import logconfig
+
+
+__all__ = ['CompletionIndex', 'prefix_range']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+# Highest code point, sorts after anything a prefix can be followed by.
+MAX_CHAR = u"\U0010ffff"
+
+
+def prefix_range(names, prefix):
+    """Return the (start, end) slice of sorted names starting with prefix."""
+    start = bisect.bisect_left(names, prefix)
+    end = bisect.bisect_left(names, prefix + MAX_CHAR, start)
+    return start, end
+
+
+def classify(value):
+    if isinstance(value, type):
+        return "class"
+    elif isinstance(value, types.ModuleType):
+        return "module"
+    elif callable(value):
+        return "function"
+    return "variable"
+
+
+class CompletionIndex(object):
+    """Sorted index of the names visible from a namespace.
+
+    Names from the namespace, builtins and keywords are kept in one
+    sorted list so prefix completion is a pair of bisections.  The
+    namespace is diffed against the indexed names when it changes
+    size or after invalidate() is called (e.g. after each eval), and
+    only added and removed names are updated.  Completions for dotted
+    paths (os.pa) resolve the head and complete over its attributes,
+    which are cached for modules and classes.
+
+    """
+
+    rebuild_ratio = 16
+    attribute_cache_size = 128
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.lock = threading.RLock()
+        self.counts = {}
+        self.names = []
+        self.known = set()
+        self.last = None
+        self.joined = None
+        self.dirty = True
+        self.attribute_cache = OrderedDict()
+        self.static = dict((name, "keyword") for name in keyword.kwlist)
+        for name in dir(builtins):
+            self.static[name] = classify(getattr(builtins, name))
+        self.update(self.static, ())
+
+    def invalidate(self):
+        """Mark the namespace as changed."""
+        self.dirty = True
+
+    def update(self, added, removed):
+        counts = self.counts
+        names = self.names
+        rebuild = (len(added) + len(removed)) * self.rebuild_ratio > len(names)
+        for name in added:
+            count = counts.get(name, 0)
+            counts[name] = count + 1
+            if not count and not rebuild:
+                bisect.insort(names, name)
+        for name in removed:
+            count = counts.pop(name) - 1
+            if count:
+                counts[name] = count
+            elif not rebuild:
+                del names[bisect.bisect_left(names, name)]
+        if rebuild:
+            self.names = sorted(counts)
+        self.joined = None
+
+    def refresh(self):
+        """Bring the index up to date with the namespace.
+
+        Dicts keep insertion order, so when the namespace grew and the
+        names before the new ones end with the last indexed name, only
+        the new names are read (from the end).  Otherwise (names
+        removed, or an invalidate() with the same size) the whole
+        namespace is diffed.
+
+        """
+        size = len(self.namespace)
+        known = len(self.known)
+        if not self.dirty and size == known:
+            return
+        with self.lock:
+            namespace = self.namespace
+            added = None
+            if size > known and self.last is not None:
+                names = reversed(namespace)
+                added = list(islice(names, size - known))
+                if next(names, None) != self.last:
+                    added = None
+            if added is not None:
+                self.update(added, ())
+                self.known.update(added)
+            else:
+                current = set(namespace)
+                self.update(current - self.known, self.known - current)
+                self.known = current
+            try:
+                self.last = next(reversed(namespace), None)
+            except TypeError:
+                # No reversible dicts (Python < 3.8), always diff.
+                self.last = None
+            self.dirty = False
+
+    def resolve(self, path):
+        """Return the object named by a dotted path."""
+        parts = path.split(".")
+        try:
+            obj = self.namespace[parts[0]]
+        except KeyError:
+            obj = getattr(builtins, parts[0])
+        for part in parts[1:]:
+            obj = getattr(obj, part)
+        return obj
+
+    def attributes(self, obj):
+        """Return the sorted attribute names of obj."""
+        if not isinstance(obj, (type, types.ModuleType)):
+            return sorted(dir(obj))
+        key = id(obj)
+        version = len(vars(obj))
+        with self.lock:
+            cached = self.attribute_cache.get(key)
+            if cached is not None and cached[0] is obj and \
+                    cached[1] == version:
+                self.attribute_cache.move_to_end(key)
+                return cached[2]
+        names = sorted(dir(obj))
+        with self.lock:
+            self.attribute_cache[key] = (obj, version, names)
+            if len(self.attribute_cache) > self.attribute_cache_size:
+                self.attribute_cache.popitem(last=False)
+        return names
+
+    def candidates(self, text):
+        """Return (head, sorted names, name prefix) to complete text."""
+        if "." not in text:
+            self.refresh()
+            return "", self.names, text
+        head, _, prefix = text.rpartition(".")
+        try:
+            names = self.attributes(self.resolve(head))
+        except Exception:
+            return head + ".", [], prefix
+        if not prefix.startswith("_"):
+            names = [name for name in names if not name.startswith("_")]
+        return head + ".", names, prefix
+
+    def complete(self, text):
+        """Return the sorted completions of text."""
+        head, names, prefix = self.candidates(text)
+        start, end = prefix_range(names, prefix)
+        if not head:
+            return names[start:end]
+        return [head + name for name in names[start:end]]
+
+    def kind(self, name):
+        try:
+            return classify(self.resolve(name))
+        except Exception:
+            return self.static.get(name, "variable")
+
+    def fuzzy(self, text, limit=300, time_limit=1.5):
+        """Return (matches, interrupted) for a fuzzy search of text.
+
+        Each match is a (completion, score, chunks) tuple, where chunks
+        are (offset, string) pairs of the matched characters.  Matches
+        are sorted by score, best first.  Searching stops after
+        time_limit seconds and interrupted is then True.
+
+        """
+        deadline = time.time() + time_limit
+        head, names, pattern = self.candidates(text)
+        if not pattern:
+            return [(head + name, 0.0, []) for name in names[:limit]], False
+        if head:
+            joined = "\n".join(names)
+        else:
+            with self.lock:
+                if self.joined is None:
+                    self.joined = "\n".join(names)
+                joined = self.joined
+        regexp = re.compile(
+            "^[^\n]*?" + "[^\n]*?".join(re.escape(char) for char in pattern) +
+            "[^\n]*", re.MULTILINE | re.IGNORECASE)
+        matches = []
+        interrupted = False
+        for count, match in enumerate(regexp.finditer(joined)):
+            name = match.group()
+            score, chunks = self.score(name, pattern)
+            matches.append((score, name, chunks))
+            if not count % 1000 and time.time() > deadline:
+                interrupted = True
+                break
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        offset = len(head)
+        return [(head + name, score,
+                 [(offset + start, chunk) for start, chunk in chunks])
+                for score, name, chunks in matches[:limit]], interrupted
+
+    def score(self, name, pattern):
+        """Score a fuzzy match of pattern in name, higher is better."""
+        lowered = name.lower()
+        positions = []
+        start = 0
+        for char in pattern.lower():
+            start = lowered.index(char, start)
+            positions.append(start)
+            start += 1
+        score = 0.0
+        previous = -2
+        chunks = []
+        for position in positions:
+            if position == 0:
+                score += 10
+            elif name[position - 1] in "_.":
+                score += 5
+            elif position == previous + 1:
+                score += 3
+            else:
+                score += 1
+            if position == previous + 1:
+                offset, chunk = chunks[-1]
+                chunks[-1] = (offset, chunk + name[position])
+            else:
+                chunks.append((position, name[position]))
+            previous = position
+        score -= len(name) * 0.01
+        return score, chunks
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import linecache
+import logging
+import os.path
+import threading
+from itertools import islice
+
+import logconfig
+from interrupts import Abort
+from reprs import SafeRepr, safe_repr
+from scheduler import thread_key
+
+
+__all__ = ['DebugLevel', 'Debugger', 'FrameNotFound', 'LOCAL_REPR',
+           'exception_message', 'is_swank_frame']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+SWANK_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+CONDITION_REPR = SafeRepr(maxstring=400, maxother=400, maxlevel=2,
+                          maxitems=10)
+LOCAL_REPR = SafeRepr(maxstring=200, maxother=200, maxlevel=3, maxitems=10)
+
+
+class FrameNotFound(Abort):
+    """No frame with that index in the backtrace."""
+
+
+class DebugLevel(object):
+    """An exception being debugged in a swank thread.
+
+    Only the traceback is kept: frames are found by index when Emacs
+    asks for them, innermost first, and described or rendered as
+    bounded reprs one range at a time.  The outer frames of swank
+    itself (dispatch, eval) are left out, unless the error is in swank.
+
+    """
+
+    def __init__(self, level, thread, exception, request_id):
+        self.level = level
+        self.thread = thread
+        self.exception = exception
+        self.request_id = request_id
+        self._tracebacks = None
+
+    @property
+    def message(self):
+        return exception_message(self.exception)
+
+    def condition(self):
+        """Return (message type extras) of the exception."""
+        return [self.message,
+                "[Condition of type {0}]".format(
+                    type(self.exception).__name__),
+                False]
+
+    @property
+    def tracebacks(self):
+        if self._tracebacks is None:
+            tracebacks = []
+            tb = self.exception.__traceback__
+            while tb is not None:
+                tracebacks.append(tb)
+                tb = tb.tb_next
+            outer = 0
+            while outer < len(tracebacks) and is_swank_frame(
+                    tracebacks[outer].tb_frame):
+                outer += 1
+            if outer < len(tracebacks):
+                del tracebacks[:outer]
+            tracebacks.reverse()
+            self._tracebacks = tracebacks
+        return self._tracebacks
+
+    def __len__(self):
+        return len(self.tracebacks)
+
+    def traceback(self, index):
+        tracebacks = self.tracebacks
+        if not 0 <= index < len(tracebacks):
+            raise FrameNotFound("No frame {0} in debugger level {1}".format(
+                index, self.level))
+        return tracebacks[index]
+
+    def frame(self, index):
+        return self.traceback(index).tb_frame
+
+    def describe(self, index):
+        """Return "function (filename:line) source" for frame index."""
+        tb = self.traceback(index)
+        code = tb.tb_frame.f_code
+        description = "{0} ({1}:{2})".format(
+            code.co_name, code.co_filename, tb.tb_lineno)
+        source = linecache.getline(code.co_filename, tb.tb_lineno).strip()
+        if source:
+            description += " " + source
+        return description
+
+    def frames(self, start=0, end=None):
+        """Return (index description) for the frames from start to end.
+
+        end is exclusive, and nil (or None) means the outermost frame.
+
+        """
+        count = len(self)
+        end = min(end, count) if isinstance(end, int) else count
+        return [[index, self.describe(index)]
+                for index in range(max(start, 0), end)]
+
+    def locals(self, index, limit=None):
+        """Return the (name value) locals of frame index."""
+        items = self.frame(index).f_locals.items()
+        return list(items if limit is None else islice(items, limit))
+
+    def render_locals(self, index, limit=200):
+        """Return (name repr) of the first limit locals of frame index.
+
+        Values are rendered with the LOCAL_REPR budgets, so a frame
+        holding huge objects costs no more than one holding small ones.
+
+        """
+        return [(name, safe_repr(value, LOCAL_REPR))
+                for name, value in self.locals(index, limit)]
+
+    def eval_in_frame(self, string, index):
+        """Eval string with the globals and (a copy of) the locals of frame.
+
+        Statements are run and return None.
+
+        """
+        frame = self.frame(index)
+        namespace = dict(frame.f_locals)
+        try:
+            code = compile(string, '<string>', 'eval')
+        except SyntaxError:
+            exec(compile(string, '<string>', 'exec'), frame.f_globals,
+                 namespace)
+            return None
+        return eval(code, frame.f_globals, namespace)
+
+    def source(self, index):
+        """Return (filename line) of frame index."""
+        tb = self.traceback(index)
+        return tb.tb_frame.f_code.co_filename, tb.tb_lineno
+
+
+def exception_message(exception):
+    """Return "type: message" of exception, cut to CONDITION_REPR size."""
+    try:
+        text = str(exception)
+    except Exception:
+        text = safe_repr(exception, CONDITION_REPR)
+    if len(text) > CONDITION_REPR.maxstring:
+        text = text[:CONDITION_REPR.maxstring] + "..."
+    return "{0}: {1}".format(type(exception).__name__, text)
+
+
+def is_swank_frame(frame):
+    """Return True if frame runs code of a swank module.
+
+    Code compiled from strings (e.g. "<string>") is never swank's.
+
+    """
+    filename = frame.f_code.co_filename
+    if filename.startswith('<'):
+        return False
+    return os.path.dirname(os.path.realpath(filename)) == SWANK_DIRECTORY
+
+
+class Debugger(object):
+    """Debugger levels of a connection, numbered from 1 in each thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels = []
+
+    def enter(self, thread, exception, request_id):
+        """Return a new DebugLevel for exception raised in thread."""
+        key = thread_key(thread)
+        with self.lock:
+            level = 1 + sum(1 for debug_level in self.levels
+                            if thread_key(debug_level.thread) == key)
+            debug_level = DebugLevel(level, thread, exception, request_id)
+            self.levels.append(debug_level)
+        return debug_level
+
+    def current(self, thread, level=None):
+        """Return the innermost (or the given) level of thread, or None."""
+        key = thread_key(thread)
+        with self.lock:
+            for debug_level in reversed(self.levels):
+                if thread_key(debug_level.thread) != key:
+                    continue
+                if level is None or debug_level.level == level:
+                    return debug_level
+        return None
+
+    def leave(self, thread, level=1):
+        """Drop the levels of thread from level up, returning them."""
+        key = thread_key(thread)
+        with self.lock:
+            left = [debug_level for debug_level in self.levels
+                    if thread_key(debug_level.thread) == key and
+                    debug_level.level >= level]
+            self.levels = [debug_level for debug_level in self.levels
+                           if debug_level not in left]
+        left.reverse()
+        return left
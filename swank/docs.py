@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import inspect
+import logging
+import os
+import pydoc
+import sys
+import threading
+import types
+from collections import OrderedDict
+
+import logconfig
+
+
+__all__ = ['DocCache', 'describe', 'describe_function', 'documentation',
+           'module_version', 'summary']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+def describe(obj, name):
+    """Return the pydoc description of obj, as help() shows it."""
+    return pydoc.render_doc(obj, title=name + ": %s", renderer=pydoc.plaintext)
+
+
+def describe_function(obj, name):
+    """Return the signature and documentation of a callable obj."""
+    if not callable(obj):
+        return "{0} is not a function".format(name)
+    if inspect.isroutine(obj):
+        return pydoc.plaintext.document(obj)
+    return describe(obj, name)
+
+
+def documentation(obj, name):
+    """Return "name(signature)" and the docstring of obj."""
+    heading = name
+    if callable(obj):
+        try:
+            heading += str(inspect.signature(obj))
+        except (TypeError, ValueError):
+            pass
+    doc = inspect.getdoc(obj) or "Not documented."
+    return heading + "\n\n" + doc
+
+
+def summary(obj, name):
+    """Return a short description of obj, while the full one renders."""
+    doc = inspect.getdoc(obj)
+    text = "{0}: {1}".format(name, pydoc.describe(obj))
+    if doc:
+        text += "\n\n" + doc.split("\n\n", 1)[0]
+    return text + "\n\n[The full description is being rendered, " \
+        "ask again shortly.]"
+
+
+def module_version(obj):
+    """Return what identifies the version of obj's module, or None.
+
+    That's the module object, its __version__ and the modification
+    time of its file, so reloading or editing the module changes it.
+    Objects of modules not in sys.modules (e.g. of the session) have
+    no version.
+
+    """
+    if isinstance(obj, types.ModuleType):
+        module = obj
+        if sys.modules.get(module.__name__) is not module:
+            return None
+    else:
+        name = getattr(obj, '__module__', None)
+        module = sys.modules.get(name) if isinstance(name, str) else None
+        if module is None:
+            return None
+    filename = getattr(module, '__file__', None)
+    try:
+        mtime = os.stat(filename).st_mtime_ns if filename else None
+    except OSError:
+        mtime = None
+    return (id(module), str(getattr(module, '__version__', None)), mtime)
+
+
+def size(obj):
+    """Return the number of members pydoc documents for obj."""
+    if isinstance(obj, types.ModuleType):
+        return len(vars(obj))
+    if isinstance(obj, type):
+        try:
+            return len(dir(obj))
+        except Exception:
+            return 0
+    return 0
+
+
+class DocCache(object):
+    """LRU cache of rendered descriptions.
+
+    Entries are keyed by (kind, id(obj), version, name), the name
+    being part of the text, and hold obj, so an id is not reused while
+    cached.  Objects with more than large
+    members (big modules and classes) are rendered by a daemon thread,
+    waited for up to a timeout; a rendering taking longer completes in
+    the background and is found in the cache when asked again.
+
+    """
+
+    def __init__(self, size=256, large=200):
+        self.size = size
+        self.large = large
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key, obj):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] is not obj:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def store(self, key, obj, text):
+        with self.lock:
+            self.entries[key] = (obj, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get(self, kind, render, obj, name, version=None, timeout=None):
+        """Return render(obj, name), cached, or None if not ready in time."""
+        key = (kind, id(obj), version, name)
+        text = self.lookup(key, obj)
+        if text is not None:
+            return text
+        if size(obj) <= self.large:
+            text = render(obj, name)
+            self.store(key, obj, text)
+            return text
+        with self.lock:
+            rendering = self.pending.get(key)
+            if rendering is None:
+                rendering = self.pending[key] = [threading.Event(), None]
+                thread = threading.Thread(
+                    target=self.render, args=(key, render, obj, name,
+                                              rendering),
+                    name='swank-docs')
+                thread.daemon = True
+                thread.start()
+        if not rendering[0].wait(timeout):
+            return None
+        return rendering[1]
+
+    def render(self, key, render, obj, name, rendering):
+        try:
+            text = render(obj, name)
+        except Exception as e:
+            logger.exception('Rendering the description of %s failed', name)
+            text = "Description of {0} failed: {1}: {2}".format(
+                name, type(e).__name__, e)
+        else:
+            self.store(key, obj, text)
+        rendering[1] = text
+        with self.lock:
+            self.pending.pop(key, None)
+        rendering[0].set()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import logging
+import socket
+import threading
+
+import logconfig
+
+
+__all__ = ['HEADER_LENGTH', 'ENCODINGS', 'MAX_PAYLOAD', 'FrameDecoder',
+           'FrameTooLarge', 'FrameWriter', 'encode_frame', 'python_encoding',
+           'set_nodelay']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+HEADER_LENGTH = 6
+# Largest payload the hex digits of the header can count.
+MAX_PAYLOAD = 16 ** HEADER_LENGTH - 1
+ENCODINGS = {
+    "iso-latin-1-unix": "latin-1",
+    "iso-utf-8-unix": "utf-8"
+}
+# Most buffers handed to a single sendmsg call.
+IOV_MAX = 1024
+
+
+class FrameTooLarge(ValueError):
+    """A payload has more bytes than a frame header can count."""
+
+
+def python_encoding(coding_system):
+    """Return the python codec name for a slime coding system."""
+    return ENCODINGS.get(coding_system, "utf-8")
+
+
+def encode_frame(payload, encoding="utf-8"):
+    """Return the frame of the lisp text payload as bytes.
+
+    The header counts the bytes of the encoded payload, which is
+    encoded once.  ASCII text (most replies) has as many bytes as
+    characters in every supported encoding, so its header is known
+    beforehand and header and payload are encoded together; otherwise
+    the payload is encoded first and the header prepended.  Characters
+    the encoding can't represent (e.g. in latin-1 sessions) are sent
+    as "?".  Raises FrameTooLarge for payloads of more than
+    MAX_PAYLOAD bytes, whose header would be misread by Emacs.
+
+    """
+    if payload.isascii():
+        size = len(payload)
+        data = None
+    else:
+        data = payload.encode(encoding, "replace")
+        size = len(data)
+    if size > MAX_PAYLOAD:
+        raise FrameTooLarge(
+            "Message of {0} bytes is too large for a frame".format(size))
+    if data is None:
+        return ("%06x" % size + payload).encode("ascii")
+    return b"%06x" % size + data
+
+
+def set_nodelay(sock, enabled=True):
+    """Turn Nagle's algorithm off (enabled) or on for a TCP socket.
+
+    Returns False for sockets without the option (e.g. unix sockets).
+
+    """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                        1 if enabled else 0)
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+class FrameDecoder(object):
+    """Incremental decoder for swank wire frames.
+
+    Each frame is a 6 hex digit header with the payload length
+    followed by the payload itself.  Data is received straight into a
+    preallocated bytearray through a memoryview, so partial reads are
+    accumulated without concatenating chunks, and every complete frame
+    found in the buffer is handed out, several per read if the client
+    pipelined them.
+
+    """
+
+    def __init__(self, size=64 * 1024, header_length=HEADER_LENGTH):
+        self.header_length = header_length
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        """Return the number of buffered bytes not yet decoded."""
+        return self.end - self.start
+
+    def reserve(self, size):
+        """Make room for at least size more bytes at the end."""
+        if len(self.buffer) - self.end >= size:
+            return
+        pending = self.end - self.start
+        capacity = len(self.buffer)
+        while capacity - pending < size:
+            capacity *= 2
+        if capacity == len(self.buffer):
+            # Compact: move pending bytes to the front.
+            self.view[:pending] = self.view[self.start:self.end]
+        else:
+            buffer = bytearray(capacity)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.view.release()
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        self.start = 0
+        self.end = pending
+
+    def needed(self):
+        """Return the number of bytes missing to complete next frame."""
+        pending = self.end - self.start
+        if pending < self.header_length:
+            return self.header_length - pending
+        return self.header_length + self.frame_length() - pending
+
+    def frame_length(self):
+        header = bytes(self.view[self.start:self.start + self.header_length])
+        try:
+            return int(header, 16)
+        except ValueError:
+            raise ValueError("Invalid frame header: {0!r}".format(header))
+
+    def recv_from(self, sock, size=64 * 1024):
+        """Receive available data from sock into the buffer.
+
+        Returns the number of bytes read, 0 means the peer closed the
+        connection.
+
+        """
+        self.reserve(max(size, self.needed()))
+        count = sock.recv_into(self.view[self.end:])
+        self.end += count
+        return count
+
+    def feed(self, data):
+        """Append data received by other means (e.g. asyncio streams)."""
+        self.reserve(len(data))
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def frames(self):
+        """Yield the payload of every complete frame buffered."""
+        header_length = self.header_length
+        while self.end - self.start >= header_length:
+            length = self.frame_length()
+            begin = self.start + header_length
+            if self.end - begin < length:
+                break
+            self.start = begin + length
+            yield bytes(self.view[begin:self.start])
+        if self.start == self.end:
+            self.start = self.end = 0
+
+
+class FrameWriter(object):
+    """Coalescing writer of frames to a socket, safe across threads.
+
+    Frames are queued and sent by whichever thread finds the writer
+    idle.  Frames queued by other threads while it is sending are sent
+    along with its next batch, in one sendmsg (scatter-gather) call,
+    so bursts of events from several threads cost a syscall or two
+    instead of one each.  Frames written with flush=False wait for the
+    next flushed write, or until max_pending bytes are queued.
+
+    """
+
+    def __init__(self, sock, max_pending=64 * 1024):
+        self.sock = sock
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = []
+        self.pending_size = 0
+        self.sending = False
+        self.frames = 0
+        self.syscalls = 0
+
+    def write(self, data, flush=True):
+        """Queue the encoded frame data, sending it if flush."""
+        with self.lock:
+            self.pending.append(data)
+            self.pending_size += len(data)
+            self.frames += 1
+            if self.sending or not (
+                    flush or self.pending_size >= self.max_pending):
+                return
+            self.sending = True
+        self.drain()
+
+    def flush(self):
+        """Send the queued frames, unless another thread is sending."""
+        with self.lock:
+            if self.sending or not self.pending:
+                return
+            self.sending = True
+        self.drain()
+
+    def drain(self):
+        try:
+            while True:
+                with self.lock:
+                    batch, self.pending = self.pending, []
+                    self.pending_size = 0
+                    if not batch:
+                        self.sending = False
+                        return
+                self.send_batch(batch)
+        except Exception:
+            with self.lock:
+                self.pending = []
+                self.pending_size = 0
+                self.sending = False
+            raise
+
+    def send_batch(self, batch):
+        """Send all of batch, with as few syscalls as possible."""
+        if not hasattr(self.sock, 'sendmsg'):
+            self.syscalls += 1
+            self.sock.sendall(b"".join(batch))
+            return
+        views = [memoryview(data) for data in batch if data]
+        first = 0
+        while first < len(views):
+            sent = self.sock.sendmsg(views[first:first + IOV_MAX])
+            self.syscalls += 1
+            while sent:
+                size = len(views[first])
+                if sent < size:
+                    views[first] = views[first][sent:]
+                    break
+                sent -= size
+                first += 1
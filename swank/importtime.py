@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+import threading
+import time
+
+import logconfig
+
+
+__all__ = ['ImportNode', 'ImportProfiler']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class ImportNode(object):
+    """A module imported while profiling, with the imports it made."""
+
+    __slots__ = ('name', 'total', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.total = 0.0
+        self.children = []
+
+    @property
+    def own(self):
+        return self.total - sum(child.total for child in self.children)
+
+    def sort(self):
+        self.children.sort(key=lambda child: child.total, reverse=True)
+        for child in self.children:
+            child.sort()
+
+    def to_list(self, scale=1000.0):
+        """Return (name total own children) with times in milliseconds."""
+        return [self.name, round(self.total * scale, 3),
+                round(self.own * scale, 3),
+                [child.to_list(scale) for child in self.children]]
+
+
+class TimedLoader(object):
+    """Loader proxy timing exec_module of the wrapped loader."""
+
+    def __init__(self, loader, profiler, node, parent, found):
+        self.loader = loader
+        self.profiler = profiler
+        self.node = node
+        self.parent = parent
+        self.found = found
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, 'create_module', None)
+        return create_module(spec) if create_module else None
+
+    def exec_module(self, module):
+        stack = self.profiler.stack
+        stack.append(self.node)
+        start = self.profiler.timer()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            stack.pop()
+            self.node.total += self.profiler.timer() - start + self.found
+            self.parent.children.append(self.node)
+            spec = getattr(module, '__spec__', None)
+            if spec is not None and spec.loader is self:
+                spec.loader = self.loader
+            if getattr(module, '__loader__', None) is self:
+                module.__loader__ = self.loader
+
+
+class ImportProfiler(object):
+    """Time the imports run in the calling thread, as -X importtime.
+
+    Used as a context manager, it installs a meta path finder which
+    delegates to the other finders and wraps the loader found, timing
+    finding and executing each module.  Imports made while executing
+    a module become its children in the tree.
+
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.root = ImportNode(None)
+        self.stack = [self.root]
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.current_thread()
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            sys.meta_path.remove(self)
+        except ValueError:
+            pass
+        return False
+
+    def find_spec(self, fullname, path=None, target=None):
+        if threading.current_thread() is not self.thread:
+            return None
+        start = self.timer()
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if loader is None or not hasattr(loader, 'exec_module'):
+            return spec
+        spec.loader = TimedLoader(loader, self, ImportNode(fullname),
+                                  self.stack[-1], self.timer() - start)
+        return spec
+
+    def tree(self):
+        """Return the imported modules, slowest first."""
+        self.root.sort()
+        return self.root.children
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from collections import deque
+from collections.abc import Iterator, Mapping, Sequence, Set
+from itertools import islice
+
+import logconfig
+from lisp import symbol
+from reprs import SafeRepr, safe_repr
+
+
+__all__ = ['AttributesView', 'Inspector', 'IterableView', 'IteratorView',
+           'MappingView', 'SequenceView', 'view_for']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+PART_REPR = SafeRepr(maxstring=80, maxother=80, maxlevel=2, maxitems=5)
+TITLE_REPR = SafeRepr(maxstring=60, maxother=60, maxlevel=1, maxitems=3)
+
+
+class SequenceView(object):
+    """Elements of a random access sequence, labelled by index."""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def length(self):
+        return len(self.obj)
+
+    def items(self, start, end):
+        obj = self.obj
+        end = min(end, len(obj))
+        return [(str(i), obj[i]) for i in range(start, end)]
+
+    def get(self, index):
+        return self.obj[index]
+
+
+class IterableView(object):
+    """Elements of a sized iterable without random access (sets).
+
+    Reaching element n means skipping the n before it, so the
+    iterator left by the last window is kept and reused when the next
+    window starts where that one ended, making paging linear.
+
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.position = None
+        self.iterator = None
+        self.size = None
+
+    def length(self):
+        return len(self.obj)
+
+    def iterate(self):
+        return iter(self.obj)
+
+    def label(self, index, item):
+        return str(index)
+
+    def value(self, item):
+        return item
+
+    def walk(self, start, count):
+        size = len(self.obj)
+        if self.position != start or self.size != size:
+            self.iterator = islice(self.iterate(), start, None)
+            self.size = size
+        items = list(islice(self.iterator, count))
+        self.position = start + len(items)
+        return items
+
+    def items(self, start, end):
+        items = self.walk(start, max(0, end - start))
+        return [(self.label(start + i, item), self.value(item))
+                for i, item in enumerate(items)]
+
+    def get(self, index):
+        for item in self.walk(index, 1):
+            return self.value(item)
+        raise IndexError(index)
+
+
+class MappingView(IterableView):
+    """Items of a mapping, labelled by the repr of their keys."""
+
+    def iterate(self):
+        return iter(self.obj.items())
+
+    def label(self, index, item):
+        return safe_repr(item[0], PART_REPR)
+
+    def value(self, item):
+        return item[1]
+
+
+class IteratorView(object):
+    """Elements of an iterator (e.g. a generator), consumed on demand.
+
+    The length is unknown until the iterator is exhausted, until then
+    it's reported as one past the elements consumed so there's always
+    more to ask for.
+
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.consumed = []
+        self.exhausted = False
+
+    def length(self):
+        if self.exhausted:
+            return len(self.consumed)
+        return len(self.consumed) + 1
+
+    def fill(self, end):
+        missing = end - len(self.consumed)
+        if missing > 0 and not self.exhausted:
+            items = list(islice(self.obj, missing))
+            self.consumed.extend(items)
+            self.exhausted = len(items) < missing
+
+    def items(self, start, end):
+        self.fill(end)
+        return [(str(i), self.consumed[i])
+                for i in range(start, min(end, len(self.consumed)))]
+
+    def get(self, index):
+        self.fill(index + 1)
+        return self.consumed[index]
+
+
+class AttributesView(object):
+    """Attributes of any other object, looked up as requested."""
+
+    def __init__(self, obj):
+        self.obj = obj
+        try:
+            self.names = sorted(dir(obj))
+        except Exception:
+            self.names = []
+
+    def length(self):
+        return len(self.names)
+
+    def get(self, index):
+        try:
+            return getattr(self.obj, self.names[index])
+        except Exception as e:
+            return e
+
+    def items(self, start, end):
+        return [(name, self.get(start + i))
+                for i, name in enumerate(self.names[start:end])]
+
+
+def view_for(obj):
+    """Return the lazy view listing the parts of obj."""
+    if isinstance(obj, Mapping):
+        return MappingView(obj)
+    elif isinstance(obj, (str, bytes)):
+        return AttributesView(obj)
+    elif isinstance(obj, Sequence):
+        return SequenceView(obj)
+    elif isinstance(obj, Set):
+        return IterableView(obj)
+    elif isinstance(obj, Iterator):
+        return IteratorView(obj)
+    return AttributesView(obj)
+
+
+class Inspector(object):
+    """Inspector state of a connection.
+
+    Every inspected object gets a lazy view, content is only computed
+    for the ranges requested and each part is shown with a truncated
+    repr.  Each element is rendered as four content items (label,
+    separator, value part and newline) after a fixed header, so
+    content positions map directly to element indices.  History is
+    bounded.
+
+    """
+
+    items_per_part = 4
+    header_length = 3
+    default_range = 500
+
+    def __init__(self, history_size=50):
+        self.lock = threading.RLock()
+        self.history = deque(maxlen=history_size)
+        self.position = -1
+        self.view = None
+
+    @property
+    def current(self):
+        return self.history[self.position] if self.history else None
+
+    def reset(self):
+        with self.lock:
+            self.history.clear()
+            self.position = -1
+            self.view = None
+
+    def inspect(self, obj):
+        """Make obj the inspected object and return its content."""
+        with self.lock:
+            while len(self.history) > self.position + 1:
+                self.history.pop()
+            self.history.append(obj)
+            self.position = len(self.history) - 1
+            return self.show(obj)
+
+    def show(self, obj):
+        self.view = view_for(obj)
+        return [
+            symbol(":title"), self.title(obj),
+            symbol(":id"), self.position,
+            symbol(":content"), self.content_range(0, self.default_range)
+        ]
+
+    def title(self, obj):
+        return "{0} {1}".format(type(obj).__name__, safe_repr(obj, TITLE_REPR))
+
+    def header(self):
+        obj = self.current
+        length = self.view.length()
+        if isinstance(self.view, IteratorView) and not self.view.exhausted:
+            length = "unknown"
+        return [
+            "Type: ", [symbol(":value"), type(obj).__name__, -1],
+            "\nParts: {0}\n\n".format(length),
+        ]
+
+    def content_range(self, start, end):
+        """Return (content length start end) for content positions."""
+        with self.lock:
+            header = self.header_length
+            per_part = self.items_per_part
+            content = self.header()[start:end] if start < header else []
+            first = max(0, start - header) // per_part
+            last = (max(0, end - header) + per_part - 1) // per_part
+            skip = max(0, start - header) - first * per_part
+            parts = []
+            for i, (label, value) in enumerate(self.view.items(first, last)):
+                parts.extend([
+                    label, ": ",
+                    [symbol(":value"), safe_repr(value, PART_REPR), first + i],
+                    "\n"])
+            content.extend(parts[skip:skip + max(0, end - max(start, header))])
+            length = header + self.view.length() * per_part
+            end = min(end, length)
+            return [content, length, start, end]
+
+    def nth_part(self, index):
+        with self.lock:
+            if index == -1:
+                return type(self.current)
+            return self.view.get(index)
+
+    def pop(self):
+        """Go back in history, return content or None at the start."""
+        with self.lock:
+            if self.position <= 0:
+                return None
+            self.position -= 1
+            return self.show(self.current)
+
+    def next(self):
+        """Go forward in history, return content or None at the end."""
+        with self.lock:
+            if self.position + 1 >= len(self.history):
+                return None
+            self.position += 1
+            return self.show(self.current)
+
+    def reinspect(self):
+        with self.lock:
+            return self.show(self.current)
+
+    def format_history(self):
+        with self.lock:
+            lines = []
+            for i, obj in enumerate(self.history):
+                marker = "*" if i == self.position else " "
+                lines.append("{0} {1} {2}".format(
+                    marker, i, safe_repr(obj, TITLE_REPR)))
+            return "\n".join(lines)
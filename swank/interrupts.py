@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import logconfig
+from scheduler import thread_key
+
+
+__all__ = ['Abort', 'EvalInterrupt', 'Evaluation', 'Evaluations',
+           'Interrupted', 'async_raise', 'text_location',
+           'traceback_location']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+# Last frame of a formatted traceback.
+FRAME_PATTERN = re.compile(r'File "([^"]*)", line (\d+), in (\S+)')
+
+
+class EvalInterrupt(KeyboardInterrupt):
+    """Raised asynchronously in a thread running an evaluation.
+
+    A KeyboardInterrupt, so `except Exception` in user code won't
+    swallow it.
+
+    """
+
+
+class Abort(Exception):
+    """Raised by handlers to reply (:abort message) to Emacs."""
+
+
+class Interrupted(Abort):
+    """An evaluation was interrupted, by Emacs or its timeout."""
+
+    def __init__(self, reason, elapsed, location=None):
+        message = "Evaluation {0} after {1:.3f}s".format(
+            "timed out" if reason == "timeout" else "interrupted", elapsed)
+        if location:
+            message += " at {0}:{1} in {2}".format(*location)
+        Abort.__init__(self, message)
+        self.reason = reason
+        self.elapsed = elapsed
+        self.location = location
+
+
+def async_raise(thread_id, exception):
+    """Raise exception in the thread with thread_id, None cancels it.
+
+    The exception is raised when that thread next runs python code,
+    so a thread blocked in a C call only sees it once it returns.
+
+    """
+    import ctypes
+    count = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id),
+        ctypes.py_object(exception) if exception is not None else None)
+    if count > 1:
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_ulong(thread_id), None)
+        return False
+    return count == 1
+
+
+def traceback_location(tb):
+    """Return (filename line function) of the innermost frame of tb."""
+    if tb is None:
+        return None
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    code = tb.tb_frame.f_code
+    return (code.co_filename, tb.tb_lineno, code.co_name)
+
+
+def text_location(text):
+    """Return (filename line function) of a formatted traceback."""
+    frames = FRAME_PATTERN.findall(text or "")
+    if not frames:
+        return None
+    filename, line, function = frames[-1]
+    return (filename, int(line), function)
+
+
+class Evaluation(object):
+    """An evaluation running on a thread, which may be interrupted."""
+
+    def __init__(self, thread, request_id, interrupt=None):
+        self.thread = thread
+        self.request_id = request_id
+        self.ident = threading.get_ident()
+        self.start = time.perf_counter()
+        self.reason = None
+        self.done = False
+        self.lock = threading.Lock()
+        self.interrupt_function = interrupt
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def interrupt(self, reason="interrupt"):
+        """Interrupt the evaluation, unless it's done.
+
+        The default is raising EvalInterrupt in its thread; evaluations
+        running elsewhere (in eval workers) provide their own interrupt.
+
+        """
+        with self.lock:
+            if self.done or self.reason is not None:
+                return False
+            self.reason = reason
+            if self.interrupt_function is not None:
+                self.interrupt_function()
+                return True
+            return async_raise(self.ident, EvalInterrupt)
+
+    def finish(self):
+        """Mark the evaluation done, cancelling a pending interrupt."""
+        with self.lock:
+            self.done = True
+            if self.reason is not None and self.interrupt_function is None:
+                async_raise(self.ident, None)
+
+
+class Evaluations(object):
+    """Evaluations running for a connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+
+    @contextmanager
+    def run(self, thread, request_id, timeout=None, interrupt=None):
+        """Register the evaluation run in the with block.
+
+        Its EvalInterrupt is turned into Interrupted, telling how long
+        it ran and where it stopped; timeout interrupts it after that
+        many seconds.
+
+        """
+        evaluation = Evaluation(thread, request_id, interrupt)
+        with self.lock:
+            self.running[id(evaluation)] = evaluation
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, evaluation.interrupt,
+                                    ("timeout",))
+            timer.daemon = True
+            timer.start()
+        try:
+            try:
+                yield evaluation
+            finally:
+                evaluation.finish()
+        except EvalInterrupt as e:
+            raise Interrupted(evaluation.reason or "interrupt",
+                              evaluation.elapsed,
+                              traceback_location(e.__traceback__))
+        finally:
+            if timer is not None:
+                timer.cancel()
+            with self.lock:
+                self.running.pop(id(evaluation), None)
+
+    def interrupt(self, thread=True, reason="interrupt", exclude=None):
+        """Interrupt the evaluations of a swank thread, t for all.
+
+        Returns how many were interrupted.
+
+        """
+        key = thread_key(thread)
+        with self.lock:
+            evaluations = list(self.running.values())
+        count = 0
+        for evaluation in evaluations:
+            if evaluation.ident == exclude:
+                continue
+            if key is None or thread_key(evaluation.thread) == key:
+                count += evaluation.interrupt(reason)
+        return count
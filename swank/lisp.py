@@ -5,7 +5,8 @@ import re
 import logconfig
 
 
-__all__ = ['BOOL_PATTERN', 'NUMBER_PATTERN', 'cons', 'lbool', 'llist',
+__all__ = ['BOOL_PATTERN', 'NUMBER_PATTERN', 'TOKEN_PATTERN',
+           'WHITESPACE_PATTERN', 'cons', 'lbool', 'llist',
            'lstring', 'quoted', 'symbol', 'DOT_OPERATOR', 'LispReader',
            'LispWritter', 'read_lisp', 'write_lisp']
 
@@ -15,6 +16,21 @@ logger = logging.getLogger(__name__)
 
 BOOL_PATTERN = re.compile(r"^('?t|'?nil)\b")
 NUMBER_PATTERN = re.compile(r"^([0-9]+(\.[0-9]+)?)\b[^.]")
+# Escaped char inside a lisp string.
+ESCAPE_PATTERN = re.compile(r"\\([\s\S])")
+# Whitespace and comments, always matches (possibly empty).
+WHITESPACE_PATTERN = re.compile(r"\s*(?:;[^\n]*\s*)*")
+# One token per match; atoms must be followed by a delimiter.  Quoted
+# strings read as strings, Emacs sends (swank:xref ':calls '"name").
+TOKEN_PATTERN = re.compile(r"""
+    (?P<open>'?\()
+  | (?P<close>\))
+  | '?"(?P<string>[^"\\]*(?:\\[\s\S][^"\\]*)*)"
+  | (?P<bool>'?(?:t|nil))(?=[\s()";]|\Z)
+  | (?P<number>-?[0-9]+(?:\.[0-9]+)?)(?=[\s()";]|\Z)
+  | (?P<symbol>[^\s()";]+)
+  | (?P<end>\Z)
+""", re.VERBOSE)
 
 
 class cons(object):
@@ -28,7 +44,7 @@ class cons(object):
         return "cons({0}, {1})".format(self.car, self.cdr)
 
     def __str__(self):
-        return "({0} . {1})".format(self.car, self.cdr)
+        return write_lisp(self)
 
 
 class lbool(object):
@@ -40,6 +56,9 @@ class lbool(object):
     def __repr__(self):
         return "lbool(" + str(self.value) + ")"
 
+    def __bool__(self):
+        return self.value
+
     def __str__(self):
         if self.value:
             return "t"
@@ -54,10 +73,7 @@ class llist(list):
         return "llist(" + super(llist, self).__repr__() + ")"
 
     def __str__(self):
-        parts = []
-        for part in self:
-            parts.append(str(part))
-        return "(" + ' '.join(parts) + ")"
+        return write_lisp(self)
 
 
 class lstring(str):
@@ -71,7 +87,9 @@ class lstring(str):
 
     def unquote(self):
         """Unquote lisp string so it's python formatted."""
-        return (r'' + self).replace(r'\"', r'"')
+        if "\\" not in self:
+            return str.__str__(self)
+        return ESCAPE_PATTERN.sub(r"\1", self)
 
 
 class quoted(llist):
@@ -81,7 +99,7 @@ class quoted(llist):
         return "quoted(" + super(quoted, self).__repr__() + ")"
 
     def __str__(self):
-        return "'" + super(quoted, self).__str__()
+        return write_lisp(self)
 
 
 class symbol(str):
@@ -98,169 +116,163 @@ DOT_OPERATOR = symbol(".")
 
 
 class LispReader(object):
+    """Read a lisp expression from code.
+
+    The reader is a single pass over the code driven by TOKEN_PATTERN,
+    which is matched at the current position so the remaining code is
+    never sliced.  Lists are collected on an explicit stack so deeply
+    nested expressions don't hit the recursion limit.
+
+    """
 
     def __init__(self, code):
         self.code = code
         self.char_pos = 0
 
-    def char_at_pos(self, pos):
-        try:
-            return self.code[pos]
-        except IndexError:
-            return ""
-
-    def prev_char(self):
-        return self.char_at_pos(self.char_pos - 1)
-
-    def current_char(self):
-        return self.char_at_pos(self.char_pos)
-
-    def next_char(self):
-        return self.char_at_pos(self.char_pos + 1)
-
     def remaining_code(self):
         return self.code[self.char_pos:]
 
     def read(self):
-        try:
-            self.skip_whitespace()
-            char = self.current_char()
-            next_char = self.next_char()
-            if char == "(" or (char == "'" and next_char == "("):
-                return self.read_list()
-            elif char == '"':
-                return self.read_string()
-            elif char == ";":
-                self.skip_comment()
-                return self.read()
-            elif re.search(BOOL_PATTERN, self.remaining_code()):
-                return self.read_bool()
-            elif re.search(NUMBER_PATTERN, self.remaining_code()):
-                return self.read_number()
-            else:
-                return self.read_symbol()
-        except Exception as e:
-            logger.debug("Parsing failed at: %s", self.remaining_code())
-            raise
-
-    def read_bool(self):
-        starting_pos = self.char_pos
-        if self.current_char() == "'":
-            self.char_pos += 1
-        if self.current_char() == "t":
-            self.char_pos += 1
-            return lbool(True)
-        else:
-            self.char_pos += 3
-            return lbool(False)
-
-    def read_list(self):
-        char = self.current_char()
-        quote = False
-        if char == "'":
-            collect = quoted()
-            self.char_pos += 1
-        else:
-            collect = llist()
-        self.char_pos += 1
+        code = self.code
+        pos = self.char_pos
+        skip = WHITESPACE_PATTERN.match
+        match = TOKEN_PATTERN.match
+        stack = []
+        collect = None
         while True:
-            if char != ")" and len(char):
-                collect.append(self.read())
-                char = self.current_char()
+            pos = skip(code, pos).end()
+            token = match(code, pos)
+            if token is None:
+                self.char_pos = pos
+                if code.startswith('"', pos):
+                    raise ValueError(
+                        "Unterminated string literal at {0}".format(pos))
+                logger.debug("Parsing failed at: %s", self.remaining_code())
+                raise ValueError("Invalid token at {0}".format(pos))
+            kind = token.lastgroup
+            text = token.group(kind)
+            pos = token.end()
+            if kind == "open":
+                stack.append(collect)
+                collect = quoted() if text[0] == "'" else llist()
+                continue
+            elif kind == "close":
+                if collect is None:
+                    self.char_pos = pos
+                    raise ValueError("Unexpected ')' at {0}".format(pos - 1))
+                value = collect
+                # If this is a cons cell, return it.
+                if len(value) == 3 and value[1] == DOT_OPERATOR:
+                    value = cons(value[0], value[2])
+                collect = stack.pop()
+            elif kind == "string":
+                value = lstring(text)
+            elif kind == "bool":
+                value = lbool(text[-1] == "t")
+            elif kind == "number":
+                value = float(text) if "." in text else int(text)
+            elif kind == "symbol":
+                value = symbol(text)
             else:
-                break
-        self.char_pos += 1
-        # If this is a cons cell, return it.
-        if DOT_OPERATOR in collect and len(collect) == 3:
-            return cons(collect[0], collect[2])
-        return collect
-
-    def read_number(self):
-        starting_pos = self.char_pos
-        allowed = ["0", "1","2","3","4","5","6","7","8","9","."]
-        char = self.current_char()
-        is_float = False
-        while char in allowed:
-            if char == ".":
-                is_float = True
-            self.char_pos += 1
-            char = self.current_char()
-        number = self.code[starting_pos:self.char_pos]
-        if is_float:
-            return float(number)
-        else:
-            return int(number)
-
-    def skip_whitespace(self):
-        """Move char_pos to first non-whitespace char."""
-        while self.current_char().isspace() and self.remaining_code():
-            self.char_pos += 1
-
-    def skip_comment(self):
-        """Move char_pos to first non-whitespace char."""
-        while self.current_char() != "\n" and self.remaining_code():
-            self.char_pos += 1
-
-    def read_string(self):
-        starting_pos = self.char_pos + 1
-        self.char_pos = starting_pos + 1
-        char = self.current_char()
-        prev_char = self.prev_char()
-        if (self.prev_char() == '"' and
-            self.char_at_pos(self.char_pos - 2) == '"'):
-            return lstring("")
-        while char != '"' or (char == '"' and prev_char == '\\'):
-            try:
-                self.char_pos += 1
-                char = self.code[self.char_pos]
-                prev_char = self.prev_char()
-            except IndexError:
-                raise ValueError(
-                    "Unterminated string literal at {0}".format(self.char_pos))
-        string = self.code[starting_pos:self.char_pos]
-        self.char_pos += 1
-        return lstring(string)
-
-    def read_symbol(self):
-        starting_pos = self.char_pos
-        char = self.current_char()
-        while char and not char.isspace() and char != ")":
-            self.char_pos += 1
-            char = self.current_char()
-        string = self.code[starting_pos:self.char_pos]
-        return symbol(string)
+                self.char_pos = pos
+                raise ValueError("Unexpected end of input at {0}".format(pos))
+            if collect is None:
+                self.char_pos = pos
+                return value
+            collect.append(value)
+
+
+def write_string(obj):
+    if '"' in obj or "\\" in obj:
+        obj = obj.replace("\\", "\\\\").replace('"', '\\"')
+    return '"' + obj + '"'
+
+
+def write_dict(obj):
+    items = []
+    for key, value in obj.items():
+        items.append(symbol(key))
+        items.append(value)
+    return ("(", items, ")")
 
 
 class LispWritter(object):
+    """Write a python value as a lisp expression.
+
+    Writers are looked up by exact type in a table; subclasses are
+    resolved once through their MRO and cached.  A writer returns
+    either the text for an atom or an (opener, items, closer) tuple
+    for a list, whose items are written iteratively with an explicit
+    stack into a single output buffer, so nesting depth is not limited
+    by the recursion limit.
+
+    """
+
+    writers = {
+        str: write_string,
+        lstring: lambda obj: '"' + obj + '"',
+        symbol: lambda obj: obj,
+        lbool: lambda obj: "t" if obj.value else "nil",
+        bool: lambda obj: "t" if obj else "nil",
+        type(None): lambda obj: "nil",
+        int: int.__repr__,
+        float: float.__repr__,
+        list: lambda obj: ("(", obj, ")"),
+        tuple: lambda obj: ("(", obj, ")"),
+        quoted: lambda obj: ("'(", obj, ")"),
+        cons: lambda obj: ("(", (obj.car, DOT_OPERATOR, obj.cdr), ")"),
+        dict: write_dict,
+        object: str,
+    }
+    cache = {}
 
     def __init__(self, value):
         self.value = value
 
+    @classmethod
+    def register(cls, type, writer):
+        """Use writer for values of type (and its subclasses)."""
+        cls.writers[type] = writer
+        cls.cache.clear()
+
+    @classmethod
+    def writer_for(cls, type):
+        try:
+            return cls.cache[type]
+        except KeyError:
+            for base in type.__mro__:
+                if base in cls.writers:
+                    writer = cls.cache[type] = cls.writers[base]
+                    return writer
+
     def to_lisp_string(self, obj):
-        if isinstance(obj, (lbool, llist, lstring, quoted, symbol)):
-            return str(obj)
-        elif isinstance(obj, cons):
-            return ''.join(["(", self.to_lisp_string(obj.car), " . ",
-                            self.to_lisp_string(obj.cdr), ")"])
-        elif isinstance(obj, str):
-            return '"' + str(obj) + '"'
-        elif isinstance(obj, (float, int)):
-            return str(obj)
-        elif obj is None or isinstance(obj, bool):
-            return str(lbool(obj))
-        elif isinstance(obj, (list, tuple)):
-            parts = []
-            for part in obj:
-                parts.append(self.to_lisp_string(part))
-            return "(" + ' '.join(parts) + ")"
-        elif isinstance(obj, dict):
-            parts = []
-            for key, value in obj.items():
-                parts.append(self.to_lisp_string(symbol(key)))
-                parts.append(self.to_lisp_string(value))
-            return "(" + ' '.join(parts) + ")"
-        else:
-            return str(obj)
+        cache = self.cache
+        writer_for = self.writer_for
+        out = []
+        write = out.append
+        stack = [(iter((obj,)), "")]
+        separate = False
+        while stack:
+            items, closer = stack[-1]
+            for obj in items:
+                if separate:
+                    write(" ")
+                cls = obj.__class__
+                writer = cache.get(cls) or writer_for(cls)
+                text = writer(obj)
+                if text.__class__ is tuple:
+                    opener, children, closer = text
+                    write(opener)
+                    stack.append((iter(children), closer))
+                    separate = False
+                    break
+                write(text)
+                separate = True
+            else:
+                stack.pop()
+                write(closer)
+                separate = True
+        return "".join(out)
 
     def write(self):
         return self.to_lisp_string(self.value)
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import logging.config
 
 
 LOG_SETTINGS = {
@@ -23,7 +22,18 @@ LOG_SETTINGS = {
 }
 
 try:
-    from local_logconfig import configure
+    from local_logconfig import configure as setup
 except ImportError:
-    def configure():
+    def setup():
+        import logging.config
         logging.config.dictConfig(LOG_SETTINGS)
+
+configured = False
+
+
+def configure():
+    """Configure logging, every module calls it but it runs once."""
+    global configured
+    if not configured:
+        configured = True
+        setup()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+import threading
+
+import logconfig
+
+
+__all__ = ['BUCKETS', 'CommandStats', 'Metrics']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets, the last
+# bucket catches everything slower.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+def to_ms(bound):
+    """Return bucket bound in milliseconds, None for the overflow one."""
+    return bound * 1e3 if bound != BUCKETS[-1] else None
+
+
+class CommandStats(object):
+    """Call count, error count and latency histogram of a command."""
+
+    __slots__ = ('name', 'count', 'errors', 'total', 'buckets', 'lock')
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.count = 0
+            self.errors = 0
+            self.total = 0.0
+            self.buckets = [0] * len(BUCKETS)
+
+    def record(self, elapsed, error=False):
+        index = bisect.bisect_left(BUCKETS, elapsed)
+        with self.lock:
+            self.count += 1
+            self.total += elapsed
+            self.buckets[index] += 1
+            if error:
+                self.errors += 1
+
+    def percentile(self, fraction):
+        """Return the bucket upper bound holding the fraction quantile."""
+        with self.lock:
+            wanted = fraction * self.count
+            seen = 0
+            for bound, count in zip(BUCKETS, self.buckets):
+                seen += count
+                if count and seen >= wanted:
+                    return bound
+        return 0.0
+
+    def summary(self):
+        """Return a dict with the stats, latencies in milliseconds.
+
+        Percentiles falling in the overflow bucket are None.
+
+        """
+        with self.lock:
+            count, errors, total = self.count, self.errors, self.total
+            histogram = [(to_ms(bound), hits)
+                         for bound, hits in zip(BUCKETS, self.buckets) if hits]
+        return {
+            'name': self.name,
+            'count': count,
+            'errors': errors,
+            'total_ms': total * 1e3,
+            'mean_ms': total * 1e3 / count if count else 0.0,
+            'p50_ms': to_ms(self.percentile(0.5)),
+            'p99_ms': to_ms(self.percentile(0.99)),
+            'histogram': histogram,
+        }
+
+
+class Metrics(object):
+    """Registry of CommandStats by command name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}
+
+    def stats_for(self, name):
+        try:
+            return self.commands[name]
+        except KeyError:
+            with self.lock:
+                return self.commands.setdefault(name, CommandStats(name))
+
+    def reset(self):
+        for stats in list(self.commands.values()):
+            stats.reset()
+
+    def summaries(self):
+        """Return summaries of used commands, slowest total first."""
+        summaries = [stats.summary() for stats in list(self.commands.values())
+                     if stats.count]
+        summaries.sort(key=lambda summary: summary['total_ms'], reverse=True)
+        return summaries
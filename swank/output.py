@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+import threading
+from contextlib import contextmanager
+
+import logconfig
+
+
+__all__ = ['GrabBuffer', 'OutputChannel', 'OutputRouter', 'redirect']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class OutputChannel(object):
+    """Buffered output stream sending its text to Emacs in chunks.
+
+    Text is buffered and handed to send() when chunk_size characters
+    are pending or flush_interval seconds after the first pending
+    write, whatever comes first.  Writes bigger than a chunk are
+    split.  After max_unacked characters are sent, ping() is called
+    and must block until Emacs acknowledged them, so a loop printing
+    without end stalls instead of queueing unbounded output.
+
+    """
+
+    def __init__(self, send, ping=None, chunk_size=4096, flush_interval=0.05,
+                 max_unacked=256 * 1024):
+        self.send = send
+        self.ping = ping
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_unacked = max_unacked
+        self.lock = threading.RLock()
+        self.pending = []
+        self.size = 0
+        self.unacked = 0
+        self.timer = None
+        self.closed = False
+
+    def write(self, text):
+        if not text:
+            return 0
+        with self.lock:
+            self.pending.append(text)
+            self.size += len(text)
+            if self.size >= self.chunk_size:
+                self.flush()
+            elif self.timer is None and not self.closed:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            text = "".join(self.pending)
+            self.pending = []
+            self.size = 0
+            for start in range(0, len(text), self.chunk_size):
+                chunk = text[start:start + self.chunk_size]
+                self.send(chunk)
+                self.unacked += len(chunk)
+                if self.ping is not None and self.unacked >= self.max_unacked:
+                    self.ping()
+                    self.unacked = 0
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.closed = True
+
+    def isatty(self):
+        return False
+
+
+class GrabBuffer(object):
+    """Stream keeping the first limit characters written to it."""
+
+    def __init__(self, limit=64 * 1024):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.dropped = 0
+
+    def write(self, text):
+        room = self.limit - self.size
+        if room > 0:
+            self.parts.append(text[:room])
+            self.size += min(room, len(text))
+        self.dropped += max(0, len(text) - max(room, 0))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def getvalue(self):
+        value = "".join(self.parts)
+        if self.dropped:
+            value += "\n[... {0} more characters]".format(self.dropped)
+        return value
+
+
+class OutputRouter(object):
+    """Stand-in for sys.stdout/sys.stderr routing writes by thread.
+
+    Writes from a thread with a redirected stream go to it, anything
+    else goes to the stream the router replaced.
+
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, 'stream', None) or self.original
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def writelines(self, lines):
+        return self.target().writelines(lines)
+
+    def flush(self):
+        return self.target().flush()
+
+    def isatty(self):
+        return self.target().isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+def router(name):
+    """Return the OutputRouter installed as sys.<name>, installing it."""
+    stream = getattr(sys, name)
+    if not isinstance(stream, OutputRouter):
+        stream = OutputRouter(stream)
+        setattr(sys, name, stream)
+    return stream
+
+
+@contextmanager
+def redirect(stream):
+    """Send this thread's stdout and stderr writes to stream."""
+    routers = [router('stdout'), router('stderr')]
+    previous = [getattr(r.local, 'stream', None) for r in routers]
+    for r in routers:
+        r.local.stream = stream
+    try:
+        yield stream
+    finally:
+        for r, old in zip(routers, previous):
+            r.local.stream = old
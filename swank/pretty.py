@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from collections import deque
+from itertools import islice
+
+import logconfig
+from reprs import SafeRepr, safe_repr
+
+
+__all__ = ['OutOfTime', 'PrettyPrinter', 'pformat']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+ELISION = '...'
+
+
+class OutOfTime(Exception):
+    """The time budget of a rendering ran out."""
+
+
+class PrettyPrinter(object):
+    """Render objects as indented text, one piece at a time.
+
+    Like pprint, containers whose repr fits in the width are written
+    on one line, others one item per line.  Unlike pprint nothing is
+    rendered beyond the budgets: containers show max_items items and
+    "... (N more)", containers max_depth deep show as [...], atoms are
+    cut to max_string characters, and the whole text stops at
+    max_chars characters or after time_limit seconds, with a marker
+    telling so.  The text is produced by chunks(), so it can be sent
+    while it is being rendered.
+
+    Renderings keep state on the printer, make one for each.
+
+    """
+
+    containers = ((dict, '{', '}'), (list, '[', ']'), (tuple, '(', ')'),
+                  (set, '{', '}'), (frozenset, 'frozenset({', '})'),
+                  (deque, 'deque([', '])'))
+
+    def __init__(self, width=80, max_depth=8, max_items=100,
+                 max_string=4096, max_chars=64 * 1024, time_limit=1.0,
+                 timer=time.perf_counter):
+        self.width = width
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.time_limit = time_limit
+        self.timer = timer
+        self.atom_repr = SafeRepr(maxstring=max_string, maxother=max_string,
+                                  maxlevel=1, maxitems=max_items)
+        self.flat_repr = SafeRepr(maxstring=width + 1, maxother=width + 1,
+                                  maxlevel=1, maxitems=width)
+        self.deadline = None
+        self.path = set()
+
+    def delimiters(self, obj):
+        """Return (base left right) for a container, else None."""
+        for base, left, right in self.containers:
+            if isinstance(obj, base):
+                if type(obj) is not base:
+                    left = type(obj).__name__ + '(' + left
+                    right = right + ')'
+                return base, left, right
+        return None
+
+    def items(self, obj, base):
+        items = obj.items() if base is dict else obj
+        return islice(items, self.max_items)
+
+    def flat(self, obj, limit, depth=0):
+        """Return the one line repr of obj if it fits in limit, else None.
+
+        Gives up as soon as the repr grows past limit, so it costs
+        at most about limit items whatever the size of obj.  Like in
+        pieces(), containers max_depth deep show as [...].
+
+        """
+        container = self.delimiters(obj)
+        if container is None or not obj:
+            text = safe_repr(obj, self.flat_repr)
+            return text if len(text) <= limit and '\n' not in text else None
+        base, left, right = container
+        if depth >= self.max_depth:
+            text = left + ELISION + right
+            return text if len(text) <= limit else None
+        size = len(left) + len(right)
+        if size + 3 * len(obj) - 2 > limit:
+            return None
+        parts = []
+        for item in self.items(obj, base):
+            if base is dict:
+                key = self.flat(item[0], limit - size, depth + 1)
+                if key is None:
+                    return None
+                value = self.flat(item[1], limit - size - len(key) - 2,
+                                  depth + 1)
+                text = None if value is None else key + ': ' + value
+            else:
+                text = self.flat(item, limit - size, depth + 1)
+            if text is None:
+                return None
+            size += len(text) + 2
+            if size > limit + 2:
+                return None
+            parts.append(text)
+        if len(parts) < len(obj):
+            return None
+        if base is tuple and len(parts) == 1:
+            parts[0] += ','
+        return left + ', '.join(parts) + right
+
+    def check_time(self):
+        if self.deadline is not None and self.timer() > self.deadline:
+            raise OutOfTime()
+
+    def pieces(self, obj, indent=0, depth=0):
+        """Yield the text of obj, written at column indent."""
+        self.check_time()
+        text = self.flat(obj, self.width - indent, depth)
+        if text is not None:
+            yield text
+            return
+        container = self.delimiters(obj)
+        if container is None or not obj:
+            yield safe_repr(obj, self.atom_repr)
+            return
+        base, left, right = container
+        if depth >= self.max_depth:
+            yield left + ELISION + right
+            return
+        if id(obj) in self.path:
+            yield '<Recursion on {0} with id={1}>'.format(
+                type(obj).__name__, id(obj))
+            return
+        self.path.add(id(obj))
+        try:
+            yield left
+            indent += len(left)
+            separator = ',\n' + ' ' * indent
+            count = 0
+            for item in self.items(obj, base):
+                if count:
+                    yield separator
+                count += 1
+                if base is dict:
+                    key = safe_repr(item[0], self.flat_repr) + ': '
+                    yield key
+                    for piece in self.pieces(item[1], indent + len(key),
+                                             depth + 1):
+                        yield piece
+                else:
+                    for piece in self.pieces(item, indent, depth + 1):
+                        yield piece
+            if len(obj) > count:
+                yield separator + '{0} ({1} more)'.format(
+                    ELISION, len(obj) - count)
+            elif base is tuple and count == 1:
+                yield ','
+            yield right
+        finally:
+            self.path.discard(id(obj))
+
+    def chunks(self, obj, chunk_size=4096):
+        """Yield the text of obj in chunks of about chunk_size."""
+        self.deadline = self.timer() + self.time_limit \
+            if self.time_limit else None
+        buffer = []
+        buffered = 0
+        size = 0
+        try:
+            for piece in self.pieces(obj):
+                if size + len(piece) > self.max_chars:
+                    buffer.append(piece[:self.max_chars - size])
+                    buffer.append('\n[... truncated at {0} characters]'
+                                  .format(self.max_chars))
+                    break
+                size += len(piece)
+                buffer.append(piece)
+                buffered += len(piece)
+                if buffered >= chunk_size:
+                    yield ''.join(buffer)
+                    buffer = []
+                    buffered = 0
+        except OutOfTime:
+            buffer.append('\n[... stopped after {0:.3f}s]'.format(
+                self.time_limit))
+        if buffer:
+            yield ''.join(buffer)
+
+    def pformat(self, obj):
+        return ''.join(self.chunks(obj))
+
+
+def pformat(obj, **budgets):
+    """Return the text of obj rendered by a PrettyPrinter with budgets."""
+    return PrettyPrinter(**budgets).pformat(obj)
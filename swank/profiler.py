@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import functools
+import logging
+import sys
+import threading
+import time
+import types
+
+import logconfig
+
+
+__all__ = ['FunctionStats', 'Profiler']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class FunctionStats(object):
+    """Call count, cumulative and own time of a profiled function.
+
+    Updated under lock, the function may be called from several
+    threads at once.
+
+    """
+
+    __slots__ = ('name', 'calls', 'cumulative', 'own', 'lock')
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.cumulative = 0.0
+            self.own = 0.0
+
+
+class Profiler(object):
+    """Deterministic profiler wrapping functions in place.
+
+    Functions are replaced in their module (or class, or namespace
+    dict) by a wrapper counting calls and timing them.  Own time
+    excludes the time spent in other profiled functions called from
+    it, and recursive calls only count once in cumulative time.
+    unprofile_all puts the original functions back.
+
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # (id(container), attribute name) -> (container, name, original)
+        self.wrapped = {}
+        self.stats = {}
+
+    def profiled_functions(self):
+        return sorted(self.stats)
+
+    def wrap(self, function, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = FunctionStats(name)
+        local = self.local
+        timer = self.timer
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                stack = local.stack
+                depths = local.depths
+            except AttributeError:
+                stack = local.stack = []
+                depths = local.depths = {}
+            depth = depths.get(name, 0)
+            depths[name] = depth + 1
+            stack.append(0.0)
+            start = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = timer() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                depths[name] = depth
+                with stats.lock:
+                    stats.calls += 1
+                    stats.own += elapsed - children
+                    if not depth:
+                        stats.cumulative += elapsed
+
+        wrapper.__swank_profiled__ = True
+        return wrapper
+
+    def profile_attribute(self, container, attribute, value, name):
+        """Wrap value, found as container's attribute, if it's a function."""
+        if isinstance(value, (staticmethod, classmethod)):
+            function = value.__func__
+            rewrap = type(value)
+        else:
+            function = value
+            rewrap = None
+        if not isinstance(function, types.FunctionType) or \
+                getattr(function, '__swank_profiled__', False):
+            return False
+        wrapper = self.wrap(function, name)
+        if rewrap is not None:
+            wrapper = rewrap(wrapper)
+        key = (id(container), attribute)
+        self.wrapped[key] = (container, attribute, value)
+        if isinstance(container, dict):
+            container[attribute] = wrapper
+        else:
+            setattr(container, attribute, wrapper)
+        return True
+
+    def profile_namespace(self, namespace, module_name, match=None,
+                          methods=True):
+        """Profile the functions defined in a module namespace dict.
+
+        Only functions whose __module__ is module_name are profiled,
+        so names imported from elsewhere are left alone.  If given,
+        match is called with each qualified name to filter them.
+        Returns the number of functions profiled.
+
+        """
+        count = 0
+        with self.lock:
+            for attribute, value in list(namespace.items()):
+                function = getattr(value, '__func__', value)
+                if getattr(function, '__module__', None) != module_name:
+                    continue
+                if isinstance(value, type):
+                    if methods:
+                        count += self.profile_class(value, module_name, match)
+                    continue
+                name = "{0}.{1}".format(module_name, attribute)
+                if match is None or match(name):
+                    count += self.profile_attribute(
+                        namespace, attribute, value, name)
+        return count
+
+    def profile_class(self, cls, module_name, match=None):
+        count = 0
+        for attribute, value in list(vars(cls).items()):
+            name = "{0}.{1}.{2}".format(module_name, cls.__name__, attribute)
+            if match is None or match(name):
+                count += self.profile_attribute(cls, attribute, value, name)
+        return count
+
+    def profile_module(self, module_name, match=None, methods=True):
+        """Profile module_name and its submodules found in sys.modules."""
+        count = 0
+        prefix = module_name + "."
+        for name, module in list(sys.modules.items()):
+            if module is None or (name != module_name and
+                                  not name.startswith(prefix)):
+                continue
+            count += self.profile_namespace(
+                vars(module), name, match, methods)
+        return count
+
+    def reset(self):
+        with self.lock:
+            for stats in self.stats.values():
+                stats.reset()
+
+    def unprofile_all(self):
+        with self.lock:
+            for container, attribute, original in self.wrapped.values():
+                if isinstance(container, dict):
+                    container[attribute] = original
+                else:
+                    setattr(container, attribute, original)
+            self.wrapped.clear()
+            self.stats.clear()
+
+    def report(self):
+        """Return the stats of called functions, most own time first."""
+        stats = [stats for stats in self.stats.values() if stats.calls]
+        stats.sort(key=lambda stats: (stats.own, stats.cumulative),
+                   reverse=True)
+        return stats
+
+    def format_report(self):
+        """Return the report as a text table."""
+        lines = ["{0:>12} {1:>12} {2:>12} {3:>10}  {4}".format(
+            "own (s)", "cumul. (s)", "own/call", "calls", "name")]
+        total = 0.0
+        for stats in self.report():
+            total += stats.own
+            lines.append("{0:>12.6f} {1:>12.6f} {2:>12.6f} {3:>10}  {4}".format(
+                stats.own, stats.cumulative, stats.own / stats.calls,
+                stats.calls, stats.name))
+        lines.append("{0:>12.6f} {1:>12} {2:>12} {3:>10}  {4}".format(
+            total, "", "", "", "total"))
+        return "\n".join(lines)
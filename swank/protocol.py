@@ -1,20 +1,217 @@
 # -*- coding: utf-8 -*-
+import itertools
 import logging
 import os.path
-import platform
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from importlib import import_module
 
 import logconfig
+from framing import FrameTooLarge, encode_frame
+from interrupts import Abort, Evaluations, Interrupted, text_location
 from lisp import cons, lbool, llist, lstring, read_lisp, symbol, write_lisp
+from metrics import Metrics
+from output import GrabBuffer, OutputChannel, redirect
 
 
-__all__ = ['SwankProtocol']
+__all__ = ['Handler', 'ProtocolMeta', 'Request', 'SwankProtocol',
+           'buffer_position', 'is_stub', 'shared', 'source_location',
+           'split_arguments', 'unquote', 'wire_name']
 
 
 logconfig.configure()
 logger = logging.getLogger(__name__)
 
+# Relation of the xref index answering each swank:xref type.
+XREF_RELATIONS = {
+    'calls': 'calls',
+    'callers': 'calls',
+    'references': 'references',
+    'binds': 'binds',
+    'sets': 'binds',
+    'imports': 'imports',
+}
 
-class SwankProtocol(object):
+Request = namedtuple('Request', ['form', 'package', 'thread', 'id'])
+
+# Numbers identifying connections, in the eval workers.
+SESSIONS = itertools.count(1)
+
+
+def _stub(self):
+    pass
+
+
+def _documented_stub(self):
+    """Stub."""
+
+
+STUB_CODES = frozenset([_stub.__code__.co_code,
+                        _documented_stub.__code__.co_code])
+
+
+def is_stub(function):
+    """Return True if function's body does nothing (just pass).
+
+    The bytecode of "return <constant>" is that of a stub, so the
+    constants must also be None or the docstring.
+
+    """
+    code = getattr(function, '__code__', None)
+    if code is None or code.co_code not in STUB_CODES:
+        return False
+    return all(constant is None or constant == function.__doc__
+               for constant in code.co_consts)
+
+
+def split_arguments(args):
+    """Split lisp arguments into positional and keyword arguments.
+
+    Keyword arguments (:time-limit-in-msec 1500) trail the positional
+    ones and are returned with python names (time_limit_in_msec).
+    Keywords not followed by pairs, like :function in (name :function),
+    are positional.
+
+    """
+    for i, arg in enumerate(args):
+        if isinstance(arg, symbol) and arg.startswith(":") and \
+                (len(args) - i) % 2 == 0:
+            break
+    else:
+        return args, {}
+    kwargs = {}
+    keywords = args[i::2]
+    values = args[i + 1::2]
+    for key, value in zip(keywords, values):
+        kwargs[key[1:].replace("-", "_")] = value
+    return args[:i], kwargs
+
+
+def pprint_budgets(limit=64 * 1024, depth=8, time_limit_in_msec=1000,
+                   stream=False):
+    """Return the PrettyPrinter budgets of the pprint commands' options."""
+    return dict(max_depth=depth, max_chars=limit,
+                time_limit=time_limit_in_msec / 1000.0)
+
+
+def unquote(value):
+    """Return value as a python string if it's a lisp string."""
+    return value.unquote() if hasattr(value, 'unquote') else value
+
+
+def buffer_position(position):
+    """Return (offset line) of a slime buffer position.
+
+    position is an offset or ((:position offset) (:line line column)).
+
+    """
+    if isinstance(position, int):
+        return position, 1
+    offset, line = 1, 1
+    for item in position or ():
+        if item[0] == ":position":
+            offset = item[1]
+        elif item[0] == ":line":
+            line = item[1]
+    return offset, line
+
+
+def source_location(path, line, column=0):
+    """Return the slime location of line and column in path."""
+    return [symbol(":location"), [symbol(":file"), path],
+            [symbol(":line"), line, column], False]
+
+
+def wire_name(method_name):
+    """Return the swank command name for a handler method name.
+
+    swank_simple_completions -> swank:simple-completions
+
+    """
+    package, _, name = method_name.partition("_")
+    return package + ":" + name.replace("_", "-")
+
+
+class Handler(object):
+    """A registered swank command."""
+
+    __slots__ = ('name', 'function', 'implemented', 'stats')
+
+    def __init__(self, name, function, stats):
+        self.name = name
+        self.function = function
+        self.implemented = not is_stub(function)
+        self.stats = stats
+
+
+class shared(object):
+    """Class attribute made by factory from module on first access.
+
+    Keeps the modules behind handlers out of the server startup.  The
+    value is shared by subclasses, and instances may override it.
+
+    """
+
+    def __init__(self, module, factory):
+        self.module = module
+        self.factory = factory
+        self.value = None
+        self.lock = threading.Lock()
+
+    def __get__(self, obj, cls=None):
+        if self.value is None:
+            with self.lock:
+                if self.value is None:
+                    factory = getattr(import_module(self.module),
+                                      self.factory)
+                    self.value = factory()
+        return self.value
+
+
+class ProtocolMeta(type):
+    """Build the command registry of a protocol class once.
+
+    Every swank_* method is registered under its wire name in the
+    class' handlers dict, so dispatch is a single dict lookup.  Names
+    the client spells differently (e.g. with underscores) are resolved
+    the old way once and then cached.
+
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(ProtocolMeta, cls).__init__(name, bases, attrs)
+        if 'metrics' not in attrs:
+            cls.metrics = Metrics()
+        cls.handlers = {}
+        cls.handlers_by_method = {}
+        for method_name in dir(cls):
+            if not method_name.startswith("swank_"):
+                continue
+            function = getattr(cls, method_name)
+            if not callable(function):
+                continue
+            function = getattr(function, '__func__', function)
+            name = wire_name(method_name)
+            handler = Handler(name, function, cls.metrics.stats_for(name))
+            cls.handlers[name] = handler
+            cls.handlers_by_method[method_name] = handler
+
+    def handler_for(cls, name):
+        """Return the Handler for the command name or None."""
+        try:
+            return cls.handlers[name]
+        except KeyError:
+            method_name = name.replace(":", "_").replace("-", "_")
+            handler = cls.handlers_by_method.get(method_name)
+            if handler is not None:
+                cls.handlers[name] = handler
+            return handler
+
+
+class SwankProtocol(object, metaclass=ProtocolMeta):
     """Swank Protocol implementation for Python.
 
     The most important function here is the dispatch function that
@@ -32,45 +229,230 @@ class SwankProtocol(object):
 
     """
 
-    def __init__(self, socket, locals=None, prompt="Python> "):
+    profiler = shared('profiler', 'Profiler')
+    apropos = shared('apropos', 'AproposIndex')
+    xref = shared('xref', 'XrefIndex')
+    compiler = shared('compiler', 'Compiler')
+    arglists = shared('arglists', 'ArglistCache')
+    docs = shared('docs', 'DocCache')
+    # A workers.WorkerPool to run evals in, instead of this process.
+    workers = None
+    # Seconds after which evals are interrupted, unless given a timeout.
+    eval_timeout = None
+
+    # Frames sent with :debug, before Emacs asks for more.
+    debug_frames = 20
+
+    def __init__(self, socket, locals=None, prompt="Python> ", send=None,
+                 encoding="utf-8"):
         self.locals = locals or {}
-        self.package = None
-        self.thread = True
-        self.id = 0
         self.socket = socket
         self.prompt = prompt
+        self.send = send
+        self.encoding = encoding
+        self.request = threading.local()
+        self._completions = None
+        self._inspector = None
+        self.namespace_generation = 0
+        self.acks = threading.Condition()
+        self.acked = set()
+        self.ping_tag = 0
+        self.closed = False
+        self.session = next(SESSIONS)
+        self.evaluations = Evaluations()
+        self._debugger = None
+
+    @property
+    def package(self):
+        return getattr(self.request, 'package', None)
+
+    @property
+    def thread(self):
+        return getattr(self.request, 'thread', True)
+
+    @property
+    def id(self):
+        return getattr(self.request, 'id', 0)
+
+    def decode(self, data):
+        """Return the text of a frame payload, bytes in the encoding."""
+        if isinstance(data, bytes):
+            return data.decode(self.encoding)
+        return data
+
+    def frame(self, message):
+        """Return the frame of message as bytes, ready to be sent."""
+        return encode_frame(write_lisp(message), self.encoding)
+
+    def parse_request(self, data):
+        """Parses an :emacs-rex command into a Request."""
+        command, form, package, thread, rid = read_lisp(self.decode(data))
+        return Request(form, package, thread, rid)
+
+    def receive(self, data):
+        """Handle a message from Emacs, a frame payload.
+
+        Returns a Request for :emacs-rex messages, to be executed by
+        the caller.  Other messages (e.g. :emacs-pong) are handled
+        right away on the reading thread and None is returned.
+
+        """
+        message = read_lisp(self.decode(data))
+        command = message[0]
+        if command == ":emacs-rex":
+            command, form, package, thread, rid = message
+            return Request(form, package, thread, rid)
+        elif command == ":emacs-pong":
+            with self.acks:
+                self.acked.add(message[2])
+                self.acks.notify_all()
+        elif command == ":emacs-interrupt":
+            self.evaluations.interrupt(message[1])
+        else:
+            logger.warning('Ignoring unknown message: %s', command)
+
+    def send_event(self, event):
+        """Send an asynchronous event (e.g. :write-string) to Emacs."""
+        if self.send is None:
+            return
+        self.send(self.frame(event))
+
+    def wait_for_emacs(self, thread):
+        """Ping Emacs and block until it answers (flow control)."""
+        with self.acks:
+            self.ping_tag += 1
+            tag = self.ping_tag
+        self.send_event([symbol(":ping"), thread, tag])
+        with self.acks:
+            while tag not in self.acked and not self.closed:
+                self.acks.wait(1.0)
+            self.acked.discard(tag)
+
+    def close(self):
+        """Release threads waiting on Emacs, the connection is gone."""
+        with self.acks:
+            self.closed = True
+            self.acks.notify_all()
+        if self.workers is not None:
+            self.workers.release(self.session)
+
+    @contextmanager
+    def output(self):
+        """Stream stdout and stderr of the calling thread to Emacs."""
+        if self.send is None:
+            yield None
+            return
+        thread = self.thread
+        channel = OutputChannel(
+            lambda text: self.send_event([symbol(":write-string"), text]),
+            ping=lambda: self.wait_for_emacs(thread))
+        try:
+            with redirect(channel):
+                yield channel
+        finally:
+            channel.close()
 
     def dispatch(self, data):
-        """Parses an :emacs-rex command an returns lisp response."""
-        command, form, package, thread, rid = read_lisp(data)
-        self.package = package;
-        self.thread = thread;
-        self.id = rid;
+        """Parses an :emacs-rex command an returns the response frame."""
+        return self.execute(self.parse_request(data))
+
+    def execute(self, request):
+        """Run the method for request and return the response frame.
+
+        The request is recorded as the current one for the calling
+        thread, so handlers running concurrently on several worker
+        threads each see their own package, thread and id.
+
+        """
+        self.request.package = request.package
+        self.request.thread = request.thread
+        self.request.id = request.id
+        form = request.form
         fn = form[0];
         args = form[1:]
-        method_name = fn.replace(":", "_").replace("-", "_")
-        logger.debug(method_name)
-        logger.debug(args)
+        handler = self.handlers.get(fn) or type(self).handler_for(fn)
+        if handler is None:
+            return self.abort(request, "Unknown command: {0}".format(fn))
+        if not handler.implemented:
+            return self.abort(request, "Unimplemented command: {0}".format(fn))
         for i, arg in enumerate(args):
             if hasattr(arg, 'unquote'):
                 args[i] = arg.unquote()
+        args, kwargs = split_arguments(args)
+        start = time.perf_counter()
         try:
             response = [
                 symbol(":return"),
-                {":ok": getattr(self, method_name)(*args)},
-                self.id
+                {":ok": handler.function(self, *args, **kwargs)},
+                request.id
             ]
+        except Abort as e:
+            handler.stats.record(time.perf_counter() - start, error=True)
+            return self.abort(request, str(e))
         except Exception as e:
-            return [
-                symbol(":debug"), 0, 1,
-                [e, False],
-                [],
-                [],
-                self.id
-            ]
-        lisp_response = write_lisp(response)
-        header = "{0:06x}".format(len(lisp_response))
-        return header + lisp_response
+            handler.stats.record(time.perf_counter() - start, error=True)
+            return self.debug(request, e)
+        handler.stats.record(time.perf_counter() - start)
+        try:
+            return self.frame(response)
+        except FrameTooLarge as e:
+            return self.abort(request, str(e))
+
+    def abort(self, request, reason):
+        """Return the response frame aborting request with reason."""
+        response = [
+            symbol(":return"),
+            {":abort": reason},
+            request.id
+        ]
+        return self.frame(response)
+
+    @property
+    def debugger(self):
+        if self._debugger is None:
+            from debugger import Debugger
+            self._debugger = Debugger()
+        return self._debugger
+
+    def debug(self, request, exception):
+        """Enter the debugger on exception and abort request.
+
+        Emacs gets :debug with the condition and the first frames,
+        and opens sldb on :debug-activate; the traceback is kept for
+        the sldb commands until the level is left.  Without a
+        connection to send them to, request is just aborted.
+
+        """
+        if self.send is None:
+            from debugger import exception_message
+            return self.abort(request, exception_message(exception))
+        level = self.debugger.enter(request.thread, exception, request.id)
+        self.send_event([symbol(":debug")] + self.debugger_info(
+            level, 0, self.debug_frames))
+        self.send_event([symbol(":debug-activate"), level.thread,
+                         level.level, False])
+        return self.abort(request, level.message)
+
+    def debugger_info(self, level, start=0, end=None):
+        """Return (thread level condition restarts frames conts)."""
+        return [level.thread, level.level, level.condition(),
+                [["ABORT", "Return to SLIME's top level."]],
+                level.frames(start, end), [level.request_id]]
+
+    def debug_level(self, level=None):
+        """Return the debugger level of the current thread, or abort."""
+        debug_level = self.debugger.current(self.thread, level)
+        if debug_level is None:
+            raise Abort("Not in the debugger")
+        return debug_level
+
+    def leave_debugger(self, level=1):
+        """Leave the debugger levels of this thread from level up."""
+        left = self.debugger.leave(self.thread, level)
+        for debug_level in left:
+            self.send_event([symbol(":debug-return"), debug_level.thread,
+                             debug_level.level, False])
+        return len(left)
 
     def indentation_update(self):
         response = [symbol(":indentation-update"), [
@@ -84,12 +466,11 @@ class SwankProtocol(object):
             cons("except", 1),
             cons("finally", 1)
         ]]
-        lisp_response = write_lisp(response)
-        header = "{0:06x}".format(len(lisp_response))
-        return header + lisp_response
+        return self.frame(response)
 
     def swank_connection_info(self):
         """Return connection info available"""
+        import platform
         machine = platform.machine().upper()
         version = platform.python_version()
         pid = os.getpid()
@@ -124,61 +505,363 @@ class SwankProtocol(object):
             ]), self.id
         ])
 
+    def swank_dispatch_metrics(self, reset=None):
+        """Return per command count, errors and latencies (in ms).
+
+        Commands are sorted by the total time spent on them.  When
+        reset is true the metrics are cleared after being read.
+
+        """
+        summaries = self.metrics.summaries()
+        if reset:
+            self.metrics.reset()
+        return [
+            [symbol(':name'), summary['name'],
+             symbol(':count'), summary['count'],
+             symbol(':errors'), summary['errors'],
+             symbol(':total-ms'), summary['total_ms'],
+             symbol(':mean-ms'), summary['mean_ms'],
+             symbol(':p50-ms'), summary['p50_ms'],
+             symbol(':p99-ms'), summary['p99_ms'],
+             symbol(':histogram'), [cons(bound, hits) for bound, hits
+                                    in summary['histogram']]]
+            for summary in summaries
+        ]
+
+    def swank_wire_trace(self, enable=True, size=None):
+        """Start or, when enable is nil, stop recording wire frames.
+
+        Returns the number of frames held by the recorder.
+
+        """
+        from wiretrace import RECORDER
+        if enable:
+            RECORDER.start(size)
+        else:
+            RECORDER.stop()
+        return len(RECORDER.snapshot())
+
+    def swank_wire_trace_dump(self, filename=None):
+        """Write the recorded frames to filename, returning its name."""
+        from wiretrace import RECORDER, default_dump_path
+        filename = filename or default_dump_path()
+        RECORDER.dump(filename)
+        return filename
+
     def swank_buffer_first_change(self, filename):
         return lbool(False)
 
-    def swank_eval(self, string):
+    def namespace_changed(self):
+        """Called after code ran in the session namespace."""
+        self.namespace_generation += 1
+        if self._completions is not None:
+            self._completions.invalidate()
+
+    @property
+    def completions(self):
+        if self._completions is None:
+            from completion import CompletionIndex
+            self._completions = CompletionIndex(self.locals)
+        return self._completions
+
+    @property
+    def inspector(self):
+        if self._inspector is None:
+            from inspector import Inspector
+            self._inspector = Inspector()
+        return self._inspector
+
+    def eval(self, string, timeout=None, value=True, budgets=None):
+        """Run string in the session namespace.
+
+        Returns the value of string if it's an expression, None for
+        statements.  With eval workers the code runs in the session
+        namespace of a worker, and the value is a RemoteValue holding
+        its text rendered with the PrettyPrinter budgets, or None
+        unless value is true; locals then only hold what was loaded or
+        compiled in this process.
+
+        The evaluation can be interrupted from Emacs, and is after
+        timeout (or eval_timeout) seconds, raising Interrupted.
+
+        """
+        if self.workers is not None:
+            return self.eval_in_worker(string, timeout, value, budgets)
+        with self.evaluations.run(self.thread, self.id,
+                                  timeout or self.eval_timeout):
+            try:
+                try:
+                    code = compile(string, '<string>', 'eval')
+                except SyntaxError:
+                    exec(compile(string, '<string>', 'exec'), self.locals)
+                    return None
+                return eval(code, self.locals)
+            finally:
+                self.namespace_changed()
+
+    def eval_in_worker(self, string, timeout=None, value=True,
+                       budgets=None):
+        from workers import RemoteError
+        with self.evaluations.run(
+                self.thread, self.id, timeout or self.eval_timeout,
+                lambda: self.workers.interrupt(self.session)) as evaluation:
+            try:
+                return self.workers.eval(
+                    self.session, string, lambda text: sys.stdout.write(text),
+                    value, budgets)
+            except RemoteError as e:
+                if evaluation.reason is None or \
+                        e.name != "KeyboardInterrupt":
+                    raise
+                raise Interrupted(evaluation.reason, evaluation.elapsed,
+                                  text_location(e.traceback))
+
+    def load_code(self, code):
+        """Run the code object in the session namespace."""
+        try:
+            exec(code, self.locals)
+        finally:
+            self.namespace_changed()
+
+    def swank_eval(self, string, timeout=None):
         """Eval string"""
-        exec((compile(string, '<string>', 'exec')), self.locals)
+        with self.output():
+            self.eval(string, timeout, value=False)
         return "Evaled region"
 
-    def swank_interactive_eval(self, string):
-        return self.swank_eval(string)
-
-    def swank_interactive_eval_region(self, string):
-        return self.swank_eval(string)
-
-    def swank_pprint_eval(self, string):
-        return self.swank_eval(string)
+    def swank_eval_and_grab_output(self, string, limit=64 * 1024,
+                                   timeout=None):
+        """Eval string returning (output value) as strings.
+
+        Output is kept up to limit characters, and so is the repr of
+        the value.
+
+        """
+        output = GrabBuffer(limit)
+        # On one line when it fits in limit, like the repr of local values.
+        with redirect(output):
+            value = self.eval(string, timeout,
+                              budgets=dict(width=limit, max_chars=limit))
+        result = GrabBuffer(limit)
+        result.write("" if value is None else repr(value))
+        return [output.getvalue(), result.getvalue()]
+
+    def swank_flow_control_test(self, count, delay=0):
+        """Print count lines, sleeping delay seconds after each."""
+        with self.output():
+            for i in range(count):
+                print(i)
+                if delay:
+                    time.sleep(delay)
+        return lbool(False)
 
-    def swank_simple_completions(self, string, trash):
-        try:
-            import readline
-        except ImportError:
-            return [[], string]
+    def swank_interactive_eval(self, string, timeout=None):
+        return self.swank_eval(string, timeout)
+
+    def swank_interactive_eval_region(self, string, timeout=None):
+        return self.swank_eval(string, timeout)
+
+    def pprint(self, value, limit=64 * 1024, depth=8,
+               time_limit_in_msec=1000, stream=False):
+        """Return value rendered by a PrettyPrinter with these budgets.
+
+        With stream the text is written to Emacs chunk by chunk, as it
+        is rendered, and only its size is returned.
+
+        """
+        from pretty import PrettyPrinter
+        if value is None:
+            return "; No value"
+        remote = False
+        if self.workers is not None:
+            from workers import RemoteValue
+            remote = isinstance(value, RemoteValue)
+        if remote:
+            # Rendered with these budgets by the worker.
+            text = value.text
+            if not stream:
+                return text
+            chunks = (text[i:i + 4096] for i in range(0, len(text), 4096))
         else:
-            import rlcompleter
-            readline.set_completer(rlcompleter.Completer().complete)
-            completions = []
-            try:
-                i = 0
-                while True:
-                    res = readline.get_completer()(string, i)
-                    if not res: break
-                    i += 1
-                    completions.append(res)
-            except NameError:
-                pass
-            newinput = os.path.commonprefix(completions)
-            return [[completions], newinput]
-
-    def swank_apropos_list_for_emacs(self):
-        pass
-
-    def swank_backtrace(self):
-        pass
+            printer = PrettyPrinter(**pprint_budgets(
+                limit, depth, time_limit_in_msec))
+            if not stream:
+                return printer.pformat(value)
+            chunks = printer.chunks(value, chunk_size=4096)
+        size = 0
+        with self.output() as channel:
+            for chunk in chunks:
+                size += len(chunk)
+                if channel is not None:
+                    channel.write(chunk)
+        return "; {0} characters".format(size)
+
+    def swank_pprint_eval(self, string, timeout=None, **budgets):
+        """Eval string and return its value pretty printed.
+
+        The rendering is bounded in size (limit characters), depth and
+        time (time_limit_in_msec), and elided past those budgets.
+
+        """
+        with self.output():
+            value = self.eval(string, timeout,
+                              budgets=pprint_budgets(**budgets))
+        return self.pprint(value, **budgets)
+
+    def swank_simple_completions(self, string, package=None):
+        """Return the completions of string and their common prefix."""
+        completions = self.completions.complete(string)
+        newinput = os.path.commonprefix(completions) or string
+        return [completions, newinput]
+
+    def swank_fuzzy_completions(self, string, package=None, limit=300,
+                                time_limit_in_msec=1500):
+        """Return fuzzy completions of string, best scored first.
+
+        Each completion is (completion score chunks classification),
+        followed by a flag telling if the search was interrupted by
+        the time limit.
+
+        """
+        index = self.completions
+        matches, interrupted = index.fuzzy(
+            string, limit=limit or 300,
+            time_limit=(time_limit_in_msec or 1500) / 1000.0)
+        return [
+            [[completion, score, [list(chunk) for chunk in chunks],
+              index.kind(completion)]
+             for completion, score, chunks in matches],
+            interrupted
+        ]
+
+    def swank_apropos_list_for_emacs(self, name, external_only=True,
+                                     case_sensitive=False, package=None,
+                                     kinds=None, timeout=2.0):
+        """Return (:designator name :kind doc) plists matching name.
+
+        name is a regexp matched against module qualified names, and
+        against the plain names of the session namespace.  kinds
+        restricts the result to some of function, class and variable.
+
+        """
+        self.apropos.refresh(timeout=timeout)
+        if kinds:
+            kinds = [str(unquote(kind)).lstrip(":") for kind in kinds]
+        results = self.apropos.search(
+            name, case_sensitive=bool(case_sensitive),
+            external_only=bool(external_only), package=package or None,
+            kinds=kinds, namespace=self.locals)
+        plists = []
+        for designator, kind, value in results:
+            doc = getattr(value, '__doc__', None) if kind != 'variable' \
+                else None
+            doc = doc.strip().split("\n", 1)[0] if doc and \
+                isinstance(doc, str) else symbol(":not-documented")
+            plists.append([symbol(":designator"), designator,
+                           symbol(":" + kind), doc])
+        return plists
+
+    def swank_autodoc(self, raw_form, print_right_margin=None,
+                      timeout=0.05):
+        """Return (arglist cache-p) for the call around the cursor.
+
+        arglist highlights the argument at the cursor, or is
+        :not-available.  Signatures not computed within timeout
+        seconds are :not-available for now, and not to be cached by
+        Emacs, which asks again on the next movement.
+
+        """
+        from arglists import NO_ARGLIST, find_operator
+        name, index = find_operator(raw_form)
+        if name is None:
+            return [symbol(":not-available"), True]
+        arglist = self.arglists.arglist(name, self.locals, index, timeout)
+        if arglist is None:
+            return [symbol(":not-available"), False]
+        if arglist is NO_ARGLIST:
+            return [symbol(":not-available"), True]
+        return [arglist, True]
+
+    def swank_backtrace(self, start, end=None):
+        """Return (index description) of frames start to end."""
+        return self.debug_level().frames(start, end)
 
     def swank_commit_edited_value(self):
         pass
 
-    def swank_compile_file_for_emacs(self):
-        pass
-
-    def swank_compile_multiple_strings_for_emacs(self):
-        pass
-
-    def swank_compile_string_for_emacs(self):
-        pass
+    def compilation_result(self, notes, success, start, load_p):
+        """Return the slime compilation result of notes.
+
+        Loading is done by the compile commands themselves, so there is
+        no fasl file for Emacs to load.
+
+        """
+        return [symbol(":compilation-result"), notes, bool(success),
+                time.perf_counter() - start, bool(load_p), False]
+
+    def compiler_note(self, note, location):
+        return [symbol(":message"), note.message,
+                symbol(":severity"), symbol(":" + note.severity),
+                symbol(":location"), location,
+                symbol(":references"), False]
+
+    def swank_compile_file_for_emacs(self, filename, load_p=False,
+                                     **options):
+        """Byte-compile filename, or all python files under it.
+
+        Files are compiled by a process pool and unchanged files are
+        not compiled again.  With load_p a file compiled without errors
+        is also run in the session namespace.
+
+        """
+        from compiler import load_bytecode, source_paths
+        start = time.perf_counter()
+        results = self.compiler.compile_files(source_paths(filename))
+        notes = [self.compiler_note(note, source_location(
+                     note.filename, note.line, note.column))
+                 for result in results for note in result.notes]
+        success = all(result.success for result in results)
+        if load_p and success and len(results) == 1:
+            with self.output():
+                self.load_code(load_bytecode(results[0].bytecode))
+        return self.compilation_result(notes, success, start, load_p)
+
+    def swank_compile_multiple_strings_for_emacs(self, strings, policy=None):
+        """Compile and run each (string buffer position filename).
+
+        Strings are compiled at their line in the buffer, so tracebacks
+        point into it, and notes are located by offset in the buffer.
+
+        """
+        from compiler import compile_source
+        start = time.perf_counter()
+        notes = []
+        success = True
+        for string, buffer, position, filename in strings:
+            string = unquote(string)
+            buffer = unquote(buffer)
+            offset, line = buffer_position(position)
+            code, string_notes = compile_source(
+                "\n" * (line - 1) + string, unquote(filename) or buffer)
+            lines = string.splitlines(True)
+            for note in string_notes:
+                before = lines[:max(note.line - line, 0)]
+                notes.append(self.compiler_note(note, [
+                    symbol(":location"), [symbol(":buffer"), buffer],
+                    [symbol(":offset"), offset,
+                     sum(len(text) for text in before) + note.column],
+                    False]))
+            if code is None:
+                success = False
+                continue
+            with self.output():
+                self.load_code(code)
+        return self.compilation_result(notes, success, start, True)
+
+    def swank_compile_string_for_emacs(self, string, buffer, position,
+                                       filename, policy=None):
+        return self.swank_compile_multiple_strings_for_emacs(
+            [[string, buffer, position, filename]], policy)
 
     def swank_create_server(self):
         pass
@@ -186,77 +869,138 @@ class SwankProtocol(object):
     def swank_debug_nth_thread(self):
         pass
 
-    def swank_debugger_info_for_emacs(self):
-        pass
+    def swank_debugger_info_for_emacs(self, start=0, end=None):
+        """Return (condition restarts frames conts) of the debugger."""
+        return self.debugger_info(self.debug_level(), start, end)[2:]
 
     def swank_default_directory(self):
         pass
 
-    def swank_describe_definition_for_emacs(self):
-        pass
-
-    def swank_describe_function(self):
-        pass
-
-    def swank_describe_symbol(self):
-        pass
+    def describe(self, name, kind, timeout=None):
+        """Return the description of kind (a docs function) of name.
+
+        Descriptions are cached by the object name is bound to and the
+        version of its module, or the namespace generation for objects
+        of the session.  One not rendered within timeout seconds is
+        summarized, and cached for the next time when it completes.
+
+        """
+        import docs
+        from arglists import resolve
+        obj = resolve(name, self.locals)
+        if obj is None:
+            return "{0} is unbound".format(name)
+        render = getattr(docs, kind)
+        version = docs.module_version(obj)
+        if version is None:
+            version = ('session', id(self.locals), self.namespace_generation)
+        text = self.docs.get(kind, render, obj, name, version, timeout)
+        if text is None:
+            return docs.summary(obj, name)
+        return text
+
+    def swank_describe_definition_for_emacs(self, name, kind, timeout=0.5):
+        """Describe name as the definition of kind (e.g. :function)."""
+        if str(kind).lstrip(':').lower() in ('function', 'macro',
+                                             'generic-function'):
+            return self.describe(name, 'describe_function', timeout)
+        return self.describe(name, 'describe', timeout)
+
+    def swank_describe_function(self, name, timeout=0.5):
+        """Return the signature and documentation of the function name."""
+        return self.describe(name, 'describe_function', timeout)
+
+    def swank_describe_symbol(self, name, timeout=0.5):
+        """Return the pydoc description of what name is bound to."""
+        return self.describe(name, 'describe', timeout)
 
     def swank_disassemble_form(self):
         pass
 
-    def swank_documentation_symbol(self):
-        pass
-
-    def swank_eval_and_grab_output(self):
-        pass
-
-    def swank_eval_string_in_frame(self):
-        pass
-
-    def swank_find_definitions_for_emacs(self):
-        pass
-
-    def swank_flow_control_test(self):
-        pass
-
-    def swank_frame_locals_and_catch_tags(self):
-        pass
+    def swank_documentation_symbol(self, name, timeout=0.5):
+        """Return the signature and docstring of name."""
+        return self.describe(name, 'documentation', timeout)
+
+    def swank_eval_string_in_frame(self, string, index, package=None):
+        """Eval string in frame index, returning a bounded repr."""
+        from debugger import LOCAL_REPR
+        from reprs import safe_repr
+        level = self.debug_level()
+        value = level.eval_in_frame(string, index)
+        return "; No value" if value is None else \
+            safe_repr(value, LOCAL_REPR)
+
+    def swank_find_definitions_for_emacs(self, name, timeout=5.0):
+        """Return (dspec location) for the definitions of name."""
+        self.xref.refresh(timeout=timeout)
+        return [["{0} {1}".format(kind, qualname),
+                 source_location(path, line, column)]
+                for path, qualname, kind, line, column
+                in self.xref.definitions(name)]
+
+    def swank_frame_locals_and_catch_tags(self, index):
+        """Return ((:name :id :value) plists) of frame index, no tags."""
+        level = self.debug_level()
+        return [[[symbol(":name"), name, symbol(":id"), 0,
+                  symbol(":value"), value]
+                 for name, value in level.render_locals(index)],
+                False]
 
     def swank_frame_package_name(self):
         pass
 
-    def swank_frame_source_location(self):
-        pass
+    def swank_frame_source_location(self, index):
+        level = self.debug_level()
+        filename, line = level.source(index)
+        if not os.path.isfile(filename):
+            return [symbol(":error"),
+                    "No source file for frame {0}".format(index)]
+        return source_location(filename, line)
 
-    def swank_init_inspector(self):
-        pass
+    def swank_init_inspector(self, string):
+        """Eval string and inspect the result."""
+        obj = eval(compile(string, '<string>', 'eval'), self.locals)
+        return self.inspector.inspect(obj)
 
     def swank_inspect_current_condition(self):
-        pass
+        return self.inspector.inspect(self.debug_level().exception)
 
-    def swank_inspect_frame_var(self):
-        pass
+    def swank_inspect_frame_var(self, index, var):
+        """Inspect local number var of frame index."""
+        items = self.debug_level().locals(index, var + 1)
+        if len(items) <= var:
+            raise Abort("No local {0} in frame {1}".format(var, index))
+        return self.inspector.inspect(items[var][1])
 
     def swank_inspect_in_frame(self):
         pass
 
-    def swank_inspect_nth_part(self):
-        pass
+    def swank_inspect_nth_part(self, index):
+        return self.inspector.inspect(self.inspector.nth_part(index))
 
     def swank_inspector_eval(self):
         pass
 
     def swank_inspector_history(self):
-        pass
+        return self.inspector.format_history()
+
+    def swank_inspector_next(self):
+        return self.inspector.next()
 
     def swank_inspector_pop(self):
-        pass
+        return self.inspector.pop()
 
-    def swank_inspector_range(self):
-        pass
+    def swank_inspector_range(self, start, end):
+        return self.inspector.content_range(start, end)
 
     def swank_inspector_reinspect(self):
-        pass
+        return self.inspector.reinspect()
+
+    def swank_invoke_nth_restart_for_emacs(self, level, restart):
+        """Invoke ABORT, the only restart: leave level and those above."""
+        self.debug_level(level)
+        self.leave_debugger(level)
+        raise Abort("Left debugger level {0}".format(level))
 
     def swank_kill_nth_thread(self):
         pass
@@ -264,29 +1008,86 @@ class SwankProtocol(object):
     def swank_list_all_package_names(self):
         pass
 
-    def swank_load_file(self):
-        pass
+    def swank_load_file(self, filename, profile_imports=False):
+        """Run filename, a source or bytecode file, in the session.
 
-    def swank_pprint_eval(self):
-        pass
+        With profile_imports the imports it made are returned as a tree
+        of (module total-ms own-ms children), slowest first.
 
-    def swank_pprint_eval_string_in_frame(self):
-        pass
+        """
+        from compiler import load_bytecode
+        from importtime import ImportProfiler
+        if filename.endswith(".pyc"):
+            code = load_bytecode(filename)
+        else:
+            with open(filename, "rb") as f:
+                code = compile(f.read(), filename, "exec")
+        profiler = ImportProfiler()
+        with self.output():
+            if profile_imports:
+                with profiler:
+                    self.load_code(code)
+            else:
+                self.load_code(code)
+        if not profile_imports:
+            return True
+        return [node.to_list() for node in profiler.tree()]
+
+    def swank_operator_arglist(self, name, package=None, timeout=0.05):
+        """Return the arglist of the callable name, nil if unknown."""
+        from arglists import NO_ARGLIST
+        arglist = self.arglists.arglist(name, self.locals, None, timeout)
+        if arglist is None or arglist is NO_ARGLIST:
+            return False
+        return arglist
+
+    def swank_pprint_eval_string_in_frame(self, string, index, package=None,
+                                          **budgets):
+        """Eval string in frame index, returning its value pretty printed."""
+        value = self.debug_level().eval_in_frame(string, index)
+        return self.pprint(value, **budgets)
 
     def swank_pprint_inspector_part(self):
         pass
 
-    def swank_profile_by_substring(self):
-        pass
+    def profile_module(self, package, match=None, methods=True):
+        """Profile functions of package, the session namespace if None."""
+        name = self.locals.get('__name__')
+        if not package or package == name:
+            return self.profiler.profile_namespace(
+                self.locals, name, match, methods)
+        return self.profiler.profile_module(package, match, methods)
 
-    def swank_profile_package(self):
-        pass
+    def swank_profile_by_substring(self, substring, package=None):
+        """Profile functions whose qualified name contains substring.
+
+        Functions are looked up in package, or in the session
+        namespace when no package is given.
+
+        """
+        count = self.profile_module(package, lambda name: substring in name)
+        return "{0} functions containing {1!r} profiled".format(
+            count, substring)
+
+    def swank_profile_package(self, package, callers=None, methods=True):
+        """Profile every function (and method) defined in package."""
+        count = self.profile_module(package, methods=bool(methods))
+        return "{0} functions profiled in {1}".format(
+            count, package or self.locals.get('__name__'))
+
+    def swank_profile_report(self):
+        return self.profiler.format_report()
 
     def swank_profile_reset(self):
-        pass
+        self.profiler.reset()
+        return "Reset profiling counters"
+
+    def swank_profiled_functions(self):
+        return self.profiler.profiled_functions()
 
     def swank_quit_inspector(self):
-        pass
+        self.inspector.reset()
+        return lbool(False)
 
     def swank_quit_thread_browser(self):
         pass
@@ -301,7 +1102,20 @@ class SwankProtocol(object):
         pass
 
     def swank_sldb_abort(self):
-        pass
+        """Leave the innermost debugger level of the thread.
+
+        Outside the debugger, interrupt the other evaluations running
+        for this connection.
+
+        """
+        debug_level = self.debugger.current(self.thread)
+        if debug_level is not None:
+            self.leave_debugger(debug_level.level)
+            return "Left debugger level {0}".format(debug_level.level)
+        count = self.evaluations.interrupt(
+            True, exclude=threading.get_ident())
+        return "Interrupted {0} evaluation{1}".format(
+            count, "" if count == 1 else "s")
 
     def swank_sldb_break(self):
         pass
@@ -346,7 +1160,16 @@ class SwankProtocol(object):
         pass
 
     def swank_throw_to_toplevel(self):
-        pass
+        """Leave the debugger of the thread and abort, as slime expects.
+
+        Outside the debugger, interrupt the other evaluations.
+
+        """
+        count = self.leave_debugger()
+        if count:
+            raise Abort("Left {0} debugger level{1}".format(
+                count, "" if count == 1 else "s"))
+        raise Abort(self.swank_sldb_abort())
 
     def swank_toggle_break_on_signals(self):
         pass
@@ -361,7 +1184,8 @@ class SwankProtocol(object):
         pass
 
     def swank_unprofile_all(self):
-        pass
+        self.profiler.unprofile_all()
+        return "All functions unprofiled"
 
     def swank_untrace_all(self):
         pass
@@ -372,8 +1196,31 @@ class SwankProtocol(object):
     def swank_value_for_editing(self):
         pass
 
-    def swank_xref(self):
-        pass
+    def swank_xref(self, type, name, timeout=5.0):
+        """Return (dspec location) for the type cross references of name.
 
-    def swank_xrefs(self):
-        pass
+        type is one of :calls (who calls name), :calls-who, :references,
+        :binds (also :sets) and :imports (who imports module name).
+
+        """
+        type = type.lstrip("':")
+        callees = type in ("calls-who", "callees")
+        if not callees and type not in XREF_RELATIONS:
+            return symbol(":not-implemented")
+        self.xref.refresh(timeout=timeout)
+        if callees:
+            entries = self.xref.callees(name)
+        else:
+            entries = self.xref.lookup(XREF_RELATIONS[type], name)
+        return [[other if callees else scope,
+                 source_location(path, line, column)]
+                for path, scope, line, column, other in entries]
+
+    def swank_xrefs(self, types, name, timeout=5.0):
+        """Return (type xrefs...) groups for each type with xrefs."""
+        groups = []
+        for type in types:
+            xrefs = self.swank_xref(type, name, timeout=timeout)
+            if isinstance(xrefs, list) and xrefs:
+                groups.append([type.lstrip("':")] + xrefs)
+        return groups
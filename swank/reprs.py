@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import logging
+import reprlib
+from itertools import islice
+
+import logconfig
+
+
+__all__ = ['SafeRepr', 'safe_repr']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class SafeRepr(reprlib.Repr):
+    """reprlib.Repr that never walks or sorts a whole container.
+
+    The stock Repr sorts dicts and sets before taking the first few
+    items, and falls back to the full builtin repr() for container
+    subclasses; both are a problem for containers with millions of
+    items.  Here dicts and sets are only iterated up to the limit and
+    container subclasses are handled like their base type.
+
+    """
+
+    bases = ((dict, 'repr_dict'), (list, 'repr_list'), (tuple, 'repr_tuple'),
+             (set, 'repr_set'), (frozenset, 'repr_frozenset'))
+
+    def __init__(self, maxstring=120, maxother=120, maxlevel=3,
+                 maxitems=10):
+        reprlib.Repr.__init__(self)
+        self.maxstring = maxstring
+        self.maxother = maxother
+        self.maxlevel = maxlevel
+        self.maxdict = self.maxlist = self.maxtuple = maxitems
+        self.maxset = self.maxfrozenset = self.maxdeque = maxitems
+        self.maxarray = maxitems
+        self.fillvalue = '...'
+
+    def repr1(self, x, level):
+        typename = type(x).__name__
+        if ' ' in typename:
+            typename = '_'.join(typename.split())
+        if not hasattr(self, 'repr_' + typename):
+            for base, method in self.bases:
+                if isinstance(x, base):
+                    prefix = typename + '('
+                    return prefix + getattr(self, method)(x, level) + ')'
+        return reprlib.Repr.repr1(self, x, level)
+
+    def repr_dict(self, x, level):
+        if not x:
+            return '{}'
+        if level <= 0:
+            return '{' + self.fillvalue + '}'
+        pieces = []
+        for key, value in islice(x.items(), self.maxdict):
+            pieces.append('%s: %s' % (self.repr1(key, level - 1),
+                                      self.repr1(value, level - 1)))
+        if len(x) > self.maxdict:
+            pieces.append(self.fillvalue)
+        return '{%s}' % ', '.join(pieces)
+
+    def repr_unsorted(self, x, level, left, right, maxiter):
+        if not x:
+            return left + right
+        if level <= 0:
+            return left + self.fillvalue + right
+        pieces = [self.repr1(item, level - 1) for item in islice(x, maxiter)]
+        if len(x) > maxiter:
+            pieces.append(self.fillvalue)
+        return left + ', '.join(pieces) + right
+
+    def repr_set(self, x, level):
+        if not x:
+            return 'set()'
+        return self.repr_unsorted(x, level, '{', '}', self.maxset)
+
+    def repr_frozenset(self, x, level):
+        return self.repr_unsorted(
+            x, level, 'frozenset({', '})', self.maxfrozenset)
+
+
+DEFAULT_REPR = SafeRepr()
+
+
+def safe_repr(obj, repr=DEFAULT_REPR):
+    """Return a bounded repr of obj, never raising."""
+    try:
+        return repr.repr(obj)
+    except Exception as e:
+        return '<{0} instance at {1:#x} (repr failed: {2})>'.format(
+            type(obj).__name__, id(obj), type(e).__name__)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import logconfig
+from lisp import lbool
+
+
+__all__ = ['QueueFull', 'Scheduler', 'thread_key']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a thread has too many requests waiting."""
+
+
+def thread_key(thread):
+    """Return the lane key for a swank thread designator.
+
+    The designator t (or nil) means any thread will do and maps to
+    None.  Anything else (:repl-thread, numeric thread ids) names a
+    lane whose requests must run one after the other.
+
+    """
+    if thread is None or isinstance(thread, (bool, lbool)):
+        return None
+    return thread
+
+
+class Scheduler(object):
+    """Run swank requests on a pool of worker threads.
+
+    Requests for the t thread run concurrently on any free worker.
+    Requests for a named thread (:repl-thread, numeric ids) are kept
+    in a per-thread lane and run in order, one at a time, while other
+    lanes and free requests proceed in parallel.  Each lane (and the
+    set of free requests) holds at most queue_size waiting requests,
+    submitting more raises QueueFull.
+
+    """
+
+    def __init__(self, executor=None, max_workers=8, queue_size=32):
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.lanes = {}
+        self.active = set()
+        self.free = 0
+
+    def submit(self, thread, fn, *args):
+        """Schedule fn(*args) on the lane for the thread designator."""
+        key = thread_key(thread)
+        with self.lock:
+            if key is None:
+                if self.free >= self.queue_size:
+                    raise QueueFull("Too many pending requests")
+                self.free += 1
+                self.executor.submit(self.run_free, fn, args)
+                return
+            lane = self.lanes.setdefault(key, deque())
+            if len(lane) >= self.queue_size:
+                raise QueueFull(
+                    "Too many pending requests for thread {0}".format(key))
+            lane.append((fn, args))
+            if key in self.active:
+                return
+            self.active.add(key)
+        self.executor.submit(self.run_lane, key)
+
+    def depth(self):
+        """Return the number of requests waiting or running."""
+        with self.lock:
+            return self.free + sum(len(lane) for lane in self.lanes.values())
+
+    def depths(self):
+        """Return a dict mapping lane keys to their pending requests."""
+        with self.lock:
+            depths = dict((key, len(lane)) for key, lane in self.lanes.items())
+            depths[None] = self.free
+            return depths
+
+    def run_free(self, fn, args):
+        try:
+            self.call(fn, args)
+        finally:
+            with self.lock:
+                self.free -= 1
+
+    def run_lane(self, key):
+        lane = self.lanes[key]
+        while True:
+            with self.lock:
+                if not lane:
+                    self.active.discard(key)
+                    del self.lanes[key]
+                    return
+                fn, args = lane[0]
+            try:
+                self.call(fn, args)
+            finally:
+                with self.lock:
+                    lane.popleft()
+
+    def call(self, fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception('Scheduled request failed')
+
+    def shutdown(self, wait=True):
+        if self.owns_executor:
+            self.executor.shutdown(wait=wait)
@@ -1,20 +1,18 @@
 # -*- coding: utf-8 -*-
 import logging
+import os
 import socket
+import socketserver
 import sys
 from threading import Thread
 
 import logconfig
+from framing import (HEADER_LENGTH, FrameDecoder, FrameWriter,
+                     python_encoding, set_nodelay)
 from lisp import LispReader
 from protocol import SwankProtocol
-from repl import repl
-
-
-try:
-    import SocketServer as socketserver
-except ImportError:
-    # Python 3 support
-    import socketserver
+from scheduler import QueueFull, Scheduler
+from wiretrace import RECORDER, install_signal_handler
 
 
 __all__ = ['HEADER_LENGTH', 'SwankServerRequestHandler',
@@ -24,7 +22,6 @@ __all__ = ['HEADER_LENGTH', 'SwankServerRequestHandler',
 logconfig.configure()
 logger = logging.getLogger(__name__)
 
-HEADER_LENGTH = 6
 PROMPT = "Python> "
 LOCALS = {"__name__": "__console__", "__doc__": None}
 
@@ -38,58 +35,80 @@ class SwankServerRequestHandler(socketserver.BaseRequestHandler):
 
     """
 
+    protocol_class = SwankProtocol
+
     def __init__(self, request, client_address, server):
-        encodings = {
-            "iso-latin-1-unix": "latin-1",
-            "iso-utf-8-unix": "utf-8"
-        }
-        self.encoding = encodings.get(server.encoding, "utf-8")
-        self.protocol = SwankProtocol(
-            server.socket, locals=LOCALS, prompt=PROMPT
+        self.encoding = python_encoding(server.encoding)
+        self.protocol = self.protocol_class(
+            server.socket, locals=LOCALS, prompt=PROMPT, send=self.send,
+            encoding=self.encoding
         )
+        self.scheduler = Scheduler()
+        self.writer = FrameWriter(request)
+        set_nodelay(request, server.nodelay)
         socketserver.BaseRequestHandler.__init__(
             self, request, client_address, server)
 
+    def send(self, ret, flush=True):
+        """Send a response frame, safe to call from worker threads.
+
+        Frames sent concurrently are coalesced by the FrameWriter; with
+        flush=False the frame waits for the next one sent.
+
+        """
+        if RECORDER.frames is not None:
+            RECORDER.record(self.peer, 'send', ret[HEADER_LENGTH:])
+        self.writer.write(ret, flush)
+
+    def reply(self, request):
+        self.send(self.protocol.execute(request))
+
+    @property
+    def peer(self):
+        return "{0}:{1}".format(*self.client_address[:2])
+
     def handle(self):
-        logger.debug('handle')
+        decoder = FrameDecoder()
         first = True
-        while True:
-            try:
-                raw = self.request.recv(HEADER_LENGTH)
-                logger.debug('raw()->"%s"', raw)
-                if raw:
-                    length = int(raw, 16)
-                else:
-                    logger.error('Empty header received')
-                    self.request.close()
-                    break;
-                data = self.request.recv(length)
-                logger.debug('recv()->"%s"', data)
-
-                if first:
-                    ret = self.protocol.indentation_update()
-                    ret = ret.encode(self.encoding)
-                    logger.debug('send()->"%s"', ret)
-                    self.request.send(ret)
-
-                data = data.decode(self.encoding)
-                ret = self.protocol.dispatch(data)
-                ret = ret.encode(self.encoding)
-                self.request.send(ret)
-                logger.debug('send()->"%s"', ret)
-                first = False
-            except socket.timeout as e:
-                logger.error('Socket error', e)
-                break
+        try:
+            while True:
+                try:
+                    if not decoder.recv_from(self.request):
+                        logger.debug('Connection closed by peer')
+                        self.request.close()
+                        break
+                    for data in decoder.frames():
+                        if RECORDER.frames is not None:
+                            RECORDER.record(self.peer, 'recv', data)
+                        if first:
+                            # Goes out with the reply to this request.
+                            self.send(self.protocol.indentation_update(),
+                                      flush=False)
+                            first = False
+                        request = self.protocol.receive(data)
+                        if request is None:
+                            continue
+                        try:
+                            self.scheduler.submit(
+                                request.thread, self.reply, request)
+                        except QueueFull as e:
+                            self.send(self.protocol.abort(request, str(e)))
+                except socket.timeout as e:
+                    logger.error('Socket error', e)
+                    break
+        finally:
+            self.protocol.close()
+            self.scheduler.shutdown(wait=False)
 
 
 class SwankServer(socketserver.TCPServer):
     """Good ol' TCPServer using SwankServerRequestHandler as handler."""
 
     def __init__(self, server_address, handler_class=SwankServerRequestHandler,
-                 port_filename=None, encoding="utf-8"):
+                 port_filename=None, encoding="utf-8", nodelay=True):
         self.port_filename = port_filename
         self.encoding = encoding
+        self.nodelay = nodelay
         server = socketserver.TCPServer.__init__(self, server_address, handler_class)
         ipaddr, port = self.server_address
         logger.info('Serving on: {0} ({1})'.format(ipaddr, port))
@@ -99,23 +118,44 @@ class SwankServer(socketserver.TCPServer):
                 port_file.write("{0}".format(port))
 
 
-def serve(ipaddr="127.0.0.1", port=0, port_filename=None, encoding="utf-8"):
+def serve(ipaddr="127.0.0.1", port=0, port_filename=None, encoding="utf-8",
+          backend="threading", eval_workers=0, nodelay=True):
     """Start a swank server on given port.
 
-    If no port is provided then let the OS choose it.
+    If no port is provided then let the OS choose it.  The backend is
+    either "threading", the TCPServer serving a connection at a time,
+    or "asyncio" which multiplexes connections on an event loop.  With
+    eval_workers, evals run in a pool of that many processes.  nodelay
+    sets TCP_NODELAY on connections: frames are coalesced by the
+    server, so Nagle's algorithm only adds latency.
 
     """
-    server = SwankServer((ipaddr, port), port_filename=port_filename,
-                         encoding=encoding)
+    if eval_workers:
+        from workers import WorkerPool
+        SwankProtocol.workers = WorkerPool(eval_workers).start()
+    if backend == "asyncio":
+        from aioserver import AsyncSwankServer
+        server = AsyncSwankServer((ipaddr, port), port_filename=port_filename,
+                                  encoding=encoding, locals=LOCALS,
+                                  prompt=PROMPT, nodelay=nodelay)
+    elif backend == "threading":
+        server = SwankServer((ipaddr, port), port_filename=port_filename,
+                             encoding=encoding, nodelay=nodelay)
+    else:
+        raise ValueError("Unknown backend: {0}".format(backend))
     server.serve_forever()
 
 
-def swank_process(ipaddr="127.0.0.1", port=0, port_filename=None, encoding="utf-8"):
+def swank_process(ipaddr="127.0.0.1", port=0, port_filename=None, encoding="utf-8",
+                  backend="threading", eval_workers=0, nodelay=True):
     server = Thread(
-        target=serve, args=(ipaddr, port, port_filename, encoding)
+        target=serve,
+        args=(ipaddr, port, port_filename, encoding, backend, eval_workers,
+              nodelay)
     )
     server.start()
     server.join(3)
+    from repl import repl
     console = Thread(
         target=repl, kwargs=dict(prompt=PROMPT, locals=LOCALS,
                                  stdin=sys.stdin, stderr=sys.stderr)
@@ -135,6 +175,11 @@ def main(read_input=False):
     port = 0
     encoding = "utf-8"
     port_filename = None
+    backend = os.environ.get("SWANK_BACKEND", "threading")
+    eval_workers = int(os.environ.get("SWANK_EVAL_WORKERS", 0))
+    eval_timeout = os.environ.get("SWANK_EVAL_TIMEOUT")
+    nodelay = os.environ.get("SWANK_TCP_NODELAY", "1") != "0"
+    install_signal_handler()
 
     logger.info("Waiting for setup string...")
     try:
@@ -144,10 +189,7 @@ def main(read_input=False):
         #  (funcall (read-from-string "swank-loader:init"))
         #  (funcall (read-from-string "swank:start-server") "/tmp/slime.9999"))
         # This parses it and retrieves the port file to start the connection.
-        try:
-            setup = LispReader(raw_input()).read()
-        except NameError:
-            setup = LispReader(input()).read()
+        setup = LispReader(input()).read()
         if setup:
             port_filename = setup[-1][-1]
     except:
@@ -155,39 +197,51 @@ def main(read_input=False):
 
     if port_filename is None:
         logger.info("No setup string detected, parsing args...")
-        try:
-            import argparse
-            parser = argparse.ArgumentParser()
-            parser.add_argument(
-                "-a", "--ipaddr", help="bind address", default=ipaddr)
-            parser.add_argument(
-                "-p", "--port", type=int, help="port", default=port)
-            parser.add_argument("-f", "--port-filename")
-            parser.add_argument("-e", "--encoding", default=encoding)
-            args = parser.parse_args()
-        except ImportError:
-            import optparse
-            parser = optparse.OptionParser()
-            parser.add_option(
-                "-a", "--ipaddr", help="bind address", default=ipaddr)
-            parser.add_option(
-                "-p", "--port", type=int, help="port", default=port)
-            parser.add_option("-f", "--port-filename")
-            parser.add_option("-e", "--encoding", default=encoding)
-            (args, _) = parser.parse_args()
+        import argparse
+        parser = argparse.ArgumentParser()
+        parser.add_argument(
+            "-a", "--ipaddr", help="bind address", default=ipaddr)
+        parser.add_argument(
+            "-p", "--port", type=int, help="port", default=port)
+        parser.add_argument("-f", "--port-filename")
+        parser.add_argument("-e", "--encoding", default=encoding)
+        parser.add_argument(
+            "-b", "--backend", choices=["threading", "asyncio"],
+            default=backend)
+        parser.add_argument(
+            "-w", "--eval-workers", type=int, default=eval_workers,
+            help="run evals in this many worker processes")
+        parser.add_argument(
+            "-t", "--eval-timeout", type=float, default=eval_timeout,
+            help="interrupt evals running longer (seconds)")
+        parser.add_argument(
+            "--no-nodelay", dest="nodelay", action="store_false",
+            default=nodelay, help="leave Nagle's algorithm on")
+        args = parser.parse_args()
 
         ipaddr = args.ipaddr
         port = args.port
         port_filename = args.port_filename
         encoding = args.encoding
+        backend = args.backend
+        eval_workers = args.eval_workers
+        eval_timeout = args.eval_timeout
+        nodelay = args.nodelay
 
     logger.debug("%s", {
         'ipaddr': ipaddr,
         'port': port,
         'port_filename': port_filename,
-        'encoding': encoding
+        'encoding': encoding,
+        'backend': backend,
+        'eval_workers': eval_workers,
+        'eval_timeout': eval_timeout,
+        'nodelay': nodelay
     })
-    swank_process(ipaddr, int(port), port_filename, encoding)
+    if eval_timeout:
+        SwankProtocol.eval_timeout = float(eval_timeout)
+    swank_process(ipaddr, int(port), port_filename, encoding, backend,
+                  eval_workers, nodelay)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+import logconfig
+
+
+__all__ = ['RECORDER', 'WireRecorder', 'default_dump_path',
+           'install_signal_handler', 'load_trace']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+
+class WireRecorder(object):
+    """Ring buffer of the last frames sent and received.
+
+    frames is None while recording is off, and call sites test it
+    before calling record, so a disabled recorder costs an attribute
+    load per frame.  Records are (time, connection, direction, data)
+    with data the frame payload as bytes.  Frames recorded are kept
+    after stopping, until recording starts again.
+
+    """
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.frames = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.frames is not None
+
+    def start(self, size=None):
+        with self.lock:
+            self.size = size or self.size
+            self.frames = deque(self.frames or (), maxlen=self.size)
+            self.last = None
+
+    def stop(self):
+        with self.lock:
+            if self.frames is not None:
+                self.last, self.frames = self.frames, None
+
+    def record(self, connection, direction, data):
+        frames = self.frames
+        if frames is not None:
+            frames.append((time.time(), connection, direction, data))
+
+    def snapshot(self):
+        frames = self.frames if self.frames is not None else self.last
+        return list(frames or ())
+
+    def dump(self, path):
+        """Write the frames as JSON lines, returning how many."""
+        import json
+        frames = self.snapshot()
+        with open(path, 'w') as f:
+            for timestamp, connection, direction, data in frames:
+                if isinstance(data, bytes):
+                    data = data.decode('utf-8', 'surrogateescape')
+                f.write(json.dumps({'time': timestamp,
+                                    'connection': connection,
+                                    'direction': direction,
+                                    'data': data}) + '\n')
+        return len(frames)
+
+
+RECORDER = WireRecorder()
+
+
+def load_trace(path):
+    """Return the (time, connection, direction, data) frames of a dump."""
+    import json
+    frames = []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            frames.append((record['time'], record['connection'],
+                           record['direction'],
+                           record['data'].encode('utf-8', 'surrogateescape')))
+    return frames
+
+
+def default_dump_path():
+    import tempfile
+    return os.environ.get('SWANK_WIRE_TRACE') or os.path.join(
+        tempfile.gettempdir(), 'swank-wire-{0}.jsonl'.format(os.getpid()))
+
+
+def install_signal_handler(signum=getattr(signal, 'SIGUSR2', None),
+                           recorder=RECORDER):
+    """Toggle recorder on signum, dumping its frames when stopping.
+
+    Only possible from the main thread, and where the signal exists.
+
+    """
+    if signum is None:
+        return False
+
+    def toggle(signum, frame):
+        if recorder.enabled:
+            recorder.stop()
+            path = default_dump_path()
+            count = recorder.dump(path)
+            logger.info('Wire trace of %s frames written to %s', count, path)
+        else:
+            recorder.start()
+            logger.info('Wire trace started')
+
+    try:
+        signal.signal(signum, toggle)
+    except ValueError:
+        return False
+    return True
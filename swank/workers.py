@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import logconfig
+from pretty import PrettyPrinter
+
+
+__all__ = ['DEFAULT_PRELOAD', 'RemoteError', 'RemoteValue', 'WorkerCrashed',
+           'WorkerPool', 'worker_main']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+# Modules imported once in the fork server, so workers start warm.
+DEFAULT_PRELOAD = ('collections', 'functools', 'itertools', 'json', 'math',
+                   're')
+
+
+class RemoteError(Exception):
+    """An exception raised by code evaluated in a worker."""
+
+    def __init__(self, name, message, traceback):
+        Exception.__init__(self, "{0}: {1}".format(name, message))
+        self.name = name
+        self.traceback = traceback
+
+
+class WorkerCrashed(Exception):
+    """The worker running an evaluation died, taking its namespaces."""
+
+
+class RemoteValue(object):
+    """Value of an expression evaluated in a worker, known by its repr."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
+class PipeStream(object):
+    """Worker stdout sending its output to the parent in chunks."""
+
+    def __init__(self, connection, chunk_size=4096, flush_interval=0.05):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.size = 0
+        self.flushed = time.time()
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size or \
+                time.time() - self.flushed >= self.flush_interval:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.connection.send(('output', ''.join(self.buffer)))
+            self.buffer = []
+            self.size = 0
+        self.flushed = time.time()
+
+
+def evaluate(string, namespace):
+    try:
+        code = compile(string, '<string>', 'eval')
+    except SyntaxError:
+        exec(compile(string, '<string>', 'exec'), namespace)
+        return None
+    return eval(code, namespace)
+
+
+def worker_main(connection):
+    """Serve (session string budgets) evaluations until the pipe closes.
+
+    Values are sent back rendered by a PrettyPrinter with budgets, or
+    not at all when budgets is None.  Each session gets its own
+    namespace, dropped when the parent sends (session None None).
+    SIGINT interrupts the running evaluation and is ignored between
+    evaluations.
+
+    """
+    namespaces = {}
+    evaluating = []
+
+    def interrupt(signum, frame):
+        if evaluating:
+            raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGINT, interrupt)
+    while True:
+        try:
+            session, string, budgets = connection.recv()
+        except (EOFError, OSError):
+            break
+        if string is None:
+            namespaces.pop(session, None)
+            continue
+        namespace = namespaces.setdefault(
+            session, {"__name__": "__console__", "__doc__": None})
+        stream = PipeStream(connection)
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = stream
+        try:
+            evaluating.append(session)
+            try:
+                value = evaluate(string, namespace)
+            finally:
+                evaluating.pop()
+            if value is None or budgets is None:
+                reply = ('value', None)
+            else:
+                reply = ('value', PrettyPrinter(**budgets).pformat(value))
+        except (Exception, KeyboardInterrupt) as e:
+            frames = traceback.extract_tb(e.__traceback__)
+            if frames and frames[-1].name == interrupt.__name__:
+                del frames[-1]
+            text = "Traceback (most recent call last):\n" + "".join(
+                traceback.format_list(frames) +
+                traceback.format_exception_only(type(e), e))
+            reply = ('error', (type(e).__name__, str(e), text))
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+        stream.flush()
+        connection.send(reply)
+
+
+def context():
+    """Return the multiprocessing context the workers are started with.
+
+    A fork server is used where available: forking it is safe while the
+    server runs threads, and it holds the preloaded modules.
+
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class Worker(object):
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,),
+                                       name='swank-eval-worker')
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        # Held while an evaluation runs.
+        self.lock = threading.Lock()
+        # Held while a message is written to the worker.
+        self.send_lock = threading.Lock()
+        self.sessions = set()
+        # Session evaluating, sessions waiting for the worker and those
+        # of them interrupted, guarded by state_lock.
+        self.state_lock = threading.Lock()
+        self.running = None
+        self.queued = set()
+        self.cancelled = set()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        self.connection.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class WorkerPool(object):
+    """Pool of worker processes evaluating code for swank sessions.
+
+    Each session is pinned to the worker with the fewest sessions, and
+    keeps its namespace there, so evaluations of several sessions run
+    in parallel on different cores.  A worker found dead is replaced;
+    the evaluation it was running fails with WorkerCrashed and its
+    sessions start again from an empty namespace.
+
+    """
+
+    def __init__(self, size=None, preload=DEFAULT_PRELOAD):
+        self.size = size or multiprocessing.cpu_count()
+        self.preload = preload
+        self.context = context()
+        self.lock = threading.Lock()
+        self.workers = []
+        self.assigned = {}
+
+    def start(self):
+        if hasattr(self.context, 'set_forkserver_preload'):
+            self.context.set_forkserver_preload(list(self.preload))
+        with self.lock:
+            while len(self.workers) < self.size:
+                self.workers.append(Worker(self.context))
+        return self
+
+    def worker_for(self, session):
+        with self.lock:
+            worker = self.assigned.get(session)
+            if worker is None:
+                worker = min(self.workers,
+                             key=lambda worker: len(worker.sessions))
+                worker.sessions.add(session)
+                self.assigned[session] = worker
+            return worker
+
+    def replace(self, worker):
+        with self.lock:
+            if worker not in self.workers:
+                return
+            logger.warning('Replacing dead eval worker %s',
+                           worker.process.pid)
+            worker.stop()
+            for session in worker.sessions:
+                self.assigned.pop(session, None)
+            self.workers[self.workers.index(worker)] = Worker(self.context)
+
+    def eval(self, session, string, write=None, value=True, budgets=None):
+        """Evaluate string in the session namespace of its worker.
+
+        Output is passed to write as it arrives.  Returns a RemoteValue,
+        the value rendered by a pretty.PrettyPrinter with budgets, or
+        None for statements or when value is false (its text is then not
+        rendered).  Raises RemoteError on exceptions.
+
+        """
+        budgets = (budgets or {}) if value else None
+        worker = self.worker_for(session)
+        if not worker.alive():
+            self.replace(worker)
+            worker = self.worker_for(session)
+        with worker.state_lock:
+            worker.queued.add(session)
+        with worker.lock:
+            with worker.state_lock:
+                worker.queued.discard(session)
+                if session in worker.cancelled:
+                    worker.cancelled.discard(session)
+                    raise RemoteError(
+                        "KeyboardInterrupt",
+                        "Interrupted before it started", "")
+                worker.running = session
+            try:
+                with worker.send_lock:
+                    worker.connection.send((session, string, budgets))
+                while True:
+                    kind, payload = worker.connection.recv()
+                    if kind != 'output':
+                        break
+                    if write is not None:
+                        write(payload)
+            except (EOFError, OSError):
+                crashed = True
+            else:
+                crashed = False
+            finally:
+                with worker.state_lock:
+                    worker.running = None
+        if crashed:
+            self.replace(worker)
+            raise WorkerCrashed(
+                "Eval worker died, the session namespace was lost")
+        if kind == 'error':
+            raise RemoteError(*payload)
+        return None if payload is None else RemoteValue(payload)
+
+    def interrupt(self, session):
+        """Interrupt the evaluation of session.
+
+        It's sent SIGINT if its worker is running it; one waiting for
+        the worker (busy with another session sharing it) is cancelled
+        instead, failing as interrupted when its turn comes.
+
+        """
+        with self.lock:
+            worker = self.assigned.get(session)
+        if worker is None or not worker.alive():
+            return False
+        with worker.state_lock:
+            if worker.running == session:
+                os.kill(worker.process.pid, signal.SIGINT)
+                return True
+            if session in worker.queued:
+                worker.cancelled.add(session)
+                return True
+        return False
+
+    def release(self, session):
+        """Forget session, dropping its namespace in the worker.
+
+        Its evaluation is interrupted, and the worker drops the
+        namespace when done with it: this doesn't wait for the worker.
+
+        """
+        self.interrupt(session)
+        with self.lock:
+            worker = self.assigned.pop(session, None)
+            if worker is None:
+                return
+            worker.sessions.discard(session)
+        with worker.send_lock:
+            try:
+                worker.connection.send((session, None, None))
+            except (EOFError, OSError):
+                pass
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+            self.assigned.clear()
+        for worker in workers:
+            worker.stop()
+
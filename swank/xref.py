@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+import ast
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import logconfig
+import workers
+
+
+__all__ = ['CACHE_VERSION', 'Collector', 'XrefIndex', 'default_cache_path',
+           'default_roots', 'parse_file', 'parse_source', 'source_files']
+
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+# Relations indexed, numbered by position in the database.
+RELATIONS = ('definitions', 'calls', 'references', 'binds', 'imports')
+
+# Definitions keep the qualified name in name and the kind in scope,
+# the other relations the dotted name (null when it's just key) and the
+# enclosing definition.
+SCHEMA = """
+DROP TABLE IF EXISTS files;
+DROP TABLE IF EXISTS entries;
+CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, module TEXT,
+                    mtime INTEGER, size INTEGER, digest TEXT);
+CREATE TABLE entries (file INTEGER, relation INTEGER, key TEXT, name TEXT,
+                      scope TEXT, line INTEGER, col INTEGER);
+CREATE INDEX entries_key ON entries (key, relation);
+CREATE INDEX entries_file ON entries (file);
+PRAGMA journal_mode = WAL;
+PRAGMA user_version = {0};
+""".format(CACHE_VERSION)
+
+SKIPPED_DIRECTORIES = frozenset(['__pycache__', 'node_modules'])
+# Files telling a directory is a project.
+PROJECT_MARKERS = ('pyproject.toml', 'setup.py', 'setup.cfg', '.git')
+
+
+def default_cache_path(roots):
+    """Return the index database of roots for this python version.
+
+    Servers indexing different roots (started in different projects)
+    get different databases.
+
+    """
+    cache = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.sha1('\n'.join(sorted(roots)).encode(
+        'utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(cache, 'swank', 'xref-{0}.{1}-{2}.sqlite'.format(
+        sys.version_info[0], sys.version_info[1], digest))
+
+
+def project_roots():
+    """Return [the working directory] if it's a project, else []."""
+    cwd = os.path.realpath(os.getcwd())
+    if any(os.path.exists(os.path.join(cwd, marker))
+           for marker in PROJECT_MARKERS):
+        return [cwd]
+    return []
+
+
+def default_roots():
+    """Return the project directory and the sys.path directories.
+
+    The working directory (also the "" entry of sys.path) is only a
+    root when it's a project, so a server started from ~ doesn't
+    index the whole home directory.
+
+    """
+    roots = []
+    for path in project_roots() + [path for path in sys.path if path]:
+        path = os.path.realpath(path)
+        if os.path.isdir(path) and path not in roots:
+            roots.append(path)
+    return roots
+
+
+def under(path, roots):
+    """Return True if path is in one of the directories roots."""
+    return any(path.startswith(os.path.join(root, '')) for root in roots)
+
+
+def list_directory(directory, roots):
+    """Return (subdirectories python_files) of directory, sorted."""
+    subdirectories = []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if name not in SKIPPED_DIRECTORIES and \
+                        not name.startswith('.') and \
+                        entry.path not in roots:
+                    subdirectories.append(name)
+            elif name.endswith('.py'):
+                files.append(name)
+    return sorted(subdirectories), sorted(files)
+
+
+def walk(root, roots, listings):
+    """Yield (directory python_files listed) for directories under root.
+
+    listings maps directories to (mtime subdirectories python_files);
+    only directories whose mtime changed are listed again, and
+    yielded with listed true.
+
+    """
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            listings.pop(directory, None)
+            continue
+        listing = listings.get(directory)
+        listed = listing is None or listing[0] != mtime
+        if listed:
+            try:
+                listing = (mtime,) + list_directory(directory, roots)
+            except OSError:
+                continue
+            listings[directory] = listing
+        yield directory, listing[2], listed
+        directories.extend(os.path.join(directory, name)
+                           for name in reversed(listing[1]))
+
+
+def source_files(roots, listings=None):
+    """Yield (path, module_name, listed) for python files under roots.
+
+    A file found under several roots belongs to the first one.  listed
+    tells whether the file's directory was listed again, see walk().
+
+    """
+    if listings is None:
+        listings = {}
+    seen = set()
+    for root in roots:
+        for directory, files, listed in walk(root, roots, listings):
+            relative = os.path.relpath(directory, root)
+            package = '' if relative == os.curdir else \
+                relative.replace(os.sep, '.') + '.'
+            for name in files:
+                path = os.path.join(directory, name)
+                if path in seen:
+                    continue
+                seen.add(path)
+                module = name[:-3]
+                if module == '__init__':
+                    yield path, package[:-1] or module, listed
+                else:
+                    yield path, package + module, listed
+
+
+def terminal_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+class Collector(ast.NodeVisitor):
+    """Collect definitions, calls, references, binds and imports.
+
+    Each entry is (name, scope, line, column) where scope is the
+    qualified name of the enclosing definition, '' at module level.
+    Definitions are (name, qualified name, kind, line, column).
+
+    """
+
+    def __init__(self):
+        self.scope = []
+        self.definitions = []
+        self.calls = []
+        self.references = []
+        self.binds = []
+        self.imports = []
+
+    def entry(self, name, node):
+        return (name, '.'.join(self.scope), node.lineno, node.col_offset)
+
+    def define(self, node, kind):
+        self.scope.append(node.name)
+        self.definitions.append((node.name, '.'.join(self.scope), kind,
+                                 node.lineno, node.col_offset))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        self.define(node, 'def')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.define(node, 'class')
+
+    def visit_Call(self, node):
+        name = terminal_name(node.func)
+        if name:
+            self.calls.append(self.entry(name, node))
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.references.append(self.entry(node.id, node))
+        else:
+            self.bind(node.id, node)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.references.append(self.entry(node.attr, node))
+        else:
+            self.bind(node.attr, node)
+        self.visit(node.value)
+
+    def bind(self, name, node):
+        self.binds.append(self.entry(name, node))
+        if not self.scope and isinstance(node, ast.Name):
+            self.definitions.append((name, name, 'variable',
+                                     node.lineno, node.col_offset))
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append(self.entry(alias.name, node))
+
+    def visit_ImportFrom(self, node):
+        module = '.' * node.level + (node.module or '')
+        self.imports.append(self.entry(module, node))
+        for alias in node.names:
+            if alias.name != '*':
+                self.imports.append(self.entry(
+                    module.rstrip('.') + '.' + alias.name, node))
+
+
+def parse_source(source, filename='<string>'):
+    """Return the relations of source as a dict of entry tuples."""
+    collector = Collector()
+    collector.visit(ast.parse(source, filename))
+    return dict((relation, tuple(getattr(collector, relation)))
+                for relation in RELATIONS)
+
+
+def parse_file(path):
+    """Parse path, returning (path, mtime, size, digest, relations).
+
+    Runs in the worker processes.  Files which can't be read or
+    parsed get no relations, so they aren't retried until they change.
+
+    """
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            source = f.read()
+    except (IOError, OSError):
+        return path, None, None, None, None
+    digest = hashlib.sha1(source).hexdigest()
+    try:
+        relations = parse_source(source, path)
+    except (SyntaxError, ValueError, RecursionError):
+        relations = {}
+    return path, stat.st_mtime_ns, stat.st_size, digest, relations
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class XrefIndex(object):
+    """Cross-reference index of python sources, built in background.
+
+    Files under roots are parsed with ast in a process pool and their
+    relations stored in an sqlite database, indexed by name, so a warm
+    start only opens it and queries never load more than they return.
+    On update a file is only re-parsed when its mtime or size changed
+    and its content hash did too.  Outside of the project (the given
+    roots, or the working directory) only the files of directories
+    whose mtime changed are looked at.
+
+    """
+
+    def __init__(self, roots=None, cache_path=None, max_workers=None,
+                 rescan_interval=60.0, pool_threshold=16):
+        self.roots = roots
+        self.cache_path = cache_path or default_cache_path(
+            roots or default_roots())
+        self.max_workers = max_workers
+        self.rescan_interval = rescan_interval
+        self.pool_threshold = pool_threshold
+        self.listings = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.scanned = None
+        self.wakeup = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run,
+                                           name='swank-xref-index')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                self.update()
+            except Exception:
+                logger.exception('Xref indexing failed')
+            self.ready.set()
+
+    def refresh(self, timeout=None):
+        """Rescan in background, waiting up to timeout for a first index.
+
+        Rescans are throttled to one every rescan_interval seconds.
+
+        """
+        if self.scanned is None or \
+                time.time() - self.scanned > self.rescan_interval:
+            self.scanned = time.time()
+            self.start()
+            self.wakeup.set()
+        if timeout and not self.ready.is_set():
+            self.ready.wait(timeout)
+
+    def connection(self):
+        """Return the database connection of the current thread."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.cache_path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.cache_path, timeout=60)
+            if connection.execute('PRAGMA user_version').fetchone()[0] != \
+                    CACHE_VERSION:
+                with connection:
+                    connection.executescript(SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def update(self):
+        """Bring the index up to date with the source files."""
+        connection = self.connection()
+        known = dict(
+            (path, (id, mtime, size, digest))
+            for id, path, mtime, size, digest in connection.execute(
+                'SELECT id, path, mtime, size, digest FROM files'))
+        if known:
+            self.ready.set()
+        modules = {}
+        touched = []
+        stale = []
+        roots = self.roots or default_roots()
+        # Files are edited in place in projects; elsewhere (sys.path)
+        # they're replaced, changing their directory's mtime.
+        edited = self.roots or project_roots()
+        for path, module, listed in source_files(roots, self.listings):
+            modules[path] = module
+            if path in known and not listed and not under(path, edited):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if path in known:
+                id, mtime, size, digest = known[path]
+                if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    if size == stat.st_size and file_digest(path) == digest:
+                        touched.append((stat.st_mtime_ns, id))
+                        continue
+                except (IOError, OSError):
+                    pass
+            stale.append(path)
+        # Files of other roots sharing the database are left alone.
+        removed = [known[path][0] for path in set(known) - set(modules)
+                   if under(path, roots)]
+        with connection:
+            connection.executemany(
+                'UPDATE files SET mtime = ? WHERE id = ?', touched)
+            for id in removed:
+                self.remove(connection, id)
+            for path, mtime, size, digest, relations in self.parse(stale):
+                if path in known:
+                    self.remove(connection, known[path][0])
+                if mtime is not None:
+                    self.insert(connection, path, modules[path], mtime,
+                                size, digest, relations)
+        if stale or removed:
+            logger.debug('Xref index updated, %s files parsed, %s removed',
+                         len(stale), len(removed))
+
+    def remove(self, connection, id):
+        connection.execute('DELETE FROM entries WHERE file = ?', (id,))
+        connection.execute('DELETE FROM files WHERE id = ?', (id,))
+
+    def insert(self, connection, path, module, mtime, size, digest,
+               relations):
+        id = connection.execute(
+            'INSERT INTO files (path, module, mtime, size, digest) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (path, module, mtime, size, digest)).lastrowid
+        rows = []
+        prefix = module + '.'
+        for name, qualname, kind, line, column in \
+                relations.get('definitions', ()):
+            rows.append((id, 0, name, prefix + qualname, kind, line, column))
+        for relation in RELATIONS[1:]:
+            number = RELATIONS.index(relation)
+            for name, scope, line, column in relations.get(relation, ()):
+                key = name.rpartition('.')[2]
+                rows.append((id, number, key, None if key == name else name,
+                             prefix + scope if scope else module,
+                             line, column))
+        connection.executemany(
+            'INSERT INTO entries (file, relation, key, name, scope, line, '
+            'col) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def parse(self, paths):
+        if len(paths) < self.pool_threshold:
+            return [parse_file(path) for path in paths]
+        # Not forked: the server runs threads, whose locks a forked
+        # child could inherit held.
+        with ProcessPoolExecutor(self.max_workers,
+                                 mp_context=workers.context()) as executor:
+            return list(executor.map(parse_file, paths, chunksize=32))
+
+    def paths(self):
+        """Return the indexed paths."""
+        return [path for path, in self.connection().execute(
+            'SELECT path FROM files ORDER BY path')]
+
+    def lookup(self, relation, name):
+        """Return (path, scope, line, column, name) entries for name.
+
+        name may be qualified (os.path.join); entries are matched on
+        its last component.  Imports are also filtered on the qualified
+        part, which isn't known statically for calls, references and
+        binds.  scope is the qualified name of the enclosing definition.
+
+        """
+        key = name.rpartition('.')[2]
+        entries = self.connection().execute(
+            'SELECT path, scope, line, col, coalesce(name, key) '
+            'FROM entries JOIN files ON files.id = entries.file '
+            'WHERE key = ? AND relation = ? ORDER BY path, line, col',
+            (key, RELATIONS.index(relation))).fetchall()
+        if relation == 'imports' and key != name:
+            suffix = '.' + name
+            return [entry for entry in entries
+                    if ('.' + entry[4]).endswith(suffix)]
+        return entries
+
+    def definitions(self, name):
+        """Return (path, qualified name, kind, line, column) entries."""
+        suffix = '.' + name
+        return [entry[1:] for entry in self.definition_rows(name)
+                if ('.' + entry[2]).endswith(suffix)]
+
+    def definition_rows(self, name):
+        return self.connection().execute(
+            'SELECT file, path, entries.name, scope, line, col FROM entries '
+            'JOIN files ON files.id = entries.file '
+            'WHERE key = ? AND relation = 0 ORDER BY path, line, col',
+            (name.rpartition('.')[2],)).fetchall()
+
+    def callees(self, name):
+        """Return the calls made by the functions defined as name."""
+        suffix = '.' + name
+        entries = []
+        for id, path, qualname, _, _, _ in self.definition_rows(name):
+            if ('.' + qualname).endswith(suffix):
+                entries.extend(self.connection().execute(
+                    'SELECT ?, scope, line, col, coalesce(name, key) '
+                    'FROM entries '
+                    'WHERE file = ? AND relation = ? AND scope = ? '
+                    'ORDER BY line, col',
+                    (path, id, RELATIONS.index('calls'), qualname)))
+        return entries
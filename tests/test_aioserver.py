@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+import unittest
+
+
+try:
+    from swank.aioserver import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.aioserver import *
+
+
+def frame(payload):
+    payload = payload.encode("utf-8")
+    return "{0:06x}".format(len(payload)).encode("ascii") + payload
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(6)
+    return (await reader.readexactly(int(header, 16))).decode("utf-8")
+
+
+class AsyncSwankServerTests(unittest.TestCase):
+
+    def test_many_connections(self):
+        asyncio.run(self.many_connections(200))
+
+    async def many_connections(self, count):
+        server = AsyncSwankServer(("127.0.0.1", 0), locals={"__name__": "test"})
+        await server.start()
+        host, port = server.server_address
+        try:
+            streams = []
+            for i in range(count):
+                streams.append(await asyncio.open_connection(host, port))
+            for i, (reader, writer) in enumerate(streams):
+                writer.write(frame(
+                    '(:emacs-rex (swank:eval "x{0} = {0}") nil t {0})'.format(i)))
+            await asyncio.sleep(0)
+            for i, (reader, writer) in enumerate(streams):
+                self.assertTrue(
+                    (await read_frame(reader)).startswith("(:indentation-update"))
+                self.assertEqual(await read_frame(reader),
+                                 '(:return (:ok "Evaled region") {0})'.format(i))
+            self.assertEqual(server.connection_count, count)
+            self.assertEqual(set(server.queue_depths().values()), set([0]))
+            self.assertEqual(server.locals["x{0}".format(count - 1)], count - 1)
+            for reader, writer in streams:
+                writer.close()
+            for i in range(100):
+                if not server.connection_count:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(server.connection_count, 0)
+        finally:
+            server.close()
+
+    def test_wire_trace(self):
+        asyncio.run(self.wire_trace())
+
+    async def wire_trace(self):
+        from swank.aioserver import RECORDER
+        server = AsyncSwankServer(("127.0.0.1", 0), locals={"__name__": "test"})
+        await server.start()
+        RECORDER.start()
+        try:
+            reader, writer = await asyncio.open_connection(
+                *server.server_address)
+            writer.write(frame('(:emacs-rex (swank:wire-trace nil) nil t 1)'))
+            await read_frame(reader)
+            self.assertEqual(await read_frame(reader),
+                             '(:return (:ok 2) 1)')
+            writer.close()
+        finally:
+            server.close()
+            RECORDER.stop()
+        frames = RECORDER.snapshot()
+        self.assertEqual([frame[2] for frame in frames], ["recv", "send"])
+        self.assertTrue(frames[1][3].startswith(b"(:indentation-update"))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
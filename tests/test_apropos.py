@@ -0,0 +1,96 @@
+import os
+import sys
+import types
+import unittest
+
+
+try:
+    from swank.apropos import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.apropos import *
+
+
+class AproposIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AproposIndex()
+        self.index.refresh(timeout=30)
+
+    def designators(self, pattern, **kwargs):
+        return [result[0] for result in self.index.search(pattern, **kwargs)]
+
+    def test_classify(self):
+        self.assertEqual(classify(len), 'function')
+        self.assertEqual(classify(dict), 'class')
+        self.assertEqual(classify(1), 'variable')
+        self.assertEqual(classify(os), None)
+
+    def test_substring(self):
+        self.assertIn("posixpath.join", self.designators("path.joi"))
+        self.assertIn("posixpath.join",
+                      self.designators("PATH.JOIN", package="posixpath"))
+        self.assertNotIn("posixpath.join",
+                         self.designators("PATH.JOIN", case_sensitive=True))
+
+    def test_regexp_and_kinds(self):
+        results = self.index.search(r"^unittest\.case\.Test.*Case$",
+                                    kinds=['class'])
+        self.assertIn(("unittest.case.TestCase", 'class',
+                       unittest.TestCase), results)
+        self.assertEqual(
+            self.designators(r"^unittest\.case\.TestCase$",
+                             kinds=['function']), [])
+        self.assertEqual(self.designators("path.join("), [])
+
+    def test_external_only(self):
+        self.assertNotIn("os._Environ", self.designators("os._Environ"))
+        self.assertIn("os._Environ",
+                      self.designators("os._Environ", external_only=False))
+
+    def test_new_modules(self):
+        module = types.ModuleType("apropos_fresh_module")
+        module.apropos_fresh_value = 42
+        sys.modules[module.__name__] = module
+        try:
+            self.index.refresh(timeout=30)
+            self.assertEqual(self.index.search("apropos_fresh_val"), [
+                ("apropos_fresh_module.apropos_fresh_value", 'variable', 42)])
+        finally:
+            del sys.modules[module.__name__]
+        self.assertEqual(self.index.search("apropos_fresh_val"), [])
+
+    def test_changed_modules(self):
+        module = types.ModuleType("apropos_changing_module")
+        sys.modules[module.__name__] = module
+        try:
+            self.index.refresh(timeout=30)
+            self.assertEqual(self.index.search("apropos_changing_"), [])
+            module.apropos_changing_value = 1
+            self.index.refresh(timeout=30)
+            self.assertEqual(len(self.index.search("apropos_changing_")), 1)
+            replacement = types.ModuleType(module.__name__)
+            replacement.apropos_changing_other = 2
+            sys.modules[module.__name__] = replacement
+            self.index.refresh(timeout=30)
+            self.assertEqual(self.index.search("apropos_changing_"), [
+                ("apropos_changing_module.apropos_changing_other",
+                 'variable', 2)])
+        finally:
+            del sys.modules[module.__name__]
+
+    def test_namespace(self):
+        namespace = {"apropos_session_function": len}
+        self.assertEqual(
+            self.index.search("apropos_session", namespace=namespace),
+            [("apropos_session_function", 'function', len)])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import functools
+import gc
+import inspect
+import os
+import sys
+import threading
+import unittest
+
+
+try:
+    from swank.arglists import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.arglists import *
+
+
+class Widget(object):
+
+    def resize(self, width, height=None):
+        pass
+
+    @classmethod
+    def create(cls, name, *args, **kwargs):
+        pass
+
+    @property
+    def broken(self):
+        raise AssertionError("properties must not run")
+
+
+def positional(a, b, /, c, *, d=[1] * 100):
+    pass
+
+
+class Slow(object):
+    """Callable whose signature takes until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def __call__(self, x):
+        pass
+
+    @property
+    def __signature__(self):
+        self.release.wait(5)
+        return inspect.Signature([inspect.Parameter(
+            "x", inspect.Parameter.POSITIONAL_OR_KEYWORD)])
+
+
+class FindOperatorTests(unittest.TestCase):
+
+    def test_innermost_call(self):
+        self.assertEqual(find_operator(["f", "1", ["g", CURSOR_MARKER]]),
+                         ("g", 0))
+        self.assertEqual(find_operator(["f", "1", "", CURSOR_MARKER]),
+                         ("f", 2))
+
+    def test_enclosing_call(self):
+        self.assertEqual(find_operator(["f", "1", ["", CURSOR_MARKER]]),
+                         ("f", 1))
+        self.assertEqual(find_operator(["quote", [CURSOR_MARKER]]),
+                         (None, 0))
+
+
+class ResolveTests(unittest.TestCase):
+
+    def test_resolve(self):
+        namespace = {"w": Widget(), "Widget": Widget}
+        self.assertIs(resolve("Widget", namespace), Widget)
+        self.assertEqual(resolve("w.resize", namespace).__func__,
+                         Widget.resize)
+        self.assertIs(resolve("len", namespace), len)
+        self.assertIs(resolve("os.path", namespace), os.path)
+        self.assertIsNone(resolve("nope", namespace))
+        self.assertIsNone(resolve("w.nope", namespace))
+        self.assertIsInstance(resolve("w.broken", namespace), property)
+
+
+class ArglistCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ArglistCache()
+        self.namespace = {"w": Widget(), "Widget": Widget,
+                          "positional": positional,
+                          "wrapped": functools.wraps(positional)(
+                              lambda *args, **kwargs: None)}
+
+    def arglist(self, name, index=None, timeout=1.0):
+        return self.cache.arglist(name, self.namespace, index, timeout)
+
+    def test_arglists(self):
+        self.assertEqual(self.arglist("w.resize", 1),
+                         "(w.resize width ===> height=None <===)")
+        self.assertEqual(self.arglist("Widget.resize", 0),
+                         "(Widget.resize ===> self <=== width height=None)")
+        self.assertEqual(self.arglist("Widget.create", 5),
+                         "(Widget.create name ===> *args <=== **kwargs)")
+        self.assertEqual(self.arglist("positional"),
+                         "(positional a b / c * d=[1, 1, 1, ...])")
+        self.assertEqual(self.arglist("wrapped", 2),
+                         "(wrapped a b / ===> c <=== * d=[1, 1, 1, ...])")
+        self.assertIs(self.arglist("nope"), NO_ARGLIST)
+        self.namespace.update(s="abc", d={})
+        self.assertEqual(self.arglist("s.join", 0),
+                         "(s.join ===> iterable <=== /)")
+        self.assertEqual(self.arglist("d.get", 1),
+                         "(d.get key ===> default=None <=== /)")
+        self.assertEqual(self.arglist("s.__add__", 0),
+                         "(s.__add__ ===> value <=== /)")
+        self.assertIs(self.arglist("w.broken"), NO_ARGLIST)
+
+    def test_cache_follows_bindings(self):
+        self.arglist("positional")
+        self.assertIn(positional, self.cache.cache)
+
+        def positional2(x):
+            pass
+
+        self.namespace["positional"] = positional2
+        self.assertEqual(self.arglist("positional"), "(positional x)")
+        del self.namespace["positional"], positional2
+        gc.collect()
+        self.assertEqual(len(self.cache.cache), 1)
+
+    def test_builtins_cached(self):
+        self.namespace["join"] = str.join
+        self.assertIsNotNone(self.arglist("join"))
+        self.assertIn(id(str.join), self.cache.strong)
+        computed = []
+        self.cache.compute = lambda obj, computation: computed.append(obj)
+        for i in range(20):
+            self.assertEqual(self.arglist("join"), "(join self iterable /)")
+        self.assertEqual(computed, [])
+
+    def test_latency_budget(self):
+        self.namespace["slow"] = slow = Slow()
+        self.assertIsNone(self.arglist("slow", timeout=0.01))
+        slow.release.set()
+        self.assertEqual(self.arglist("slow", timeout=5), "(slow x)")
+        self.assertIn(slow, self.cache.cache)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
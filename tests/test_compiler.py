@@ -0,0 +1,78 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+try:
+    from swank.compiler import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.compiler import *
+
+
+class CompileSourceTests(unittest.TestCase):
+
+    def test_syntax_error(self):
+        code, notes = compile_source("x = 1\ny = (\n", "buffer.py")
+        self.assertIsNone(code)
+        self.assertEqual(len(notes), 1)
+        self.assertEqual(notes[0].severity, 'error')
+        self.assertEqual(notes[0].filename, "buffer.py")
+        self.assertEqual(notes[0].line, 2)
+
+    def test_warnings(self):
+        code, notes = compile_source('x = "\\d"\n', "buffer.py")
+        self.assertIsNotNone(code)
+        self.assertEqual([note.severity for note in notes], ['warning'])
+        self.assertIn("escape sequence", notes[0].message)
+
+
+class CompilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.compiler = Compiler(max_workers=2, pool_threshold=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def test_compile_files(self):
+        good = self.write("good.py", "def f():\n    return 1\n")
+        bad = self.write("bad.py", "def f(:\n")
+        self.assertEqual(source_paths(self.directory), [bad, good])
+        bad_result, good_result = self.compiler.compile_files([bad, good])
+        self.assertTrue(good_result.success)
+        self.assertEqual(good_result.notes, [])
+        namespace = {}
+        exec(load_bytecode(good_result.bytecode), namespace)
+        self.assertEqual(namespace["f"](), 1)
+        self.assertFalse(bad_result.success)
+        self.assertEqual([(note.severity, note.line)
+                          for note in bad_result.notes], [('error', 1)])
+
+    def test_cache_by_content(self):
+        path = self.write("module.py", "x = 1\n")
+        first, = self.compiler.compile_files([path])
+        self.assertIs(self.compiler.compile_files([path])[0], first)
+        self.write("module.py", "x = 2\n")
+        second, = self.compiler.compile_files([path])
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.digest, first.digest)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
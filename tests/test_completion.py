@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import unittest
+
+
+try:
+    from swank.completion import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.completion import *
+
+
+class CompletionIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.namespace = {"__name__": "__console__", "os": os,
+                          "my_value": 1, "my_function": len}
+        self.index = CompletionIndex(self.namespace)
+
+    def test_prefix_range(self):
+        names = ["a", "ab", "abc", "b"]
+        self.assertEqual(prefix_range(names, "ab"), (1, 3))
+        self.assertEqual(prefix_range(names, "c"), (4, 4))
+
+    def test_namespace_and_builtins(self):
+        self.assertEqual(self.index.complete("my_"), ["my_function", "my_value"])
+        self.assertIn("print", self.index.complete("pri"))
+        self.assertIn("while", self.index.complete("whi"))
+
+    def test_incremental_updates(self):
+        self.index.complete("my_")
+        self.namespace["my_other"] = 2
+        self.assertEqual(self.index.complete("my_"),
+                         ["my_function", "my_other", "my_value"])
+        del self.namespace["my_value"]
+        self.namespace["my_new"] = 3
+        # Same size, only noticed once invalidated.
+        self.assertIn("my_value", self.index.complete("my_"))
+        self.index.invalidate()
+        self.assertEqual(self.index.complete("my_"),
+                         ["my_function", "my_new", "my_other"])
+        # Names shadowing builtins survive removal from the namespace.
+        self.namespace["print"] = None
+        self.index.complete("p")
+        del self.namespace["print"]
+        self.index.invalidate()
+        self.assertIn("print", self.index.complete("pri"))
+
+    def test_dotted_paths(self):
+        self.assertIn("os.path", self.index.complete("os.pa"))
+        self.assertIn("os.path.join", self.index.complete("os.path.jo"))
+        self.assertNotIn("os.path.__doc__", self.index.complete("os.path."))
+        self.assertIn("os.path.__doc__", self.index.complete("os.path.__d"))
+        self.assertEqual(self.index.complete("nothere.x"), [])
+
+    def test_fuzzy(self):
+        matches, interrupted = self.index.fuzzy("myfn")
+        self.assertFalse(interrupted)
+        self.assertEqual(matches[0][0], "my_function")
+        self.assertEqual(matches[0][2], [(0, "my"), (3, "f"), (5, "n")])
+        matches, interrupted = self.index.fuzzy("os.pth")
+        self.assertEqual(matches[0][0], "os.path")
+        self.assertEqual(matches[0][2], [(3, "p"), (5, "th")])
+        self.assertEqual(self.index.kind("os"), "module")
+        self.assertEqual(self.index.kind("my_function"), "function")
+
+    def test_latency_with_many_names(self):
+        for i in range(100000):
+            self.namespace["name_{0:06d}".format(i)] = i
+        self.index.complete("")
+        timings = []
+        for i in range(200):
+            self.namespace["extra_{0}".format(i)] = i
+            start = time.perf_counter()
+            completions = self.index.complete("name_0{0:02d}".format(i % 100))
+            timings.append(time.perf_counter() - start)
+            self.assertEqual(len(completions), 1000)
+        timings.sort()
+        self.assertLess(timings[len(timings) // 2], 0.002)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
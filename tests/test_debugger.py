@@ -0,0 +1,104 @@
+import os
+import sys
+import unittest
+
+
+try:
+    from swank.debugger import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.debugger import *
+
+
+def recurse(depth, huge):
+    if depth == 0:
+        return 1 / 0
+    return recurse(depth - 1, huge)
+
+
+def exception_of(function, *args):
+    try:
+        function(*args)
+    except Exception as e:
+        return e
+
+
+class DebugLevelTests(unittest.TestCase):
+
+    def setUp(self):
+        error = exception_of(recurse, 500, list(range(100000)))
+        self.level = DebugLevel(1, True, error, 7)
+
+    def test_condition(self):
+        self.assertEqual(self.level.condition(), [
+            "ZeroDivisionError: division by zero",
+            "[Condition of type ZeroDivisionError]", False])
+
+    def test_frames_innermost_first(self):
+        self.assertEqual(len(self.level), 502)
+        frames = self.level.frames(0, 2)
+        self.assertEqual([index for index, description in frames], [0, 1])
+        self.assertTrue(frames[0][1].startswith(
+            "recurse ({0}:".format(recurse.__code__.co_filename)))
+        self.assertTrue(frames[0][1].endswith("return 1 / 0"), frames)
+        self.assertTrue(self.level.frames(500, None)[-1][1].startswith(
+            "exception_of"))
+        self.assertEqual(self.level.frames(600, 700), [])
+
+    def test_locals_are_bounded(self):
+        locals = dict(self.level.render_locals(0))
+        self.assertEqual(locals["depth"], "0")
+        self.assertEqual(locals["huge"],
+                         "[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...]")
+
+    def test_eval_in_frame(self):
+        self.assertEqual(self.level.eval_in_frame("depth + len(huge)", 1),
+                         100001)
+        self.assertIsNone(self.level.eval_in_frame("depth = 5", 1))
+        self.assertEqual(self.level.eval_in_frame("depth", 1), 1)
+
+    def test_source(self):
+        filename, line = self.level.source(0)
+        self.assertEqual(filename, recurse.__code__.co_filename)
+        self.assertEqual(line, recurse.__code__.co_firstlineno + 2)
+        self.assertRaises(FrameNotFound, self.level.source, 502)
+
+
+class SwankFrameTests(unittest.TestCase):
+
+    def test_code_from_strings_is_not_swank(self):
+        error = exception_of(eval, compile("1 / 0", "<string>", "eval"))
+        frame = error.__traceback__.tb_next.tb_frame
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.realpath(is_swank_frame.__code__
+                                                  .co_filename)))
+        try:
+            self.assertFalse(is_swank_frame(frame))
+        finally:
+            os.chdir(cwd)
+
+
+class DebuggerTests(unittest.TestCase):
+
+    def test_levels_per_thread(self):
+        debugger = Debugger()
+        error = ValueError("bad")
+        first = debugger.enter(":repl-thread", error, 1)
+        other = debugger.enter(2, error, 2)
+        second = debugger.enter(":repl-thread", error, 3)
+        self.assertEqual((first.level, other.level, second.level), (1, 1, 2))
+        self.assertIs(debugger.current(":repl-thread"), second)
+        self.assertIs(debugger.current(":repl-thread", 1), first)
+        self.assertEqual(debugger.leave(":repl-thread"), [second, first])
+        self.assertIsNone(debugger.current(":repl-thread"))
+        self.assertIs(debugger.current(2), other)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import types
+import unittest
+
+
+try:
+    from swank.docs import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.docs import *
+
+
+def area(width, height=1):
+    """Return the area of a rectangle.
+
+    Rectangles are width by height.
+    """
+    return width * height
+
+
+def big_module(size):
+    module = types.ModuleType('big', 'A module with many members.')
+    for i in range(size):
+        setattr(module, 'f{0}'.format(i), area)
+    return module
+
+
+class RenderTests(unittest.TestCase):
+
+    def test_describe(self):
+        text = describe(area, 'area')
+        self.assertTrue(text.startswith('area: function area'))
+        self.assertIn('area(width, height=1)', text)
+        self.assertIn('Return the area of a rectangle.', text)
+
+    def test_describe_function(self):
+        self.assertIn('area(width, height=1)', describe_function(area, 'area'))
+        self.assertEqual(describe_function(1, 'one'), 'one is not a function')
+
+    def test_documentation(self):
+        self.assertEqual(documentation(area, 'area'),
+                         'area(width, height=1)\n\nReturn the area of a '
+                         'rectangle.\n\nRectangles are width by height.')
+        self.assertEqual(documentation(len, 'len'),
+                         'len(obj, /)\n\n' + len.__doc__)
+
+    def test_summary(self):
+        text = summary(area, 'area')
+        self.assertIn('Return the area of a rectangle.', text)
+        self.assertNotIn('Rectangles', text)
+
+    def test_module_version(self):
+        self.assertEqual(module_version(os.path)[0], id(os.path))
+        self.assertEqual(module_version(os.path.join), module_version(os.path))
+        self.assertIsNone(module_version(big_module(1)))
+        self.assertIsNone(module_version(1))
+
+
+class DocCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.cache = DocCache(size=2, large=10)
+
+    def render(self, obj, name):
+        self.calls.append(name)
+        return describe(obj, name)
+
+    def test_cached_by_identity_and_version(self):
+        text = self.cache.get('describe', self.render, area, 'area', 1)
+        self.assertIs(self.cache.get('describe', self.render, area, 'area',
+                                     1), text)
+        self.assertEqual(self.calls, ['area'])
+        self.cache.get('describe', self.render, area, 'area', 2)
+        self.assertEqual(self.calls, ['area', 'area'])
+
+    def test_aliases(self):
+        alias = self.cache.get('documentation', documentation, area, 'alias')
+        text = self.cache.get('documentation', documentation, area, 'area')
+        self.assertTrue(alias.startswith('alias(width'))
+        self.assertTrue(text.startswith('area(width'))
+
+    def test_least_recently_used_dropped(self):
+        self.cache.get('describe', self.render, area, 'area')
+        self.cache.get('describe', self.render, len, 'len')
+        self.cache.get('describe', self.render, area, 'area')
+        self.cache.get('describe', self.render, max, 'max')
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get('describe', self.render, area, 'area')
+        self.cache.get('describe', self.render, len, 'len')
+        self.assertEqual(self.calls, ['area', 'len', 'max', 'len'])
+
+    def test_large_rendered_in_background(self):
+        module = big_module(20)
+        release = threading.Event()
+
+        def render(obj, name):
+            release.wait(5)
+            return self.render(obj, name)
+
+        self.assertIsNone(self.cache.get('describe', render, module, 'big',
+                                         timeout=0.01))
+        self.assertIsNone(self.cache.get('describe', render, module, 'big',
+                                         timeout=0.01))
+        release.set()
+        text = self.cache.get('describe', render, module, 'big', timeout=5)
+        self.assertIn('A module with many members.', text)
+        self.assertEqual(self.calls, ['big'])
+        self.assertIs(self.cache.get('describe', render, module, 'big',
+                                     timeout=0), text)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import os
+import socket
+import sys
+import threading
+import unittest
+
+
+try:
+    from swank.framing import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.framing import *
+
+
+def frame(payload):
+    return "{0:06x}".format(len(payload)).encode("ascii") + payload
+
+
+class EncodeFrameTests(unittest.TestCase):
+
+    def test_header_counts_bytes(self):
+        self.assertEqual(encode_frame("(a)"), b"000003(a)")
+        self.assertEqual(encode_frame("\u00e9", "utf-8"), b"000002\xc3\xa9")
+        self.assertEqual(encode_frame("\u00e9", "latin-1"), b"000001\xe9")
+
+    def test_unrepresentable_characters(self):
+        self.assertEqual(encode_frame("\u03bb", "latin-1"), b"000001?")
+
+    def test_payload_too_large(self):
+        self.assertEqual(encode_frame("a" * MAX_PAYLOAD)[:6], b"ffffff")
+        self.assertRaises(FrameTooLarge, encode_frame, "a" * (MAX_PAYLOAD + 1))
+        self.assertRaises(FrameTooLarge, encode_frame,
+                          "\u00e9" * (MAX_PAYLOAD // 2 + 1))
+
+
+class FrameDecoderTests(unittest.TestCase):
+
+    def test_partial_reads(self):
+        decoder = FrameDecoder(size=8)
+        data = frame(b"(:emacs-rex (swank:foo) nil t 1)")
+        for i in range(len(data) - 1):
+            decoder.feed(data[i:i + 1])
+            self.assertEqual(list(decoder.frames()), [])
+        decoder.feed(data[-1:])
+        self.assertEqual(list(decoder.frames()),
+                         [b"(:emacs-rex (swank:foo) nil t 1)"])
+        self.assertEqual(len(decoder), 0)
+
+    def test_back_to_back_frames(self):
+        decoder = FrameDecoder(size=16)
+        payloads = [b"(a)", b"(b c)", b"x" * 1000]
+        data = b"".join(frame(payload) for payload in payloads)
+        decoder.feed(data + frame(b"(d)")[:4])
+        self.assertEqual(list(decoder.frames()), payloads)
+        self.assertEqual(decoder.needed(), 2)
+        decoder.feed(frame(b"(d)")[4:])
+        self.assertEqual(list(decoder.frames()), [b"(d)"])
+
+    def test_recv_from_socket(self):
+        left, right = socket.socketpair()
+        try:
+            decoder = FrameDecoder(size=16)
+            payload = b"y" * 200000
+            left.sendall(frame(payload)[:100])
+            self.assertEqual(decoder.recv_from(right), 100)
+            self.assertEqual(list(decoder.frames()), [])
+            left.sendall(frame(payload)[100:])
+            frames = []
+            while not frames:
+                self.assertTrue(decoder.recv_from(right))
+                frames = list(decoder.frames())
+            self.assertEqual(frames, [payload])
+            left.close()
+            self.assertEqual(decoder.recv_from(right), 0)
+        finally:
+            right.close()
+
+    def test_invalid_header(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"zzzzzz(a)")
+        self.assertRaises(ValueError, list, decoder.frames())
+
+
+class BlockingSocket(object):
+    """Socket whose first sendmsg blocks until released."""
+
+    def __init__(self, max_send=None):
+        self.calls = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.max_send = max_send
+
+    def sendmsg(self, buffers):
+        self.calls.append([bytes(buffer) for buffer in buffers])
+        if len(self.calls) == 1:
+            self.entered.set()
+            self.release.wait(5)
+        data = b"".join(self.calls[-1])
+        if self.max_send is not None:
+            data = data[:self.max_send]
+            self.calls[-1] = [data]
+        return len(data)
+
+
+class FrameWriterTests(unittest.TestCase):
+
+    def test_unflushed_frames_go_with_the_next(self):
+        left, right = socket.socketpair()
+        try:
+            writer = FrameWriter(left)
+            writer.write(frame(b"(:indentation-update)"), flush=False)
+            self.assertEqual(writer.syscalls, 0)
+            writer.write(frame(b"(:return (:ok t) 1)"))
+            self.assertEqual((writer.frames, writer.syscalls), (2, 1))
+            decoder = FrameDecoder()
+            while len(decoder) < 46:
+                decoder.recv_from(right)
+            self.assertEqual(list(decoder.frames()),
+                             [b"(:indentation-update)", b"(:return (:ok t) 1)"])
+        finally:
+            left.close()
+            right.close()
+
+    def test_concurrent_writes_are_coalesced(self):
+        sock = BlockingSocket()
+        writer = FrameWriter(sock)
+        first = threading.Thread(target=writer.write, args=(b"a",))
+        first.start()
+        sock.entered.wait(5)
+        threads = [threading.Thread(target=writer.write, args=(data,))
+                   for data in [b"b", b"c", b"d"]]
+        for thread in threads:
+            thread.start()
+            thread.join(5)
+        sock.release.set()
+        first.join(5)
+        self.assertEqual(writer.syscalls, 2)
+        self.assertEqual(sock.calls[0], [b"a"])
+        self.assertEqual(sorted(sock.calls[1]), [b"b", b"c", b"d"])
+
+    def test_short_writes(self):
+        sock = BlockingSocket(max_send=3)
+        sock.release.set()
+        writer = FrameWriter(sock)
+        writer.write(b"abcd", flush=False)
+        writer.write(b"efgh")
+        self.assertEqual(b"".join(call[0] for call in sock.calls),
+                         b"abcdefgh")
+        self.assertEqual(writer.syscalls, 3)
+
+    def test_nodelay(self):
+        server = socket.socket()
+        try:
+            server.bind(("127.0.0.1", 0))
+            server.listen(1)
+            client = socket.create_connection(server.getsockname())
+            try:
+                self.assertTrue(set_nodelay(client, False))
+                self.assertFalse(client.getsockopt(socket.IPPROTO_TCP,
+                                                   socket.TCP_NODELAY))
+                self.assertTrue(set_nodelay(client))
+                self.assertTrue(client.getsockopt(socket.IPPROTO_TCP,
+                                                  socket.TCP_NODELAY))
+            finally:
+                client.close()
+        finally:
+            server.close()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+try:
+    from swank.importtime import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.importtime import *
+
+
+class ImportProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        sys.path.insert(0, self.directory)
+        self.write("timed_parent.py", "import timed_child\nimport timed_leaf\n")
+        self.write("timed_child.py", "import timed_leaf\n")
+        self.write("timed_leaf.py", "value = 1\n")
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in ("timed_parent", "timed_child", "timed_leaf"):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(source)
+
+    def test_tree(self):
+        ticks = iter(range(100))
+        with ImportProfiler(timer=lambda: next(ticks)) as profiler:
+            import timed_parent
+        self.assertNotIn(profiler, sys.meta_path)
+        parent, = profiler.tree()
+        self.assertEqual(parent.name, "timed_parent")
+        child, = parent.children
+        self.assertEqual(child.name, "timed_child")
+        self.assertEqual([node.name for node in child.children],
+                         ["timed_leaf"])
+        self.assertEqual(parent.total, parent.own + child.total)
+        self.assertEqual(parent.to_list(1)[:2], ["timed_parent", parent.total])
+        self.assertIsNot(type(timed_parent.__loader__).__name__,
+                         "TimedLoader")
+        self.assertIsNot(type(timed_parent.__spec__.loader).__name__,
+                         "TimedLoader")
+
+    def test_loaded_modules_are_not_timed(self):
+        import timed_leaf
+        with ImportProfiler() as profiler:
+            import timed_leaf
+        self.assertEqual(profiler.tree(), [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import unittest
+
+
+try:
+    from swank.inspector import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.inspector import *
+
+
+def values(content):
+    """Return the (:value repr index) parts of a content list."""
+    return [(item[1], item[2]) for item in content if isinstance(item, list)]
+
+
+class InspectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.inspector = Inspector(history_size=3)
+
+    def test_sequence_ranges(self):
+        result = self.inspector.inspect(list(range(1000)))
+        content, length, start, end = result[-1]
+        self.assertEqual((length, start, end), (3 + 4000, 0, 500))
+        self.assertEqual(values(content)[:3], [("list", -1), ("0", 0), ("1", 1)])
+        content, length, start, end = self.inspector.content_range(503, 511)
+        self.assertEqual(content, ["125", ": ", content[2], "\n",
+                                   "126", ": ", content[6], "\n"])
+        self.assertEqual(values(content), [("125", 125), ("126", 126)])
+        self.assertEqual(self.inspector.nth_part(999), 999)
+        self.assertIs(self.inspector.nth_part(-1), list)
+
+    def test_huge_dict_is_not_materialized(self):
+        huge = dict.fromkeys(range(2000000), "x" * 1000)
+        start = time.time()
+        result = self.inspector.inspect(huge)
+        for offset in range(503, 503 + 4 * 1000, 400):
+            content = self.inspector.content_range(offset, offset + 400)[0]
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(content[0], "1025")
+        self.assertLess(max(len(repr_) for repr_, index in values(content)), 90)
+        self.assertEqual(self.inspector.nth_part(1999999), "x" * 1000)
+
+    def test_generator(self):
+        consumed = []
+
+        def numbers():
+            for i in range(10000):
+                consumed.append(i)
+                yield i
+
+        result = self.inspector.inspect(numbers())
+        content, length, start, end = result[-1]
+        self.assertEqual(len(consumed), 125)
+        self.assertEqual(length, 3 + 126 * 4)
+        content, length, start, end = self.inspector.content_range(503, 1003)
+        self.assertEqual(len(consumed), 250)
+        self.assertEqual(self.inspector.nth_part(10), 10)
+
+    def test_attributes(self):
+
+        class Thing(object):
+            value = 42
+
+            @property
+            def broken(self):
+                raise ValueError("no value")
+
+        self.inspector.inspect(Thing())
+        content = self.inspector.content_range(0, 10000)[0]
+        self.assertIn(("42", content[content.index("value") + 2][2]),
+                      values(content))
+        self.assertIn(("ValueError('no value')",
+                       content[content.index("broken") + 2][2]),
+                      values(content))
+
+    def test_history(self):
+        for obj in ([1], [2], [3], [4]):
+            self.inspector.inspect(obj)
+        self.assertEqual(len(self.inspector.history), 3)
+        self.assertEqual(self.inspector.pop()[1], "list [3]")
+        self.assertEqual(self.inspector.pop()[1], "list [2]")
+        self.assertIsNone(self.inspector.pop())
+        self.assertEqual(self.inspector.next()[1], "list [3]")
+        self.assertEqual(self.inspector.format_history(),
+                         "  0 [2]\n* 1 [3]\n  2 [4]")
+        self.inspector.inspect([5])
+        self.assertIsNone(self.inspector.next())
+        self.assertEqual(len(self.inspector.history), 3)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
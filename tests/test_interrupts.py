@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+
+try:
+    from swank.interrupts import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.interrupts import *
+
+
+def spin():
+    while True:
+        pass
+
+
+class EvaluationsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.evaluations = Evaluations()
+
+    def test_timeout(self):
+        try:
+            with self.evaluations.run(True, 1, timeout=0.05):
+                spin()
+        except Interrupted as e:
+            self.assertEqual(e.reason, "timeout")
+            self.assertGreaterEqual(e.elapsed, 0.05)
+            self.assertEqual(e.location[1:], (spin.__code__.co_firstlineno + 1,
+                                              "spin"))
+            self.assertIn("timed out after", str(e))
+        else:
+            self.fail("Interrupted not raised")
+        self.assertEqual(self.evaluations.running, {})
+
+    def test_interrupt_by_thread(self):
+        errors = []
+
+        def run(thread):
+            try:
+                with self.evaluations.run(thread, 1):
+                    spin()
+            except Interrupted as e:
+                errors.append((thread, e.reason))
+
+        threads = [threading.Thread(target=run, args=(thread,))
+                   for thread in (1, 2)]
+        for thread in threads:
+            thread.start()
+        while len(self.evaluations.running) < 2:
+            time.sleep(0.001)
+        self.assertEqual(self.evaluations.interrupt(2), 1)
+        threads[1].join(5)
+        self.assertEqual(errors, [(2, "interrupt")])
+        self.assertEqual(self.evaluations.interrupt(True), 1)
+        threads[0].join(5)
+        self.assertEqual(errors, [(2, "interrupt"), (1, "interrupt")])
+
+    def test_finished_evaluations_are_not_interrupted(self):
+        with self.evaluations.run(True, 1) as evaluation:
+            pass
+        self.assertFalse(evaluation.interrupt())
+        self.assertEqual(self.evaluations.interrupt(True), 0)
+
+    def test_text_location(self):
+        self.assertEqual(text_location(
+            'Traceback:\n  File "<string>", line 1, in <module>\n'
+            '  File "mod.py", line 7, in f\nKeyboardInterrupt\n'),
+            ("mod.py", 7, "f"))
+        self.assertIsNone(text_location(""))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -161,6 +161,87 @@ class ReaderWritterTests(unittest.TestCase):
         self._test(code, expected)
 
 
+class ReaderTests(unittest.TestCase):
+
+    def test_atoms_at_end_of_input(self):
+        self.assertEqual(read_lisp("42"), 42)
+        self.assertEqual(read_lisp("-3"), -3)
+        self.assertEqual(read_lisp("1.5"), 1.5)
+        self.assertEqual(str(read_lisp("t")), "t")
+        self.assertEqual(str(read_lisp("'nil")), "nil")
+        self.assertEqual(read_lisp("foo"), symbol("foo"))
+
+    def test_symbols_are_not_split(self):
+        parsed = read_lisp("(t-foo nil-bar 12abc)")
+        self.assertEqual(parsed, [symbol("t-foo"), symbol("nil-bar"),
+                                  symbol("12abc")])
+        self.assertTrue(all(isinstance(part, symbol) for part in parsed))
+
+    def test_string_escapes(self):
+        self.assertEqual(read_lisp(r'"a\\"'), lstring(r"a\\"))
+        self.assertEqual(read_lisp('"multi\nline"'), lstring("multi\nline"))
+        self.assertEqual(read_lisp('("" "x")'), [lstring(""), lstring("x")])
+
+    def test_position_is_kept_between_reads(self):
+        reader = LispReader("(a) ; comment\n (b)")
+        self.assertEqual(reader.read(), [symbol("a")])
+        self.assertEqual(reader.read(), [symbol("b")])
+
+    def test_deep_nesting(self):
+        depth = 10000
+        parsed = read_lisp("(" * depth + ")" * depth)
+        for i in range(depth - 1):
+            parsed = parsed[0]
+        self.assertEqual(parsed, llist())
+
+    def test_errors(self):
+        self.assertRaises(ValueError, read_lisp, '("unterminated')
+        self.assertRaises(ValueError, read_lisp, "(a (b)")
+        self.assertRaises(ValueError, read_lisp, ")")
+
+
+class WritterTests(unittest.TestCase):
+
+    def test_atoms(self):
+        self.assertEqual(write_lisp(None), "nil")
+        self.assertEqual(write_lisp(True), "t")
+        self.assertEqual(write_lisp(False), "nil")
+        self.assertEqual(write_lisp(0), "0")
+        self.assertEqual(write_lisp(-1.5), "-1.5")
+        self.assertEqual(write_lisp(symbol(":ok")), ":ok")
+        self.assertEqual(write_lisp(lstring('a \\" b')), '"a \\" b"')
+
+    def test_string_escaping(self):
+        value = 'say "hi" \\ bye'
+        written = write_lisp(value)
+        self.assertEqual(written, '"say \\"hi\\" \\\\ bye"')
+        self.assertEqual(read_lisp(written).unquote(), value)
+
+    def test_nested_values_use_the_writter(self):
+        value = llist([symbol(":prompt"), "Python> ", (1, None),
+                       cons("a", [True])])
+        self.assertEqual(str(value), '(:prompt "Python> " (1 nil) ("a" . (t)))')
+        self.assertEqual(write_lisp({":ok": quoted([1, "x"])}),
+                         "(:ok '(1 \"x\"))")
+        self.assertEqual(write_lisp([[], llist(), ()]), "(() () ())")
+
+    def test_subclasses(self):
+        class mylist(llist):
+            pass
+
+        class mystr(str):
+            pass
+
+        self.assertEqual(write_lisp(mylist([1, mystr('"')])), '(1 "\\"")')
+
+    def test_deep_nesting(self):
+        depth = 100000
+        value = []
+        for i in range(depth):
+            value = [value]
+        self.assertEqual(write_lisp(value), "(" * (depth + 1) + ")" * (depth + 1))
+
+
 def main():
     unittest.main()
 
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+
+try:
+    from swank.output import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.output import *
+
+
+class OutputChannelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+
+    def test_chunks(self):
+        channel = OutputChannel(self.sent.append, chunk_size=4,
+                                flush_interval=60)
+        channel.write("ab")
+        self.assertEqual(self.sent, [])
+        channel.write("cdefghij")
+        self.assertEqual(self.sent, ["abcd", "efgh", "ij"])
+        channel.write("k")
+        channel.close()
+        self.assertEqual(self.sent[-1], "k")
+
+    def test_flush_interval(self):
+        channel = OutputChannel(self.sent.append, flush_interval=0.01)
+        channel.write("hello")
+        for i in range(100):
+            if self.sent:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.sent, ["hello"])
+
+    def test_backpressure(self):
+        channel = OutputChannel(self.sent.append, ping=self.ping,
+                                chunk_size=10, max_unacked=25)
+        for i in range(10):
+            channel.write("x" * 10)
+        channel.close()
+        self.assertEqual(self.pings, 3)
+
+
+class GrabBufferTests(unittest.TestCase):
+
+    def test_limit(self):
+        buffer = GrabBuffer(limit=5)
+        buffer.write("abc")
+        buffer.write("defg")
+        buffer.write("hi")
+        self.assertEqual(buffer.getvalue(), "abcde\n[... 4 more characters]")
+
+
+class RedirectTests(unittest.TestCase):
+
+    def test_redirect_is_per_thread(self):
+        grabbed = GrabBuffer()
+        other = GrabBuffer()
+        ready = threading.Event()
+        done = threading.Event()
+
+        def background():
+            with redirect(other):
+                ready.set()
+                done.wait(5)
+                print("other")
+
+        thread = threading.Thread(target=background)
+        thread.start()
+        ready.wait(5)
+        with redirect(grabbed):
+            print("mine")
+            sys.stderr.write("error\n")
+            done.set()
+            thread.join()
+        self.assertEqual(grabbed.getvalue(), "mine\nerror\n")
+        self.assertEqual(other.getvalue(), "other\n")
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
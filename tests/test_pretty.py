@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+
+
+try:
+    from swank.pretty import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.pretty import *
+
+
+class Clock(object):
+
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+class PrettyPrinterTests(unittest.TestCase):
+
+    def test_short_values_on_one_line(self):
+        self.assertEqual(pformat({"a": [1, 2], "b": (3,)}),
+                         "{'a': [1, 2], 'b': (3,)}")
+        self.assertEqual(pformat(set()), "set()")
+        self.assertEqual(pformat(frozenset([1])), "frozenset({1})")
+
+    def test_long_values_one_item_per_line(self):
+        self.assertEqual(pformat({"key": list(range(5))}, width=12),
+                         "{'key': [0,\n"
+                         "         1,\n"
+                         "         2,\n"
+                         "         3,\n"
+                         "         4]}")
+
+    def test_items_are_elided(self):
+        text = pformat(list(range(10 ** 6)), max_items=3)
+        self.assertEqual(text, "[0,\n 1,\n 2,\n ... (999997 more)]")
+
+    def test_depth_is_elided(self):
+        nested = [[[list(range(100))]]]
+        self.assertEqual(pformat(nested, max_depth=2), "[[[...]]]")
+        self.assertEqual(pformat([[[[[1]]]]], max_depth=2), "[[[...]]]")
+        self.assertEqual(pformat({'a': {'b': {'c': 1}}}, max_depth=1),
+                         "{'a': {...}}")
+
+    def test_recursion(self):
+        loop = list(range(30))
+        loop.append(loop)
+        text = pformat(loop)
+        self.assertIn("<Recursion on list with id=", text)
+
+    def test_size_budget(self):
+        text = pformat(list(range(1000)), max_chars=20)
+        self.assertEqual(text, "[0,\n 1,\n 2,\n 3,\n 4,\n"
+                               "\n[... truncated at 20 characters]")
+
+    def test_time_budget(self):
+        printer = PrettyPrinter(time_limit=1.0, timer=Clock(0.3))
+        text = printer.pformat(list(range(1000)))
+        self.assertTrue(text.endswith("\n[... stopped after 1.000s]"), text)
+        self.assertLess(len(text), 100)
+
+    def test_chunks(self):
+        printer = PrettyPrinter(max_items=10000)
+        chunks = list(printer.chunks(list(range(10000)), chunk_size=1000))
+        self.assertGreater(len(chunks), 40)
+        self.assertTrue(all(len(chunk) < 1010 for chunk in chunks))
+        self.assertEqual("".join(chunks),
+                         PrettyPrinter(max_items=10000).pformat(
+                             list(range(10000))))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
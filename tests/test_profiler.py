@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import unittest
+
+
+try:
+    from swank.profiler import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.profiler import *
+
+
+SOURCE = """
+import os.path
+
+def leaf():
+    return 1
+
+def parent(n):
+    return sum(leaf() for i in range(n))
+
+def fact(n):
+    return 1 if n <= 1 else n * fact(n - 1)
+
+class Thing(object):
+    def method(self):
+        return leaf()
+
+    @staticmethod
+    def static():
+        return 2
+"""
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.namespace = {"__name__": "__console__"}
+        exec(SOURCE, self.namespace)
+        self.profiler = Profiler(timer=FakeTimer())
+
+    def stats(self):
+        return dict((stats.name, stats) for stats in self.profiler.report())
+
+    def test_profile_namespace(self):
+        count = self.profiler.profile_namespace(self.namespace, "__console__")
+        self.assertEqual(count, 5)
+        # Imported names are not profiled.
+        self.assertFalse(hasattr(self.namespace["os"].path.join,
+                                 "__swank_profiled__"))
+        self.namespace["parent"](2)
+        stats = self.stats()
+        self.assertEqual(stats["__console__.leaf"].calls, 2)
+        self.assertEqual(stats["__console__.parent"].calls, 1)
+        # parent spans 5 ticks, each leaf call 1 tick.
+        self.assertEqual(stats["__console__.parent"].cumulative, 5.0)
+        self.assertEqual(stats["__console__.parent"].own, 3.0)
+        self.assertEqual(self.profiler.report()[0].name, "__console__.parent")
+
+    def test_threads(self):
+        profiler = Profiler()
+        profiler.profile_namespace(self.namespace, "__console__")
+        # Switch threads often, in the middle of updates.
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        threads = [threading.Thread(target=self.namespace["parent"],
+                                    args=(20000,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = dict((stats.name, stats) for stats in profiler.report())
+        self.assertEqual(stats["__console__.leaf"].calls, 8 * 20000)
+        self.assertEqual(stats["__console__.parent"].calls, 8)
+
+    def test_recursion_counts_cumulative_once(self):
+        self.profiler.profile_namespace(self.namespace, "__console__")
+        self.assertEqual(self.namespace["fact"](3), 6)
+        stats = self.stats()["__console__.fact"]
+        self.assertEqual(stats.calls, 3)
+        self.assertEqual(stats.cumulative, 5.0)
+        self.assertEqual(stats.own, 5.0)
+
+    def test_methods_and_substring(self):
+        count = self.profiler.profile_namespace(
+            self.namespace, "__console__", match=lambda name: "Thing" in name)
+        self.assertEqual(count, 2)
+        thing = self.namespace["Thing"]()
+        self.assertEqual(thing.method(), 1)
+        self.assertEqual(thing.static(), 2)
+        self.assertEqual(sorted(self.stats()),
+                         ["__console__.Thing.method", "__console__.Thing.static"])
+
+    def test_reset_and_unprofile(self):
+        leaf = self.namespace["leaf"]
+        self.profiler.profile_namespace(self.namespace, "__console__")
+        self.namespace["leaf"]()
+        self.profiler.reset()
+        self.assertEqual(self.profiler.report(), [])
+        self.assertIn("total", self.profiler.format_report())
+        self.profiler.unprofile_all()
+        self.assertIs(self.namespace["leaf"], leaf)
+        self.assertEqual(self.profiler.profiled_functions(), [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,568 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+
+try:
+    from swank.lisp import read_lisp
+    from swank.protocol import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.lisp import read_lisp
+    from swank.protocol import *
+
+
+def rex(form, rid=1, thread="t"):
+    return '(:emacs-rex {0} "user" {1} {2})'.format(form, thread, rid)
+
+
+def unframe(response, encoding="utf-8"):
+    length = int(response[:6], 16)
+    payload = response[6:]
+    assert len(payload) == length, (len(payload), length)
+    return payload.decode(encoding)
+
+
+class ProtocolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = SwankProtocol(None, locals={"__name__": "__test__"})
+
+    def dispatch(self, form, rid=1, thread="t"):
+        return unframe(self.protocol.dispatch(rex(form, rid, thread)))
+
+
+class FramingTests(ProtocolTestCase):
+
+    def test_headers_count_encoded_bytes(self):
+        response = self.protocol.dispatch(rex('(swank:pprint-eval "\'éλ\'")'))
+        self.assertEqual(response[:6], b"00001a")
+        self.assertEqual(unframe(response),
+                         '(:return (:ok "\'éλ\'") 1)')
+
+    def test_reply_too_large(self):
+
+        class Protocol(SwankProtocol):
+
+            def swank_huge(self):
+                return "a" * 0x1000000
+
+        response = Protocol(None).dispatch(rex('(swank:huge)'))
+        self.assertEqual(
+            unframe(response),
+            '(:return (:abort "Message of 16777236 bytes is too large for '
+            'a frame") 1)')
+
+    def test_latin_1_session(self):
+        protocol = SwankProtocol(None, locals={}, encoding="latin-1")
+        request = rex('(swank:pprint-eval "\'café λ\'")').encode(
+            "latin-1", "replace")
+        response = protocol.dispatch(request)
+        self.assertEqual(unframe(response, "latin-1"),
+                         '(:return (:ok "\'café ?\'") 1)')
+
+
+class RegistryTests(ProtocolTestCase):
+
+    def test_wire_name(self):
+        self.assertEqual(wire_name("swank_simple_completions"),
+                         "swank:simple-completions")
+
+    def test_stubs_are_unimplemented(self):
+        handlers = SwankProtocol.handlers
+        self.assertTrue(handlers["swank:eval"].implemented)
+        self.assertFalse(handlers["swank:sldb-step"].implemented)
+        self.assertTrue(is_stub(lambda self: None))
+
+        def documented(self):
+            """Doc."""
+            return "python"
+
+        self.assertFalse(is_stub(lambda self: "python"))
+        self.assertFalse(is_stub(lambda self: True))
+        self.assertFalse(is_stub(documented))
+
+    def test_unknown_and_unimplemented_commands_abort(self):
+        self.assertEqual(
+            self.dispatch("(swank:no-such-command 1)", rid=7),
+            '(:return (:abort "Unknown command: swank:no-such-command") 7)')
+        self.assertEqual(
+            self.dispatch("(swank:sldb-step 1)", rid=8),
+            '(:return (:abort "Unimplemented command: swank:sldb-step") 8)')
+
+    def test_underscore_aliases(self):
+        self.assertEqual(self.dispatch('(swank_eval "x = 1")'),
+                         '(:return (:ok "Evaled region") 1)')
+
+    def test_subclass_registry(self):
+
+        class Protocol(SwankProtocol):
+
+            def swank_echo(self, value):
+                return value
+
+        self.assertIn("swank:echo", Protocol.handlers)
+        self.assertNotIn("swank:echo", SwankProtocol.handlers)
+        protocol = Protocol(None)
+        self.assertEqual(unframe(protocol.dispatch(rex('(swank:echo "hi")'))),
+                         '(:return (:ok "hi") 1)')
+
+
+class ArgumentsTests(unittest.TestCase):
+
+    def test_split_arguments(self):
+        request = SwankProtocol(None).parse_request(
+            rex('(swank:foo "foo" 1 :limit 10 :time-limit-in-msec 5)'))
+        args, kwargs = split_arguments(request.form[1:])
+        self.assertEqual(args, ["foo", 1])
+        self.assertEqual(kwargs, {"limit": 10, "time_limit_in_msec": 5})
+        self.assertEqual(split_arguments(["foo"]), (["foo"], {}))
+
+
+class CompletionTests(ProtocolTestCase):
+
+    def test_simple_completions(self):
+        self.dispatch('(swank:eval "alpha_one = alpha_two = 1")')
+        self.assertEqual(
+            self.dispatch('(swank:simple-completions "alpha" "user")'),
+            '(:return (:ok (("alpha_one" "alpha_two") "alpha_")) 1)')
+        self.assertEqual(
+            self.dispatch('(swank:simple-completions "zzz" "user")'),
+            '(:return (:ok (() "zzz")) 1)')
+
+    def test_fuzzy_completions(self):
+        self.dispatch('(swank:eval "def alpha_one(): pass")')
+        response = self.dispatch(
+            '(swank:fuzzy-completions "aone" "user" :limit 1 '
+            ':time-limit-in-msec 1000)')
+        self.assertTrue(response.startswith(
+            '(:return (:ok ((("alpha_one" '), response)
+        self.assertTrue(response.endswith(
+            '((0 "a") (6 "one")) "function")) nil)) 1)'), response)
+
+    def test_apropos_index_built_on_first_query(self):
+
+        class Protocol(SwankProtocol):
+            apropos = shared('apropos', 'AproposIndex')
+
+        Protocol(None)
+        self.assertIsNone(Protocol.__dict__['apropos'].value)
+
+    def test_apropos_list_for_emacs(self):
+        self.dispatch('(swank:eval "def apropos_session_one(): \\"Doc.\\"")')
+        self.assertEqual(
+            self.dispatch('(swank:apropos-list-for-emacs "apropos_session" '
+                          't nil nil :kinds ("function"))'),
+            '(:return (:ok ((:designator "apropos_session_one" '
+            ':function "Doc."))) 1)')
+
+
+class AutodocTests(ProtocolTestCase):
+
+    def test_autodoc(self):
+        self.dispatch('(swank:eval "def f(a, b=2): pass")')
+        self.assertEqual(
+            self.dispatch("(swank:autodoc '(\"f\" \"1\" "
+                          "swank::%cursor-marker%) :print-right-margin 80)"),
+            '(:return (:ok ("(f a ===> b=2 <===)" t)) 1)')
+        self.assertEqual(
+            self.dispatch("(swank:autodoc '(\"nope\" "
+                          "swank::%cursor-marker%))"),
+            '(:return (:ok (:not-available t)) 1)')
+        self.dispatch('(swank:eval "def f(x): pass")')
+        self.assertEqual(
+            self.dispatch("(swank:autodoc '(\"f\" "
+                          "swank::%cursor-marker%))"),
+            '(:return (:ok ("(f ===> x <===)" t)) 1)')
+
+    def test_operator_arglist(self):
+        self.assertEqual(
+            self.dispatch('(swank:operator-arglist "max" "user")'),
+            '(:return (:ok nil) 1)')
+        self.assertEqual(
+            self.dispatch('(swank:operator-arglist "os.path.join" "user")'),
+            '(:return (:ok "(os.path.join a *p)") 1)')
+
+
+class DescribeTests(ProtocolTestCase):
+
+    def test_describe_symbol(self):
+        self.dispatch('(swank:eval "def f(a, b=2): \\"Doc of f.\\"")')
+        response = read_lisp(self.dispatch('(swank:describe-symbol "f")'))
+        self.assertIn('f(a, b=2)\n    Doc of f.', response[1][1])
+        self.assertEqual(
+            self.dispatch('(swank:describe-symbol "nope")'),
+            '(:return (:ok "nope is unbound") 1)')
+
+    def test_describe_function(self):
+        response = read_lisp(self.dispatch(
+            '(swank:describe-function "os.path.join")'))
+        self.assertTrue(response[1][1].startswith('join(a, *p)'))
+        self.assertEqual(
+            self.dispatch('(swank:describe-function "os.sep")'),
+            '(:return (:ok "os.sep is not a function") 1)')
+        response = read_lisp(self.dispatch(
+            '(swank:describe-definition-for-emacs "os.path.join" :function)'))
+        self.assertTrue(response[1][1].startswith('join(a, *p)'))
+
+    def test_documentation_symbol(self):
+        self.dispatch('(swank:eval "def f(a): \\"Doc of f.\\"")')
+        self.assertEqual(
+            self.dispatch('(swank:documentation-symbol "f")'),
+            '(:return (:ok "f(a)\n\nDoc of f.") 1)')
+        self.dispatch('(swank:eval "f.__doc__ = \\"New doc.\\"")')
+        self.assertEqual(
+            self.dispatch('(swank:documentation-symbol "f")'),
+            '(:return (:ok "f(a)\n\nNew doc.") 1)')
+
+
+class XrefTests(ProtocolTestCase):
+
+    def setUp(self):
+        super(XrefTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "shapes.py")
+        with open(self.path, "w") as f:
+            f.write("def area(w, h):\n    return w * h\n\n"
+                    "def square(w):\n    return area(w, w)\n")
+        from swank.xref import XrefIndex
+        self.protocol.xref = XrefIndex(
+            [self.directory], os.path.join(self.directory, "xref.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_definitions(self):
+        self.assertEqual(
+            self.dispatch('(swank:find-definitions-for-emacs "area")'),
+            '(:return (:ok (("def shapes.area" (:location (:file "{0}") '
+            '(:line 1 0) nil)))) 1)'.format(self.path))
+
+    def test_xref(self):
+        self.assertEqual(
+            self.dispatch("""(swank:xref ':calls '"area")"""),
+            '(:return (:ok (("shapes.square" (:location (:file "{0}") '
+            '(:line 5 11) nil)))) 1)'.format(self.path))
+        self.assertEqual(
+            self.dispatch("(swank:xref ':macroexpands \"area\")"),
+            '(:return (:ok :not-implemented) 1)')
+        self.assertEqual(
+            self.dispatch("(swank:xrefs '(:calls-who :macroexpands) "
+                          "\"square\")"),
+            '(:return (:ok (("calls-who" ("area" (:location (:file "{0}") '
+            '(:line 5 11) nil))))) 1)'.format(self.path))
+
+
+class CompileTests(ProtocolTestCase):
+
+    def setUp(self):
+        super(CompileTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compile_file(self):
+        path = os.path.join(self.directory, "module.py")
+        with open(path, "w") as f:
+            f.write("compiled_value = 42\n")
+        response = self.dispatch(
+            '(swank:compile-file-for-emacs "{0}" t)'.format(path))
+        self.assertTrue(response.startswith(
+            "(:return (:ok (:compilation-result () t "), response)
+        self.assertTrue(response.endswith(" t nil)) 1)"), response)
+        self.assertEqual(self.protocol.locals["compiled_value"], 42)
+
+    def test_compile_file_errors(self):
+        path = os.path.join(self.directory, "broken.py")
+        with open(path, "w") as f:
+            f.write("x = 1\ndef f(:\n")
+        response = self.dispatch(
+            '(swank:compile-file-for-emacs "{0}" nil)'.format(path))
+        self.assertIn(
+            '(:compilation-result ((:message "invalid syntax" '
+            ':severity :error :location (:location (:file "{0}") '
+            '(:line 2 6) nil) :references nil)) nil '.format(path), response)
+
+    def test_compile_multiple_strings(self):
+        response = self.dispatch(
+            "(swank:compile-multiple-strings-for-emacs "
+            "'((\"string_value = 1\" \"a.py\" ((:position 10) (:line 3 1)) "
+            "\"/tmp/a.py\") "
+            "(\"def f(:\" \"a.py\" ((:position 30) (:line 5 1)) "
+            "\"/tmp/a.py\")) 'nil)")
+        self.assertIn(
+            '(:compilation-result ((:message "invalid syntax" '
+            ':severity :error :location (:location (:buffer "a.py") '
+            '(:offset 30 6) nil) :references nil)) nil ', response)
+        self.assertEqual(self.protocol.locals["string_value"], 1)
+
+
+class LoadFileTests(ProtocolTestCase):
+
+    def setUp(self):
+        super(LoadFileTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_file(self):
+        path = os.path.join(self.directory, "loaded.py")
+        with open(path, "w") as f:
+            f.write("import json\nloaded_value = json.dumps(1)\n")
+        self.assertEqual(
+            self.dispatch('(swank:load-file "{0}")'.format(path)),
+            '(:return (:ok t) 1)')
+        self.assertEqual(self.protocol.locals["loaded_value"], "1")
+
+    def test_profile_imports(self):
+        sys.modules.pop("loaded_dependency", None)
+        with open(os.path.join(self.directory, "loaded_dependency.py"),
+                  "w") as f:
+            f.write("value = 1\n")
+        path = os.path.join(self.directory, "loaded.py")
+        with open(path, "w") as f:
+            f.write("import sys\nsys.path.insert(0, {0!r})\n"
+                    "import loaded_dependency\n"
+                    "sys.path.pop(0)\n".format(self.directory))
+        response = self.dispatch(
+            '(swank:load-file "{0}" :profile-imports t)'.format(path))
+        sys.modules.pop("loaded_dependency", None)
+        self.assertTrue(response.startswith(
+            '(:return (:ok (("loaded_dependency" '), response)
+        self.assertTrue(response.endswith(' ()))) 1)'), response)
+
+
+class WorkersTests(ProtocolTestCase):
+
+    def test_eval_in_workers(self):
+        from workers import WorkerPool
+        self.protocol.workers = WorkerPool(1).start()
+        try:
+            self.dispatch('(swank:eval "import os; pid = os.getpid()")')
+            self.assertNotIn("pid", self.protocol.locals)
+            self.assertEqual(
+                self.dispatch(
+                    '(swank:eval-and-grab-output "print(1) or pid != {0}")'
+                    .format(os.getpid())),
+                '(:return (:ok ("1\n" "True")) 1)')
+            self.dispatch('(swank:eval "big = list(range(10 ** 6))")')
+            response = read_lisp(self.dispatch(
+                '(swank:pprint-eval "big" :limit 100)'))
+            self.assertTrue(response[1][1].endswith(
+                "[... truncated at 100 characters]"), response)
+            response = read_lisp(self.dispatch(
+                '(swank:eval-and-grab-output "big" :limit 20)'))
+            self.assertTrue(response[1][1][1].startswith("[0,\n 1,"))
+            self.assertLess(len(response[1][1][1]), 100)
+        finally:
+            self.protocol.close()
+            self.protocol.workers.close()
+
+
+class InterruptTests(ProtocolTestCase):
+
+    def test_timeout(self):
+        response = self.dispatch(
+            '(swank:eval "while True: pass" :timeout 0.05)')
+        self.assertTrue(response.startswith(
+            '(:return (:abort "Evaluation timed out after 0.'), response)
+        self.assertTrue(response.endswith(
+            ' at <string>:1 in <module>") 1)'), response)
+
+    def test_emacs_interrupt_and_throw_to_toplevel(self):
+        responses = []
+
+        def run(rid, thread):
+            responses.append(self.dispatch(
+                '(swank:eval "while True: pass")', rid, thread))
+
+        threads = [threading.Thread(target=run, args=args)
+                   for args in [(1, ":repl-thread"), (2, "2")]]
+        for thread in threads:
+            thread.start()
+        while len(self.protocol.evaluations.running) < 2:
+            threading.Event().wait(0.001)
+        self.assertIsNone(self.protocol.receive(
+            "(:emacs-interrupt :repl-thread)"))
+        threads[0].join(5)
+        self.assertEqual(len(responses), 1)
+        self.assertTrue(responses[0].startswith(
+            '(:return (:abort "Evaluation interrupted after '), responses)
+        self.assertEqual(
+            self.dispatch("(swank:throw-to-toplevel)", 3),
+            '(:return (:abort "Interrupted 1 evaluation") 3)')
+        threads[1].join(5)
+        self.assertTrue(responses[1].endswith(' 2)'), responses)
+        self.assertEqual(self.dispatch("(swank:sldb-abort)", 4),
+                         '(:return (:ok "Interrupted 0 evaluations") 4)')
+
+    def test_interrupt_in_workers(self):
+        from workers import WorkerPool
+        self.protocol.workers = WorkerPool(1).start()
+        try:
+            response = self.dispatch(
+                '(swank:eval "while True: pass" :timeout 0.2)')
+            self.assertTrue(response.startswith(
+                '(:return (:abort "Evaluation timed out after 0.'), response)
+            self.assertTrue(response.endswith(
+                ' at <string>:1 in <module>") 1)'), response)
+            self.assertEqual(
+                self.dispatch('(swank:eval-and-grab-output "1 + 1")'),
+                '(:return (:ok ("" "2")) 1)')
+        finally:
+            self.protocol.close()
+            self.protocol.workers.close()
+
+
+class OutputTests(ProtocolTestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.protocol = SwankProtocol(None, locals={"__name__": "__test__"},
+                                      send=self.sent.append)
+
+    def test_eval_streams_output(self):
+        self.assertEqual(self.dispatch('(swank:eval "print(1 + 1)")'),
+                         '(:return (:ok "Evaled region") 1)')
+        self.assertEqual([unframe(event) for event in self.sent],
+                         ['(:write-string "2\n")'])
+
+    def test_eval_and_grab_output(self):
+        self.assertEqual(
+            self.dispatch('(swank:eval-and-grab-output "print(\\"hi\\")")'),
+            '(:return (:ok ("hi\n" "")) 1)')
+        self.assertEqual(
+            self.dispatch('(swank:eval-and-grab-output "[1] * 3" :limit 5)'),
+            '(:return (:ok ("" "[1, 1\n[... 4 more characters]")) 1)')
+        self.assertEqual(self.sent, [])
+
+    def test_flow_control(self):
+        thread = threading.Thread(target=self.dispatch, args=(
+            "(swank:flow-control-test 100000)", 1, ":repl-thread"))
+        thread.start()
+        for i in range(500):
+            pings = [event for event in self.sent if b"(:ping" in event]
+            if pings:
+                break
+            thread.join(0.01)
+        self.assertEqual(unframe(pings[0]), "(:ping :repl-thread 1)")
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        self.protocol.receive("(:emacs-pong :repl-thread 1)")
+        self.protocol.close()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+
+
+class DebuggerTests(ProtocolTestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.protocol = SwankProtocol(None, locals={"__name__": "__test__"},
+                                      send=self.sent.append)
+        self.dispatch('(swank:eval "def f(x):\n    big = [0] * 10**6\n'
+                      '    return x / 0")')
+
+    def test_debug_and_frames(self):
+        self.assertEqual(
+            self.dispatch('(swank:eval "f(1)")', 2, ":repl-thread"),
+            '(:return (:abort "ZeroDivisionError: division by zero") 2)')
+        self.assertEqual([unframe(event) for event in self.sent], [
+            '(:debug :repl-thread 1 ("ZeroDivisionError: division by zero" '
+            '"[Condition of type ZeroDivisionError]" nil) '
+            '(("ABORT" "Return to SLIME\'s top level.")) '
+            '((0 "f (<string>:3)") (1 "<module> (<string>:1)")) (2))',
+            '(:debug-activate :repl-thread 1 nil)'])
+        self.assertEqual(
+            self.dispatch("(swank:backtrace 1 nil)", 3, ":repl-thread"),
+            '(:return (:ok ((1 "<module> (<string>:1)"))) 3)')
+        self.assertEqual(
+            self.dispatch("(swank:frame-locals-and-catch-tags 0)", 4,
+                          ":repl-thread"),
+            '(:return (:ok (((:name "x" :id 0 :value "1") '
+            '(:name "big" :id 0 :value "[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, ...]"))'
+            ' nil)) 4)')
+        self.assertEqual(
+            self.dispatch('(swank:eval-string-in-frame "x + 1" 0 "user")', 5,
+                          ":repl-thread"),
+            '(:return (:ok "2") 5)')
+        self.assertEqual(
+            self.dispatch("(swank:frame-source-location 0)", 6,
+                          ":repl-thread"),
+            '(:return (:ok (:error "No source file for frame 0")) 6)')
+        self.assertEqual(
+            self.dispatch("(swank:backtrace 0 nil)", 7),
+            '(:return (:abort "Not in the debugger") 7)')
+
+    def test_throw_to_toplevel_leaves_debugger(self):
+        self.dispatch('(swank:eval "f(1)")', 2, ":repl-thread")
+        self.dispatch('(swank:eval "f(2)")', 3, ":repl-thread")
+        self.assertEqual(unframe(self.sent[-2])[:25],
+                         '(:debug :repl-thread 2 ("')
+        del self.sent[:]
+        self.assertEqual(
+            self.dispatch("(swank:sldb-abort)", 4, ":repl-thread"),
+            '(:return (:ok "Left debugger level 2") 4)')
+        self.assertEqual(
+            self.dispatch("(swank:throw-to-toplevel)", 5, ":repl-thread"),
+            '(:return (:abort "Left 1 debugger level") 5)')
+        self.assertEqual([unframe(event) for event in self.sent],
+                         ['(:debug-return :repl-thread 2 nil)',
+                          '(:debug-return :repl-thread 1 nil)'])
+
+
+class PprintTests(ProtocolTestCase):
+
+    def test_pprint_eval(self):
+        self.assertEqual(self.dispatch('(swank:pprint-eval "[1, 2]")'),
+                         '(:return (:ok "[1, 2]") 1)')
+        self.assertEqual(self.dispatch('(swank:pprint-eval "x = 1")'),
+                         '(:return (:ok "; No value") 1)')
+        self.assertEqual(
+            self.dispatch('(swank:pprint-eval "list(range(10**6))" '
+                          ':limit 12)'),
+            '(:return (:ok "[0,\n 1,\n 2,\n\n'
+            '[... truncated at 12 characters]") 1)')
+
+    def test_pprint_eval_streams(self):
+        sent = []
+        self.protocol.send = sent.append
+        self.assertEqual(
+            self.dispatch('(swank:pprint-eval "list(range(3000))" '
+                          ':stream t)'),
+            '(:return (:ok "; 507 characters") 1)')
+        text = "".join(read_lisp(unframe(event))[1] for event in sent)
+        self.assertEqual(len(text), 507)
+        self.assertTrue(text.endswith(" 99,\n ... (2900 more)]"), text)
+
+
+class MetricsTests(ProtocolTestCase):
+
+    def test_dispatch_metrics(self):
+        self.protocol.metrics.reset()
+        self.dispatch('(swank:eval "x = 1")')
+        self.dispatch('(swank:eval "x = 2")')
+        self.protocol.dispatch(rex('(swank:eval "x = 1 +")'))
+        stats = self.protocol.metrics.stats_for("swank:eval").summary()
+        self.assertEqual((stats["count"], stats["errors"]), (3, 1))
+        self.assertEqual(sum(hits for bound, hits in stats["histogram"]), 3)
+        response = self.dispatch("(swank:dispatch-metrics t)")
+        self.assertTrue(response.startswith(
+            '(:return (:ok ((:name "swank:eval" :count 3 :errors 1 '))
+        self.assertEqual(
+            self.protocol.metrics.stats_for("swank:eval").count, 0)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
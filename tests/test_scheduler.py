@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import unittest
+
+
+try:
+    from swank.scheduler import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.scheduler import *
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler(max_workers=4, queue_size=3)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_thread_key(self):
+        self.assertEqual(thread_key(True), None)
+        self.assertEqual(thread_key(":repl-thread"), ":repl-thread")
+        self.assertEqual(thread_key(3), 3)
+
+    def test_free_requests_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        done = []
+        for i in range(3):
+            self.scheduler.submit(True, lambda i=i: done.append(barrier.wait()))
+        self.scheduler.shutdown()
+        self.assertEqual(sorted(done), [0, 1, 2])
+
+    def test_lanes_run_in_order(self):
+        release = threading.Event()
+        order = []
+
+        def slow():
+            release.wait(5)
+            order.append("slow")
+
+        self.scheduler.submit(":repl-thread", slow)
+        self.scheduler.submit(":repl-thread", order.append, "next")
+        # Another lane and free requests are not blocked by the slow one.
+        finished = threading.Event()
+        self.scheduler.submit(1, finished.set)
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(self.scheduler.depths()[":repl-thread"], 2)
+        release.set()
+        self.scheduler.shutdown()
+        self.assertEqual(order, ["slow", "next"])
+
+    def test_queue_is_bounded(self):
+        release = threading.Event()
+        for i in range(3):
+            self.scheduler.submit(":repl-thread", release.wait, 5)
+        self.assertRaises(QueueFull, self.scheduler.submit,
+                          ":repl-thread", release.wait, 5)
+        release.set()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import unittest
+
+
+try:
+    from swank.wiretrace import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.wiretrace import *
+
+
+class WireRecorderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.recorder = WireRecorder(size=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        self.assertFalse(self.recorder.enabled)
+        self.recorder.record("peer", "recv", b"(:emacs-rex)")
+        self.assertEqual(self.recorder.snapshot(), [])
+
+    def test_ring_buffer(self):
+        self.recorder.start()
+        for i in range(5):
+            self.recorder.record("peer", "recv", str(i).encode())
+        self.assertEqual([frame[3] for frame in self.recorder.snapshot()],
+                         [b"2", b"3", b"4"])
+        self.recorder.stop()
+        self.recorder.record("peer", "recv", b"5")
+        self.assertEqual(len(self.recorder.snapshot()), 3)
+        self.recorder.start(size=1)
+        self.assertEqual(self.recorder.snapshot(), [])
+        self.recorder.record("peer", "recv", b"6")
+        self.recorder.record("peer", "recv", b"7")
+        self.assertEqual([frame[3] for frame in self.recorder.snapshot()],
+                         [b"7"])
+
+    def test_dump_and_load(self):
+        self.recorder.start()
+        self.recorder.record("peer", "recv", "(swank:eval \"é\")"
+                             .encode("utf-8"))
+        self.recorder.record("peer", "send", b"\xff raw")
+        path = os.path.join(self.directory, "trace.jsonl")
+        self.assertEqual(self.recorder.dump(path), 2)
+        frames = load_trace(path)
+        self.assertEqual([frame[1:] for frame in frames], [
+            ("peer", "recv", "(swank:eval \"é\")".encode("utf-8")),
+            ("peer", "send", b"\xff raw")])
+
+    @unittest.skipUnless(hasattr(signal, "SIGUSR2"), "needs SIGUSR2")
+    def test_signal_toggle(self):
+        path = os.path.join(self.directory, "signal.jsonl")
+        previous = signal.getsignal(signal.SIGUSR2)
+        os.environ["SWANK_WIRE_TRACE"] = path
+        try:
+            self.assertTrue(install_signal_handler(recorder=self.recorder))
+            os.kill(os.getpid(), signal.SIGUSR2)
+            self.assertTrue(self.recorder.enabled)
+            self.recorder.record("peer", "recv", b"(:emacs-pong t 1)")
+            os.kill(os.getpid(), signal.SIGUSR2)
+            self.assertFalse(self.recorder.enabled)
+            self.assertEqual(len(load_trace(path)), 1)
+        finally:
+            del os.environ["SWANK_WIRE_TRACE"]
+            signal.signal(signal.SIGUSR2, previous)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+
+try:
+    from swank.workers import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.workers import *
+
+
+class WorkerPoolTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WorkerPool(2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_sessions(self):
+        self.assertIsNone(self.pool.eval(1, "x = 'one'"))
+        self.assertIsNone(self.pool.eval(2, "x = 'two'"))
+        self.assertEqual(repr(self.pool.eval(1, "x")), "'one'")
+        self.assertEqual(repr(self.pool.eval(2, "x")), "'two'")
+        self.assertIsNot(self.pool.worker_for(1), self.pool.worker_for(2))
+        self.pool.release(2)
+        self.assertRaises(RemoteError, self.pool.eval, 2, "x")
+
+    def test_rendering(self):
+        self.assertEqual(repr(self.pool.eval(9, "list(range(10))",
+                                             budgets={'max_items': 3})),
+                         "[0,\n 1,\n 2,\n ... (7 more)]")
+        self.assertIsNone(self.pool.eval(9, "list(range(10))", value=False))
+
+    def test_output_and_errors(self):
+        output = []
+        value = self.pool.eval(3, "print('hello') or 42", output.append)
+        self.assertEqual(repr(value), "42")
+        self.assertEqual("".join(output), "hello\n")
+        try:
+            self.pool.eval(3, "1 / 0")
+        except RemoteError as e:
+            self.assertEqual(e.name, "ZeroDivisionError")
+            self.assertIn("Traceback", e.traceback)
+        else:
+            self.fail("RemoteError not raised")
+
+    def test_crashed_worker_is_replaced(self):
+        self.pool.eval(4, "y = 1")
+        worker = self.pool.worker_for(4)
+        self.assertRaises(WorkerCrashed, self.pool.eval, 4,
+                          "import os; os._exit(1)")
+        self.assertNotIn(worker, self.pool.workers)
+        self.assertEqual(len(self.pool.workers), 2)
+        self.assertRaises(RemoteError, self.pool.eval, 4, "y")
+        self.assertEqual(repr(self.pool.eval(4, "2 + 2")), "4")
+
+    def test_interrupt_shared_worker(self):
+        pool = WorkerPool(1).start()
+        self.addCleanup(pool.close)
+        results = {}
+
+        def run(session, string):
+            try:
+                results[session] = repr(pool.eval(session, string))
+            except RemoteError as e:
+                results[session] = e.name
+
+        running = threading.Thread(
+            target=run, args=(5, "__import__('time').sleep(0.5) or 'done'"))
+        running.start()
+        worker = pool.worker_for(5)
+        while worker.running != 5:
+            time.sleep(0.01)
+        waiting = threading.Thread(target=run, args=(6, "'started'"))
+        waiting.start()
+        while 6 not in worker.queued:
+            time.sleep(0.01)
+        self.assertTrue(pool.interrupt(6))
+        running.join()
+        waiting.join()
+        self.assertEqual(results, {5: "'done'", 6: "KeyboardInterrupt"})
+        self.assertEqual(repr(pool.eval(6, "'again'")), "'again'")
+        self.assertFalse(pool.interrupt(6))
+
+    def test_release_during_eval(self):
+        pool = WorkerPool(1).start()
+        self.addCleanup(pool.close)
+        results = []
+        pool.eval(7, "None")
+
+        def run():
+            try:
+                pool.eval(7, "__import__('time').sleep(5)")
+            except RemoteError as e:
+                results.append(e.name)
+
+        running = threading.Thread(target=run)
+        running.start()
+        worker = pool.worker_for(7)
+        while worker.running != 7:
+            time.sleep(0.01)
+        # Let the worker start evaluating, SIGINT is ignored until then.
+        time.sleep(0.2)
+        start = time.time()
+        pool.release(7)
+        self.assertLess(time.time() - start, 0.5)
+        running.join(2)
+        self.assertEqual(results, ["KeyboardInterrupt"])
+        self.assertEqual(repr(pool.eval(8, "'next'")), "'next'")
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
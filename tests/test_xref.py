@@ -0,0 +1,170 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+try:
+    from swank.xref import *
+except ImportError:
+    root = os.path.realpath(os.path.dirname(__file__))
+    modpath = os.path.join(root, "..")
+    sys.path.insert(0, modpath)
+    from swank.xref import *
+
+
+SOURCE = """\
+import os.path
+from collections import OrderedDict
+
+LIMIT = 10
+
+
+class Greeter(object):
+
+    def greet(self, name):
+        return shout(name)
+
+
+def shout(text):
+    return os.path.join(text.upper(), "!")
+"""
+
+
+class ParseTests(unittest.TestCase):
+
+    def test_relations(self):
+        relations = parse_source(SOURCE)
+        self.assertIn(('Greeter', 'Greeter', 'class', 7, 0),
+                      relations['definitions'])
+        self.assertIn(('greet', 'Greeter.greet', 'def', 9, 4),
+                      relations['definitions'])
+        self.assertIn(('LIMIT', 'LIMIT', 'variable', 4, 0),
+                      relations['definitions'])
+        self.assertIn(('shout', 'Greeter.greet', 10, 15), relations['calls'])
+        self.assertIn(('join', 'shout', 14, 11), relations['calls'])
+        self.assertIn(('os.path', '', 1, 0), relations['imports'])
+        self.assertIn(('collections.OrderedDict', '', 2, 0),
+                      relations['imports'])
+        self.assertIn(('text', 'shout', 14, 24), relations['references'])
+
+
+class XrefIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.package = os.path.join(self.directory, 'project', 'greetings')
+        os.makedirs(self.package)
+        self.write('__init__.py', '')
+        self.write('core.py', SOURCE)
+        self.cache_path = os.path.join(self.directory, 'cache', 'xref.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        path = os.path.join(self.package, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def index(self, **kwargs):
+        index = XrefIndex([os.path.join(self.directory, 'project')],
+                          self.cache_path, **kwargs)
+        index.update()
+        return index
+
+    def test_queries(self):
+        index = self.index()
+        path = os.path.join(self.package, 'core.py')
+        self.assertEqual(index.definitions('Greeter.greet'), [
+            (path, 'greetings.core.Greeter.greet', 'def', 9, 4)])
+        self.assertEqual(index.definitions('other.greet'), [])
+        self.assertEqual(index.lookup('calls', 'shout'), [
+            (path, 'greetings.core.Greeter.greet', 10, 15, 'shout')])
+        self.assertEqual([entry[4] for entry in index.callees('shout')],
+                         ['join', 'upper'])
+        self.assertEqual(len(index.lookup('imports', 'collections')), 1)
+        self.assertEqual(len(index.lookup('imports', 'other.OrderedDict')),
+                         0)
+
+    def test_process_pool(self):
+        for i in range(4):
+            self.write('module{0}.py'.format(i), 'def f{0}(): pass'.format(i))
+        index = self.index(pool_threshold=1, max_workers=2)
+        self.assertEqual(len(index.paths()), 6)
+        self.assertEqual(len(index.definitions('f3')), 1)
+
+    def test_warm_start_and_changes(self):
+        self.index()
+        index = self.index()
+        self.assertEqual(index.parse([]), [])
+        parsed = []
+        parse = index.parse
+        index.parse = lambda paths: parsed.extend(paths) or parse(paths)
+        index.update()
+        self.assertEqual(parsed, [])
+        path = self.write('core.py', SOURCE)
+        os.utime(path, (0, 0))
+        index.update()
+        self.assertEqual(parsed, [])
+        self.write('core.py', SOURCE.replace('shout', 'yell'))
+        index.update()
+        self.assertEqual(parsed, [path])
+        self.assertEqual(index.definitions('shout'), [])
+        self.assertEqual(len(self.index().definitions('yell')), 1)
+
+    def test_roots_sharing_a_cache(self):
+        self.index()
+        other = os.path.join(self.directory, 'other')
+        os.makedirs(other)
+        with open(os.path.join(other, 'extra.py'), 'w') as f:
+            f.write('def extra(): pass')
+        index = XrefIndex([other], self.cache_path)
+        index.update()
+        self.assertEqual(len(index.definitions('extra')), 1)
+        self.assertEqual(len(index.definitions('shout')), 1)
+        self.assertNotEqual(default_cache_path([other]),
+                            default_cache_path([self.package]))
+        self.assertEqual(default_cache_path(['a', 'b']),
+                         default_cache_path(['b', 'a']))
+
+    def test_listings(self):
+        root = os.path.join(self.directory, 'project')
+        listings = {}
+        self.assertEqual(
+            sorted(source_files([root], listings)),
+            [(os.path.join(self.package, '__init__.py'), 'greetings', True),
+             (os.path.join(self.package, 'core.py'), 'greetings.core',
+              True)])
+        self.assertEqual(
+            [listed for path, module, listed in source_files([root],
+                                                            listings)],
+            [False, False])
+        path = self.write('extra.py', '')
+        os.utime(self.package, ns=(0, 0))
+        self.assertIn((path, 'greetings.extra', True),
+                      list(source_files([root], listings)))
+
+    def test_default_roots(self):
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.package)
+        self.assertNotIn(os.path.realpath(self.package), default_roots())
+        self.write('setup.py', '')
+        self.assertEqual(default_roots()[0], os.path.realpath(self.package))
+
+    def test_background_refresh(self):
+        index = XrefIndex([os.path.join(self.directory, 'project')],
+                          self.cache_path)
+        index.refresh(timeout=30)
+        self.assertEqual(len(index.definitions('shout')), 1)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()